@@ -0,0 +1,222 @@
+"""Activos externos (confeti, fuente Inter, iconos) servidos desde el propio dashboard.
+
+Cada render hacía que el navegador pidiera canvas-confetti a jsdelivr, la
+fuente Inter a Google Fonts y los iconos a icons8/flaticon. En la wifi de
+un evento eso retrasa segundos la primera pintura, y sin conexión la página
+se rompe. Aquí se descargan una sola vez a una caché en disco
+(`static/activos/`), que Streamlit sirve en `app/static/activos/` (ver
+.streamlit/config.toml):
+
+- iconos: reducidos a TAMANO_ICONO px y recomprimidos en WebP
+- fuente: la hoja de Google Fonts y sus .woff2, con las URLs reescritas
+- confeti: el script tal cual
+
+Al arrancar, el dashboard solo usa lo que ya está en disco (`activos_en_disco`,
+sin red): la primera pintura no espera a ninguna descarga. Lo que falte se
+descarga en un hilo aparte (`preparar_en_segundo_plano`) y se usa a partir
+del siguiente arranque; mientras tanto se sigue con la URL remota. Los
+ficheros ya descargados no se vuelven a pedir.
+
+Comprobar las URLs (sale con error si alguna está mal formada) y precargar
+la caché, p. ej. al construir la imagen:
+
+    python activos.py
+"""
+import io
+import os
+import re
+import sys
+import hashlib
+import logging
+import argparse
+import threading
+from urllib.parse import urlparse, parse_qs
+
+import requests
+
+log = logging.getLogger(__name__)
+
+DIR_ACTIVOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static", "activos")
+# Ruta con la que la página pide los ficheros a Streamlit
+URL_ACTIVOS = "app/static/activos/"
+# "local": caché en disco servida por Streamlit; "remoto": URLs originales
+MODO = os.environ.get("DASHBOARD_ACTIVOS", "local")
+TIMEOUT = 10
+# Los iconos se muestran a 100 px CSS: el doble para pantallas de alta densidad
+TAMANO_ICONO = 200
+
+URL_CONFETI = "https://cdn.jsdelivr.net/npm/canvas-confetti@1.5.1/dist/confetti.browser.min.js"
+URL_FUENTES = "https://fonts.googleapis.com/css2?family=Inter:wght@400;500;600;700;800;900&display=swap"
+
+# Google Fonts solo entrega woff2 a navegadores que lo anuncian
+AGENTE_NAVEGADOR = "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36"
+
+# Formato esperado de los parámetros de query conocidos
+FORMATO_PARAMETROS = {
+    "size": r"\d+",
+    "id": r"\w+",
+    "format": r"png|svg|jpg|jpeg|webp|gif",
+    "color": r"[0-9A-Fa-f]{6}",
+    "display": r"auto|block|swap|fallback|optional",
+}
+
+
+# ==============================
+# VERIFICACIÓN DE URLS
+# ==============================
+def problemas_url(url):
+    problemas = []
+    partes = urlparse(url)
+    if partes.scheme != "https" or not partes.netloc:
+        problemas.append("no es una URL https absoluta")
+    if re.search(r"\s", url):
+        problemas.append("contiene espacios")
+    for clave, valores in parse_qs(partes.query, keep_blank_values=True).items():
+        patron = FORMATO_PARAMETROS.get(clave)
+        for valor in valores:
+            if patron and not re.fullmatch(patron, valor):
+                problemas.append(f"parámetro {clave}={valor!r} mal formado")
+    return problemas
+
+
+def verificar_urls(urls):
+    # Lanza ValueError con todas las URLs mal formadas
+    errores = [f"{url}: {p}" for url in dict.fromkeys(urls) for p in problemas_url(url)]
+    if errores:
+        raise ValueError("URLs de activos mal formadas:\n  " + "\n  ".join(errores))
+
+
+# ==============================
+# DESCARGA A LA CACHÉ EN DISCO
+# ==============================
+def nombre_local(url, extension):
+    return hashlib.sha1(url.encode("utf-8")).hexdigest()[:16] + extension
+
+
+def _descargar(sesion, url, **kwargs):
+    resp = sesion.get(url, timeout=TIMEOUT, **kwargs)
+    resp.raise_for_status()
+    return resp.content
+
+
+def _guardar(nombre, datos):
+    # Escritura atómica: otro proceso nunca ve un fichero a medias
+    ruta = os.path.join(DIR_ACTIVOS, nombre)
+    temporal = ruta + ".tmp"
+    with open(temporal, "wb") as f:
+        f.write(datos)
+    os.replace(temporal, ruta)
+
+
+def _icono(sesion, url):
+    from PIL import Image
+
+    imagen = Image.open(io.BytesIO(_descargar(sesion, url)))
+    imagen.thumbnail((TAMANO_ICONO, TAMANO_ICONO))
+    salida = io.BytesIO()
+    imagen.convert("RGBA").save(salida, "WEBP", quality=90, method=6)
+    return salida.getvalue()
+
+
+def _fuentes(sesion, url):
+    css = _descargar(sesion, url, headers={"User-Agent": AGENTE_NAVEGADOR}).decode("utf-8")
+
+    def local(m):
+        remota = m.group(1).strip("'\"")
+        nombre = nombre_local(remota, os.path.splitext(urlparse(remota).path)[1])
+        if not os.path.exists(os.path.join(DIR_ACTIVOS, nombre)):
+            _guardar(nombre, _descargar(sesion, remota))
+        # Relativa a la propia hoja, que vive en el mismo directorio
+        return f"url({nombre})"
+
+    return re.sub(r"url\(([^)]+)\)", local, css).encode("utf-8")
+
+
+def _script(sesion, url):
+    return _descargar(sesion, url)
+
+
+def _activos(iconos):
+    # (url remota, extensión local, función que la prepara)
+    return [(URL_CONFETI, ".js", _script), (URL_FUENTES, ".css", _fuentes)] + [
+        (url, ".webp", _icono) for url in dict.fromkeys(iconos)
+    ]
+
+
+def activos_en_disco(iconos=()):
+    """{url remota: nombre del fichero} de lo que ya está en DIR_ACTIVOS, sin tocar la red."""
+    if MODO != "local":
+        return {}
+    locales = {}
+    for url, extension, _ in _activos(iconos):
+        nombre = nombre_local(url, extension)
+        if os.path.exists(os.path.join(DIR_ACTIVOS, nombre)):
+            locales[url] = nombre
+    return locales
+
+
+def preparar_activos(iconos=()):
+    """Descarga lo que falte y devuelve {url remota: nombre del fichero en DIR_ACTIVOS}."""
+    if MODO != "local":
+        return {}
+    pendientes = _activos(iconos)
+
+    try:
+        verificar_urls(url for url, _, _ in pendientes)
+    except ValueError as e:
+        log.error("%s", e)
+
+    os.makedirs(DIR_ACTIVOS, exist_ok=True)
+    locales = {}
+    sesion = requests.Session()
+    sin_conexion = False
+    for url, extension, preparar in pendientes:
+        nombre = nombre_local(url, extension)
+        if os.path.exists(os.path.join(DIR_ACTIVOS, nombre)):
+            locales[url] = nombre
+            continue
+        if sin_conexion or problemas_url(url):
+            continue
+        try:
+            _guardar(nombre, preparar(sesion, url))
+            locales[url] = nombre
+        except (requests.ConnectionError, requests.Timeout) as e:
+            # Sin red (o con una tan lenta que no responde) no tiene sentido
+            # esperar el timeout de cada activo
+            log.warning("Sin conexión para descargar activos, se usan las URLs remotas: %s", e)
+            sin_conexion = True
+        except Exception as e:
+            log.warning("No se pudo preparar %s: %s", url, e)
+    return locales
+
+
+def preparar_en_segundo_plano(iconos=()):
+    hilo = threading.Thread(target=preparar_activos, args=(list(iconos),), name="activos", daemon=True)
+    hilo.start()
+    return hilo
+
+
+class Activos:
+    """Traduce URLs remotas a la caché local cuando el fichero existe."""
+
+    def __init__(self, locales):
+        self.locales = locales
+
+    def url(self, remota, prefijo=URL_ACTIVOS):
+        nombre = self.locales.get(remota)
+        return prefijo + nombre if nombre else remota
+
+
+if __name__ == "__main__":
+    argparse.ArgumentParser(description="Verifica las URLs de activos y llena la caché en disco").parse_args()
+    logging.basicConfig(level=logging.INFO)
+    import render
+
+    urls = [URL_CONFETI, URL_FUENTES, *render.ICONOS]
+    try:
+        verificar_urls(urls)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        sys.exit(1)
+    locales = preparar_activos(render.ICONOS)
+    print(f"{len(set(urls))} URLs de activos correctas, {len(locales)} en {DIR_ACTIVOS}")
@@ -2,11 +2,21 @@ import streamlit as st
 import pandas as pd
 from datetime import datetime
 import streamlit.components.v1 as components
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 from streamlit_autorefresh import st_autorefresh
 import time
-import hashlib
-import requests
-from io import StringIO
+import os
+import logging
+import metricas
+import perfilado
+from datos import ClienteAPI
+from snapshot_compartido import LectorSnapshot
+from webhook import iniciar_receptor, reejecutar_sesiones, sesiones_activas
+from procesamiento import MotorTotales, donaciones_nuevas
+from render import pagina_html, estado_tablero, cola_donaciones_json, cola_tablero, DIR_TABLERO, ICONOS
+from activos import preparar_en_segundo_plano
+
+log = logging.getLogger(__name__)
 
 # ==============================
 # CONFIGURACIÓN PRINCIPAL
@@ -18,1147 +28,243 @@ st.set_page_config(
 )
 
 # ==============================
-# AUTO-REFRESH
-# ==============================
-count = st_autorefresh(interval=15000, key="datarefresh")
-
-# ==============================
-# CARGA DE DATOS DESDE API (APPS SCRIPT)
-# ==============================
-API_URL = "https://script.google.com/macros/s/AKfycbzVt9cAlSVmC5kpDVBRHyj1ak_dKIDj5ZHuZcX7Niz12swOHgDhYnq9HzQegakkPFLqWg/exec"
-
+# DIAGNÓSTICO DE RENDIMIENTO
+# ==============================
+# Panel oculto: ?diagnostico=1 mantiene encendida la instrumentación del
+# proceso (metricas.py) mientras esta sesión siga abierta, sin líneas de
+# log, y muestra al pie los tiempos por etapa. Sin ninguna sesión así,
+# medir() no hace nada salvo con DASHBOARD_METRICAS=1 o el endpoint
+inicio_rerun = time.perf_counter()
+# ?perfil=1: este rerun (solo este) corre bajo cProfile (ver perfilado.py)
+# hasta el `finally` de más abajo. El parámetro se quita de la URL para que
+# el autorefresh no vuelva a perfilar
+PERFIL = None
+if st.query_params.get("perfil") == "1":
+    del st.query_params["perfil"]
+    PERFIL = perfilado.iniciar()
 try:
-    resp = requests.get(API_URL)
-    data = resp.json()
-
-    donaciones_raw = data["donaciones"]
-    metas_raw = data["metas"]
-
-    donaciones = pd.DataFrame(donaciones_raw[1:], columns=donaciones_raw[0])
-    metas = pd.DataFrame(metas_raw[1:], columns=metas_raw[0])
-
-except Exception as e:
-    st.error("❌ Error cargando datos desde la API")
-    st.write(e)
-    st.stop()
-
-# ==============================
-# INICIALIZAR SESSION STATE
-# ==============================
-if 'ultima_donacion_id' not in st.session_state:
-    st.session_state.ultima_donacion_id = None
-
-if 'mostrar_confeti' not in st.session_state:
-    st.session_state.mostrar_confeti = False
-
-# Guardar última versión "buena"
-if "donaciones_guardadas" not in st.session_state:
-    st.session_state.donaciones_guardadas = donaciones.copy()
-
-# Guardar hash de dataset completo
-if "hash_donaciones" not in st.session_state:
-    st.session_state.hash_donaciones = hashlib.md5(pd.util.hash_pandas_object(donaciones, index=True).values.tobytes()).hexdigest()
-
-# ==============================
-# FUNCIONES
-# ==============================
-def generar_id_donacion(fila):
-    contenido = f"{fila.get('fecha_hora', '')}{fila.get('donante_publico', '')}"
-    for col in fila.index:
-        if col not in ['fecha_hora', 'donante_publico', 'Donante', 'Contacto (opcional)']:
-            contenido += str(fila[col])
-    return hashlib.md5(contenido.encode()).hexdigest()
-
-def formatear_numero(x):
-    try:
-        return f"{int(float(x)):,}".replace(",", ".")
-    except:
-        return "0"
-
-def termometro_ultra_moderno_svg(pct, color="#00d4ff"):
-    pct = max(0, min(float(pct), 100))
-    altura = int(120 * (pct / 100))
-    y = 150 - altura
-    return f"""
-    <svg viewBox="0 0 130 210">
-        <defs>
-            <linearGradient id="bulb{hash(color)}" x1="0%" y1="0%" x2="0%" y2="100%">
-                <stop offset="0%" style="stop-color:{color};stop-opacity:1" />
-                <stop offset="50%" style="stop-color:{color};stop-opacity:0.8" />
-                <stop offset="100%" style="stop-color:{color};stop-opacity:0.6" />
-            </linearGradient>
-            <linearGradient id="tube{hash(color)}" x1="0%" y1="0%" x2="0%" y2="100%">
-                <stop offset="0%" style="stop-color:{color};stop-opacity:1" />
-                <stop offset="100%" style="stop-color:{color};stop-opacity:0.7" />
-            </linearGradient>
-            <filter id="neon{hash(color)}">
-                <feGaussianBlur stdDeviation="4" result="coloredBlur"/>
-                <feMerge>
-                    <feMergeNode in="coloredBlur"/>
-                    <feMergeNode in="coloredBlur"/>
-                    <feMergeNode in="SourceGraphic"/>
-                </feMerge>
-            </filter>
-        </defs>
-        <circle cx="65" cy="170" r="26" fill="{color}" opacity="0.15" filter="blur(8px)"/>
-        <circle cx="65" cy="170" r="22" fill="rgba(10,15,30,0.5)" stroke="{color}" stroke-width="2.5" opacity="0.5"/>
-        <rect x="52" y="35" width="26" height="135" rx="13" fill="rgba(10,15,30,0.5)" stroke="{color}" stroke-width="2.5" opacity="0.5"/>
-        <clipPath id="clipT{hash(color)}">
-            <rect x="52" y="35" width="26" height="135" rx="13"/>
-        </clipPath>
-        <rect x="52" y="{y}" width="26" height="{altura}" fill="url(#tube{hash(color)})" clip-path="url(#clipT{hash(color)})" filter="url(#neon{hash(color)})"/>
-        <circle cx="65" cy="170" r="18" fill="url(#bulb{hash(color)})" filter="url(#neon{hash(color)})"/>
-        <circle cx="65" cy="170" r="10" fill="white" opacity="0.3"/>
-        <line x1="79" y1="50" x2="88" y2="50" stroke="{color}" stroke-width="2" opacity="0.6"/>
-        <line x1="79" y1="80" x2="88" y2="80" stroke="{color}" stroke-width="2" opacity="0.6"/>
-        <line x1="79" y1="110" x2="88" y2="110" stroke="{color}" stroke-width="2" opacity="0.6"/>
-        <line x1="79" y1="140" x2="88" y2="140" stroke="{color}" stroke-width="2" opacity="0.6"/>
-        <text x="65" y="200" text-anchor="middle" fill="{color}" font-size="14" font-weight="900" opacity="0.9">{pct:.0f}%</text>
-    </svg>
-    """
-
-# ==============================
-# NORMALIZAR COLUMNAS
-# ==============================
-donaciones.columns = [c.strip() for c in donaciones.columns]
-metas.columns = [c.strip().lower() for c in metas.columns]
-
-# ==============================
-# NORMALIZACIÓN METAS
-# ==============================
-if "meta" not in metas.columns:
-    for c in metas.columns:
-        if "meta" in c:
-            metas.rename(columns={c: "meta"}, inplace=True)
-
-if "medicamento" not in metas.columns:
-    for c in metas.columns:
-        if "medicamento" in c or "nombre" in c:
-            metas.rename(columns={c: "medicamento"}, inplace=True)
-
-metas["medicamento"] = metas["medicamento"].astype(str).str.strip()
-metas["meta"] = pd.to_numeric(metas["meta"], errors="coerce").fillna(0)
-
-# ==============================
-# FILTRAR: EXCLUIR VITAMINA A Y D2 Y VITAMINA B
-# ==============================
-medicamentos_excluir = ["Vitamina A y D2 (gotas)", "Vitamina B (gotas)"]
-metas = metas[~metas["medicamento"].isin(medicamentos_excluir)].copy()
-
-lista_medicamentos = metas["medicamento"].tolist()
-
-# ==============================
-# NORMALIZACIÓN DONACIONES
-# ==============================
-if "Marca temporal" in donaciones.columns:
-    donaciones.rename(columns={"Marca temporal": "fecha_hora"}, inplace=True)
-elif "Timestamp" in donaciones.columns:
-    donaciones.rename(columns={"Timestamp": "fecha_hora"}, inplace=True)
-elif "timestamp" in donaciones.columns:
-    donaciones.rename(columns={"timestamp": "fecha_hora"}, inplace=True)
-
-if "Nombre o entidad donante para mostrar en el dashboard (opcional)" in donaciones.columns:
-    donaciones["donante_publico"] = donaciones["Nombre o entidad donante para mostrar en el dashboard (opcional)"].fillna("").astype(str).str.strip()
-elif "Contacto (opcional)" in donaciones.columns:
-    donaciones["donante_publico"] = donaciones.get("Contacto (opcional)", "").fillna("").astype(str).str.strip()
-else:
-    donaciones["donante_publico"] = ""
-
-donaciones.loc[donaciones["donante_publico"] == "", "donante_publico"] = "Donante anónimo"
-donaciones.loc[donaciones["donante_publico"].str.lower() == "nan", "donante_publico"] = "Donante anónimo"
-
-if "Nombre completo del donante (persona o entidad)" in donaciones.columns:
-    donaciones = donaciones.drop(columns=["Nombre completo del donante (persona o entidad)"])
-if "Donante" in donaciones.columns:
-    donaciones = donaciones.drop(columns=["Donante"])
-
-# ==============================
-# CREAR COLUMNAS MEDICAMENTOS
-# ==============================
-for med in lista_medicamentos:
-    if med not in donaciones.columns:
-        donaciones[med] = 0
-    donaciones[med] = pd.to_numeric(donaciones[med], errors="coerce").fillna(0)
-
-# ==============================
-# DETECCIÓN NUEVA DONACIÓN
-# ==============================
-ultimo_donante = "Donante anónimo"
-ultima_hora = ""
-ultimo_monto = 0
-hay_nueva_donacion = False
+    DIAGNOSTICO = st.query_params.get("diagnostico") == "1"
+    if DIAGNOSTICO:
+        metricas.activar_sesion(get_script_run_ctx().session_id)
+    else:
+        metricas.caducar_sesiones()
+    # Endpoint de Prometheus (ver más abajo): se mide desde el primer fetch
+    METRICAS_PUERTO = int(os.environ.get("DASHBOARD_METRICAS_PUERTO", "0"))
+    if METRICAS_PUERTO:
+        metricas.activar(lineas_log=False)
+
+    # ==============================
+    # AUTO-REFRESH
+    # ==============================
+    # En modo push las sesiones se reejecutan al llegar un aviso del formulario
+    # (ver webhook.py); el timer queda solo como respaldo lento
+    MODO_PUSH = os.environ.get("DASHBOARD_MODO_PUSH", "0") == "1"
+    RESPALDO_PUSH_MS = int(os.environ.get("DASHBOARD_RESPALDO_PUSH_MS", "300000"))
+
+    count = st_autorefresh(interval=RESPALDO_PUSH_MS if MODO_PUSH else 15000, key="datarefresh")
+
+    # ==============================
+    # MODO DE RENDER
+    # ==============================
+    # "html": se reenvía la página completa en cada tick (components.html)
+    # "delta": la página se carga una vez en un componente y cada tick solo
+    #          envía un estado JSON pequeño que se aplica sobre el DOM
+    MODO_RENDER = os.environ.get("DASHBOARD_MODO_RENDER", "html")
+
+    tablero = components.declare_component("tablero", path=DIR_TABLERO)
+
+    @st.cache_resource(show_spinner=False)
+    def preparar_activos_pendientes():
+        # Una vez por proceso y sin bloquear la primera pintura: lo que falte en
+        # la caché de activos se usa desde el siguiente arranque (ver activos.py)
+        return preparar_en_segundo_plano(ICONOS)
+
+    preparar_activos_pendientes()
+
+    # ==============================
+    # CARGA DE DATOS DESDE API (APPS SCRIPT)
+    # ==============================
+    API_URL = os.environ.get(
+        "DASHBOARD_API_URL",
+        "https://script.google.com/macros/s/AKfycbzVt9cAlSVmC5kpDVBRHyj1ak_dKIDj5ZHuZcX7Niz12swOHgDhYnq9HzQegakkPFLqWg/exec"
+    )
+
+    # Con varias réplicas: un solo proceso recolector (snapshot_compartido.py)
+    # consulta la API y publica el snapshot en este directorio; las réplicas lo
+    # leen con memory map y no llaman a la API
+    DIR_SNAPSHOT_COMPARTIDO = os.environ.get("DASHBOARD_SNAPSHOT_COMPARTIDO", "")
+
+    @st.cache_resource(show_spinner=False)
+    def obtener_cliente_api(url):
+        if DIR_SNAPSHOT_COMPARTIDO:
+            # Los avisos del formulario los recibe el recolector; aquí basta con
+            # reejecutar las sesiones cuando publica una versión nueva
+            lector = LectorSnapshot(DIR_SNAPSHOT_COMPARTIDO)
+            if MODO_PUSH:
+                lector.suscribir(reejecutar_sesiones)
+            return lector
+
+        # Un único cliente por proceso: conexión reutilizada, timeouts, reintentos
+        # con backoff y circuit breaker. Sirve la última copia buena al instante y
+        # refresca en segundo plano cuando vence DASHBOARD_CACHE_TTL.
+        cliente = ClienteAPI(url)
+        if MODO_PUSH:
+            try:
+                iniciar_receptor(cliente.forzar_refresco, al_cambiar_metas=cliente.invalidar_metas)
+                cliente.suscribir(reejecutar_sesiones)
+            except (OSError, ValueError) as e:
+                print(f"No se pudo iniciar el receptor de webhook, se sigue con el timer: {e}")
+        return cliente
 
-if "fecha_hora" in donaciones.columns:
     try:
-        donaciones["fecha_hora"] = pd.to_datetime(donaciones["fecha_hora"].astype(str).str.strip(), dayfirst=True, errors="coerce")
-        donaciones_validas = donaciones.dropna(subset=["fecha_hora"])
-        if len(donaciones_validas) > 0:
-            fila_ultima = donaciones_validas.sort_values("fecha_hora", ascending=False).iloc[0]
-            id_actual = generar_id_donacion(fila_ultima)
-
-            if st.session_state.ultima_donacion_id != id_actual:
-                st.session_state.ultima_donacion_id = id_actual
-                st.session_state.mostrar_confeti = True
-                hay_nueva_donacion = True
-            else:
-                st.session_state.mostrar_confeti = False
-
-            ultimo_donante = fila_ultima["donante_publico"]
-            ultimo_monto = sum([float(fila_ultima[med]) for med in lista_medicamentos])
-            ultima_hora = fila_ultima["fecha_hora"].strftime("%H:%M:%S")
+        with metricas.medir("app.obtener"):
+            snapshot = obtener_cliente_api(API_URL).obtener()
     except Exception as e:
-        print(f"Error procesando última donación: {e}")
-
-# ==============================
-# PROCESAMIENTO DE DATOS PARA DASHBOARD
-# ==============================
-donaciones_largo = donaciones.melt(
-    id_vars=[c for c in donaciones.columns if c not in lista_medicamentos],
-    value_vars=lista_medicamentos,
-    var_name="medicamento",
-    value_name="cantidad"
-)
-donaciones_largo = donaciones_largo[donaciones_largo["cantidad"] > 0]
-
-donado_por_med = donaciones_largo.groupby("medicamento", as_index=False)["cantidad"].sum()
-
-avance = metas.merge(donado_por_med, on="medicamento", how="left")
-avance["cantidad"] = avance["cantidad"].fillna(0)
-avance["faltante"] = (avance["meta"] - avance["cantidad"]).clip(lower=0)
-avance["porcentaje"] = avance.apply(lambda r: (r["cantidad"] / r["meta"] * 100) if r["meta"]>0 else 0, axis=1)
-
-total_recaudado = avance["cantidad"].sum()
-total_meta = avance["meta"].sum()
-porcentaje_total = (total_recaudado / total_meta * 100) if total_meta>0 else 0
-fecha_hoy = datetime.now().strftime("%d de %B de %Y")
-# ==============================
-# PALETA DE COLORES PREMIUM HEALTHTECH
-# ==============================
-COLORES_MEDICAMENTOS = [
-    "#00D4FF",  # Cyan eléctrico
-    "#FF3D71",  # Rosa neón
-    "#00FF9F",  # Verde esmeralda
-    "#FFB800",  # Dorado brillante
-    "#B24BF3",  # Púrpura vibrante
-    "#FF6B35",  # Naranja cálido
-]
-
-
-# ==============================
-# ✅ IMÁGENES DE MEDICAMENTOS - URLs VERIFICADAS MANUALMENTE
-# ==============================
-IMG_MAP = {
-    "multivitaminas (gotas)": "https://img.icons8.com/?size=100&id=BayY6C34iXTA&format=png&color=000000",
-    "Multivitaminas (gotas)": "https://img.icons8.com/?size=100&id=BayY6C34iXTA&format=png&color=000000",
-    "vitaminas c (gotas)": "https://img.icons8.com/?size=100&id=p514QFRInGPV&format=png&color=000000",
-    "Vitaminas C (gotas)": "https://img.icons8.com/?size=100&id=p514QFRInGPV&format=png&color=000000",
-    "vitamina a y d2 (gotas)": "https://img.icons8.com/?size=100&id=56345&format=png&color=000000g",
-    "Vitamina A y D2 (gotas)": "https://img.icons8.com/?size=100&id=56345&format=png&color=000000g",
-    "vitamina d2 forte (gotas)": "https://img.icons8.com/?size=100&id=aRMbtEpJbrOj&format=png&color=000000",
-    "Vitamina D2 forte (gotas)": "https://img.icons8.com/?size=100&id=aRMbtEpJbrOj&format=png&color=000000",
-    "vitamina b (gotas)": "https://img.icons8.com/?size=100&id=2t4G6lB9hX4X&format=png&color=000000",
-    "Vitamina B (gotas)": "https://img.icons8.com/?size=100&id=2t4G6lB9hX4X&format=png&color=000000",
-    "fumarato ferroso en suspensión": "https://img.icons8.com/?size=100&id=10XEPhqyfdJh&format=png&color=000000",
-    "Fumarato ferroso en suspensión": "https://img.icons8.com/?size=100&id=10XEPhqyfdJh&format=png&color=000000",
-}
-
-DEFAULT_IMG = "https://cdn-icons-png.flaticon.com/512/2966/2966334.png"
-
-
-# ==============================
-# MEDICAMENTO CRÍTICO Y AVANZADO
-# ==============================
-if len(avance) > 0:
-    critico = avance.sort_values("porcentaje", ascending=True).iloc[0]
-    critico_nombre = critico["medicamento"]
-    critico_pct = float(critico["porcentaje"])
-    critico_faltante = float(critico["faltante"])
-
-    mas_avanzado = avance.sort_values("porcentaje", ascending=False).iloc[0]
-    mas_av_nombre = mas_avanzado["medicamento"]
-    mas_av_pct = float(mas_avanzado["porcentaje"])
-else:
-    critico_nombre = "N/A"
-    critico_pct = 0
-    critico_faltante = 0
-    mas_av_nombre = "N/A"
-    mas_av_pct = 0
-
-
-# ==============================
-# TARJETAS CON DISEÑO ULTRA PREMIUM
-# ==============================
-cards_html = ""
-
-for _, r in avance.iterrows():
-    nombre_original = r["medicamento"]
-    nombre_lower = nombre_original.lower()
-
-    donado = float(r["cantidad"])
-    meta = float(r["meta"])
-    faltante = float(r["faltante"])
-    pct = float(r["porcentaje"])
-    pct_bar = max(0, min(pct, 100))
-
-    idx = lista_medicamentos.index(nombre_original) if nombre_original in lista_medicamentos else 0
-    color_main = COLORES_MEDICAMENTOS[idx % len(COLORES_MEDICAMENTOS)]
-
-    img_url = IMG_MAP.get(nombre_lower, DEFAULT_IMG)
-    thermo = termometro_ultra_moderno_svg(pct, color=color_main)
-
-    cards_html += f"""
-    <div class="med-card">
-
-        <div class="med-header">
-            <div class="med-title">{nombre_original}</div>
-            <div class="med-badge" style="background: {color_main}20; color: {color_main}; border: 1px solid {color_main}40;">
-                {pct:.1f}%
-            </div>
-        </div>
-
-        <div class="med-body">
-
-            <div class="med-image-container">
-                <div class="image-glow" style="background: {color_main}30;"></div>
-                
-                <div class="img-wrapper">
-                    <!-- Imagen base gris -->
-                    <img src="{img_url}" class="img-base"/>
-                    
-                    <!-- Contenedor de llenado -->
-                    <div class="img-fill-container" style="height: {pct_bar}%;">
-
-                        <img src="{img_url}" class="img-colored" 
-                             style="filter: drop-shadow(0 0 12px {color_main}) brightness(1.2);"/>
-                    </div>
-                    
-                    <!-- Efecto de brillo -->
-                    <div class="img-shimmer"></div>
-                </div>
-            </div>
-
-            <div class="med-thermo">{thermo}</div>
-        </div>
-
-        <div class="med-stats">
-            <div class="stat-item">
-                <div class="stat-label">Donado</div>
-                <div class="stat-value" style="color: {color_main};">{formatear_numero(donado)}</div>
-            </div>
-            <div class="stat-divider"></div>
-            <div class="stat-item">
-                <div class="stat-label">Meta</div>
-                <div class="stat-value">{formatear_numero(meta)}</div>
-            </div>
-            <div class="stat-divider"></div>
-            <div class="stat-item">
-                <div class="stat-label">Faltan</div>
-                <div class="stat-value warning">{formatear_numero(faltante)}</div>
-            </div>
-        </div>
-
-        <div class="progress-bar">
-            <div class="progress-fill" style="width: {pct_bar}%; background: linear-gradient(90deg, {color_main}, {color_main}cc);"></div>
-            <div class="progress-glow" style="width: {pct_bar}%; background: {color_main}; opacity: 0.3;"></div>
-        </div>
-
-    </div>
-    """
-
-
-# ==============================
-# HTML ULTRA PREMIUM - DISEÑO REVOLUCIONARIO
-# ==============================
-html = f"""
-<!DOCTYPE html>
-<html>
-<head>
-<meta charset="UTF-8">
-<meta name="viewport" content="width=device-width, initial-scale=1.0">
-<meta http-equiv="Cache-Control" content="no-cache, no-store, must-revalidate">
-<meta http-equiv="Pragma" content="no-cache">
-<meta http-equiv="Expires" content="0">
-<script src="https://cdn.jsdelivr.net/npm/canvas-confetti@1.5.1/dist/confetti.browser.min.js"></script>
-
-<style>
-@import url('https://fonts.googleapis.com/css2?family=Inter:wght@400;500;600;700;800;900&display=swap');
-
-* {{
-    margin: 0;
-    padding: 0;
-    box-sizing: border-box;
-}}
-
-body {{
-    font-family: 'Inter', -apple-system, system-ui, sans-serif;
-    background: #060A12;
-    color: #E5E9F0;
-    min-height: 100vh;
-    overflow-x: hidden;
-    position: relative;
-}}
-
-/* ==================== FONDO ANIMADO ==================== */
-body::before {{
-    content: '';
-    position: fixed;
-    top: 0;
-    left: 0;
-    width: 100%;
-    height: 100%;
-    background: 
-        radial-gradient(circle at 15% 20%, rgba(0, 212, 255, 0.08) 0%, transparent 40%),
-        radial-gradient(circle at 85% 80%, rgba(255, 61, 113, 0.08) 0%, transparent 40%),
-        radial-gradient(circle at 50% 50%, rgba(0, 255, 159, 0.05) 0%, transparent 50%);
-    pointer-events: none;
-    z-index: 0;
-    animation: pulse 8s ease-in-out infinite;
-}}
-
-@keyframes pulse {{
-    0%, 100% {{ opacity: 1; }}
-    50% {{ opacity: 0.8; }}
-}}
-
-/* Partículas flotantes */
-body::after {{
-    content: '';
-    position: fixed;
-    top: 0;
-    left: 0;
-    width: 100%;
-    height: 100%;
-    background-image: 
-        radial-gradient(2px 2px at 20% 30%, rgba(255,255,255,0.15), transparent),
-        radial-gradient(2px 2px at 60% 70%, rgba(0,212,255,0.2), transparent),
-        radial-gradient(1px 1px at 50% 50%, rgba(255,61,113,0.2), transparent),
-        radial-gradient(1px 1px at 80% 10%, rgba(0,255,159,0.15), transparent);
-    background-size: 200px 200px, 300px 300px, 250px 250px, 350px 350px;
-    background-position: 0 0, 40px 60px, 130px 270px, 70px 100px;
-    animation: float 20s linear infinite;
-    pointer-events: none;
-    z-index: 0;
-}}
-
-@keyframes float {{
-    0% {{ transform: translateY(0px); }}
-    50% {{ transform: translateY(-20px); }}
-    100% {{ transform: translateY(0px); }}
-}}
-
-.main {{
-    max-width: 1920px;
-    margin: 0 auto;
-    padding: 15px;
-    position: relative;
-    z-index: 1;
-}}
-
-/* ==================== HEADER PREMIUM ==================== */
-.header {{
-    background: linear-gradient(135deg, rgba(15, 23, 42, 0.95) 0%, rgba(8, 15, 30, 0.95) 100%);
-    backdrop-filter: blur(30px) saturate(180%);
-    -webkit-backdrop-filter: blur(30px) saturate(180%);
-    border: 1px solid rgba(255, 255, 255, 0.1);
-    border-radius: 20px;
-    padding: 20px 25px;
-    display: flex;
-    justify-content: space-between;
-    align-items: center;
-    margin-bottom: 15px;
-    box-shadow: 
-        0 20px 60px rgba(0, 0, 0, 0.5),
-        0 0 80px rgba(0, 212, 255, 0.1),
-        inset 0 1px 0 rgba(255, 255, 255, 0.1);
-    position: relative;
-    overflow: hidden;
-}}
-
-.header::before {{
-    content: '';
-    position: absolute;
-    top: 0;
-    left: -100%;
-    width: 200%;
-    height: 100%;
-    background: linear-gradient(90deg, transparent, rgba(255, 255, 255, 0.03), transparent);
-    animation: shimmer 3s infinite;
-}}
-
-@keyframes shimmer {{
-    0% {{ transform: translateX(-100%); }}
-    100% {{ transform: translateX(100%); }}
-}}
-
-.logo {{
-    background: linear-gradient(135deg, #00D4FF 0%, #0091FF 100%);
-    color: #060A12;
-    padding: 16px 22px;
-    border-radius: 18px;
-    font-weight: 900;
-    font-size: 12px;
-    line-height: 1.4;
-    text-align: center;
-    letter-spacing: 0.8px;
-    box-shadow: 
-        0 8px 32px rgba(0, 212, 255, 0.4),
-        inset 0 2px 0 rgba(255, 255, 255, 0.5);
-    text-transform: uppercase;
-}}
-
-.title {{
-    font-size: 38px;
-    font-weight: 900;
-    background: linear-gradient(135deg, #FFFFFF 0%, #00D4FF 100%);
-    -webkit-background-clip: text;
-    -webkit-text-fill-color: transparent;
-    background-clip: text;
-    letter-spacing: -1px;
-    text-shadow: 0 0 40px rgba(0, 212, 255, 0.3);
-}}
-
-.subtitle {{
-    font-size: 15px;
-    color: rgba(255, 255, 255, 0.5);
-    margin-top: 6px;
-    font-weight: 600;
-    letter-spacing: 0.5px;
-}}
-
-.header-badge {{
-    font-size: 18px;
-    font-weight: 800;
-    color: #00FF9F;
-    padding: 14px 28px;
-    background: rgba(0, 255, 159, 0.12);
-    border: 2px solid rgba(0, 255, 159, 0.3);
-    border-radius: 16px;
-    box-shadow: 
-        0 0 30px rgba(0, 255, 159, 0.3),
-        inset 0 1px 0 rgba(255, 255, 255, 0.1);
-    text-transform: uppercase;
-    letter-spacing: 1px;
-}}
-
-/* ==================== SUMMARY ==================== */
-.summary {{
-    display: grid;
-    grid-template-columns: 1fr 1fr 1fr;
-    gap: 15px;
-    margin-bottom: 15px;
-}}
-
-.summary-card {{
-    background: linear-gradient(135deg, rgba(15, 23, 42, 0.9) 0%, rgba(8, 15, 30, 0.9) 100%);
-    backdrop-filter: blur(20px);
-    border: 1px solid rgba(255, 255, 255, 0.08);
-    border-radius: 18px;
-    padding: 18px;
-    box-shadow: 
-        0 15px 50px rgba(0, 0, 0, 0.4),
-        inset 0 1px 0 rgba(255, 255, 255, 0.08);
-    transition: all 0.3s ease;
-}}
-
-.summary-card:hover {{
-    transform: translateY(-5px);
-    box-shadow: 0 20px 60px rgba(0, 0, 0, 0.5);
-    border-color: rgba(0, 212, 255, 0.3);
-}}
-
-.summary-label {{
-    font-size: 12px;
-    color: rgba(255, 255, 255, 0.5);
-    font-weight: 700;
-    text-transform: uppercase;
-    letter-spacing: 1.5px;
-    margin-bottom: 12px;
-}}
-
-.summary-number {{
-    font-size: 42px;
-    font-weight: 900;
-    background: linear-gradient(135deg, #FFFFFF 0%, #00D4FF 100%);
-    -webkit-background-clip: text;
-    -webkit-text-fill-color: transparent;
-    background-clip: text;
-}}
-
-/* ==================== PROGRESO GLOBAL ==================== */
-.global-progress {{
-    margin-top: 8px;
-}}
-
-.progress-track {{
-    height: 28px;
-    border-radius: 20px;
-    background: rgba(255, 255, 255, 0.05);
-    border: 1px solid rgba(255, 255, 255, 0.1);
-    overflow: hidden;
-    position: relative;
-}}
-
-.progress-active {{
-    height: 100%;
-    width: {porcentaje_total:.1f}%;
-    background: linear-gradient(90deg, #00FF9F 0%, #00D4FF 100%);
-    border-radius: 20px;
-    position: relative;
-    transition: width 2s cubic-bezier(0.4, 0, 0.2, 1);
-    box-shadow: 
-        0 0 30px rgba(0, 255, 159, 0.5),
-        inset 0 2px 0 rgba(255, 255, 255, 0.3);
-}}
-
-.progress-active::before {{
-    content: '';
-    position: absolute;
-    top: 0;
-    left: 0;
-    width: 100%;
-    height: 50%;
-    background: linear-gradient(180deg, rgba(255, 255, 255, 0.08) 0%, transparent 100%);
-    pointer-events: none;
-    z-index: 2;
-}}
-
-.progress-active::after {{
-    content: '';
-    position: absolute;
-    top: 0;
-    left: 0;
-    right: 0;
-    height: 50%;
-    background: linear-gradient(180deg, rgba(255, 255, 255, 0.4) 0%, transparent 100%);
-}}
-
-.progress-percent {{
-    text-align: right;
-    font-size: 18px;
-    font-weight: 900;
-    margin-top: 10px;
-    color: #00FF9F;
-    text-shadow: 0 0 20px rgba(0, 255, 159, 0.5);
-}}
-
-/* ==================== PANEL ==================== */
-.panel {{
-    display: grid;
-    grid-template-columns: 1fr 1fr;
-    gap: 15px;
-    margin-bottom: 15px;
-}}
-
-.panel-card {{
-    background: linear-gradient(135deg, rgba(15, 23, 42, 0.9) 0%, rgba(8, 15, 30, 0.9) 100%);
-    backdrop-filter: blur(20px);
-    border: 1px solid rgba(255, 255, 255, 0.08);
-    border-radius: 18px;
-    padding: 16px;
-    box-shadow: 
-        0 15px 50px rgba(0, 0, 0, 0.4),
-        inset 0 1px 0 rgba(255, 255, 255, 0.08);
-    transition: all 0.3s ease;
-}}
-
-.panel-card:hover {{
-    transform: translateY(-3px);
-    box-shadow: 0 20px 60px rgba(0, 0, 0, 0.5);
-}}
-
-.panel-label {{
-    font-size: 11px;
-    color: rgba(255, 255, 255, 0.5);
-    font-weight: 700;
-    text-transform: uppercase;
-    letter-spacing: 1.5px;
-    margin-bottom: 8px;
-}}
-
-.panel-title {{
-    font-size: 24px;
-    font-weight: 900;
-    margin-bottom: 12px;
-}}
-
-.panel-info {{
-    font-size: 14px;
-    color: rgba(255, 255, 255, 0.7);
-    margin-top: 8px;
-    font-weight: 600;
-}}
-
-/* ==================== GRID 2x2 MEDICAMENTOS ==================== */
-.grid {{
-    display: grid;
-    grid-template-columns: repeat(2, 1fr);
-    gap: 15px;
-}}
-
-/* ==================== TARJETAS MEDICAMENTOS ULTRA PREMIUM ==================== */
-.med-card {{
-    background: linear-gradient(135deg, rgba(15, 23, 42, 0.95) 0%, rgba(8, 15, 30, 0.95) 100%);
-    backdrop-filter: blur(30px) saturate(180%);
-    border: 1px solid rgba(255, 255, 255, 0.1);
-    border-radius: 20px;
-    padding: 18px;
-    min-height: 420px;
-    display: flex;
-    flex-direction: column;
-    box-shadow: 
-        0 20px 60px rgba(0, 0, 0, 0.5),
-        inset 0 1px 0 rgba(255, 255, 255, 0.1);
-    transition: all 0.5s cubic-bezier(0.4, 0, 0.2, 1);
-    position: relative;
-    overflow: hidden;
-}}
-
-.med-card::before {{
-    content: '';
-    position: absolute;
-    top: -50%;
-    right: -50%;
-    width: 200%;
-    height: 200%;
-    background: radial-gradient(circle, rgba(255, 255, 255, 0.03) 0%, transparent 70%);
-    pointer-events: none;
-    transition: opacity 0.5s;
-}}
-
-.med-card:hover {{
-    transform: translateY(-12px) scale(1.02);
-    border-color: rgba(0, 212, 255, 0.5);
-    box-shadow: 
-        0 30px 80px rgba(0, 0, 0, 0.6),
-        0 0 60px rgba(0, 212, 255, 0.3),
-        inset 0 1px 0 rgba(255, 255, 255, 0.2);
-}}
-
-.med-card:hover::before {{
-    opacity: 1.8;
-}}
-
-.med-header {{
-    display: flex;
-    justify-content: space-between;
-    align-items: flex-start;
-    margin-bottom: 12px;
-    gap: 8px;
-}}
-
-.med-title {{
-    font-size: 15px;
-    font-weight: 900;
-    background: linear-gradient(135deg, #FFFFFF 0%, #C5D9FF 100%);
-    -webkit-background-clip: text;
-    -webkit-text-fill-color: transparent;
-    background-clip: text;
-    flex: 1;
-    line-height: 1.3;
-}}
-
-.med-badge {{
-    padding: 6px 12px;
-    border-radius: 10px;
-    font-size: 12px;
-    font-weight: 900;
-    text-align: center;
-    min-width: 60px;
-    box-shadow: 0 4px 16px rgba(0, 0, 0, 0.2);
-}}
-
-.med-body {{
-    display: flex;
-    justify-content: center;
-    align-items: center;
-    gap: 16px;
-    margin: 12px 0;
-    flex: 1;
-}}
-
-/* ==================== IMÁGENES MEJORADAS ==================== */
-.med-image-container {{
-    width: 130px;
-    height: 160px;
-    border-radius: 18px;
-    position: relative;
-    background: linear-gradient(135deg, rgba(255, 255, 255, 0.03) 0%, rgba(255, 255, 255, 0.01) 100%);
-    border: 1px solid rgba(255, 255, 255, 0.08);
-    display: flex;
-    justify-content: center;
-    align-items: center;
-    overflow: hidden;
-    box-shadow: 
-        inset 0 2px 20px rgba(0, 0, 0, 0.3),
-        0 8px 24px rgba(0, 0, 0, 0.2);
-}}
-
-.image-glow {{
-    position: absolute;
-    width: 100%;
-    height: 100%;
-    border-radius: 18px;
-    filter: blur(30px);
-    opacity: 0.4;
-    z-index: 0;
-}}
-
-.img-wrapper {{
-    position: relative;
-    width: 100px;
-    height: 100px;
-    z-index: 1;
-}}
-
-.img-base {{
-    position: absolute;
-    width: 100px;
-    height: 100px;
-    filter: grayscale(100%) brightness(0.3);
-    opacity: 0.4;
-    z-index: 1;
-}}
-
-.img-fill-container {{
-    position: absolute;
-    bottom: 0;
-    left: 0;
-    width: 100px;
-    overflow: hidden;
-    z-index: 2;
-    transition: height 1.5s cubic-bezier(0.4, 0, 0.2, 1);
-}}
-
-.img-colored {{
-    position: absolute;
-    bottom: 0;
-    width: 100px;
-    height: 100px;
-}}
-
-.img-shimmer {{
-    position: absolute;
-    top: 0;
-    left: 0;
-    width: 100px;
-    height: 100px;
-    background: linear-gradient(135deg, 
-        transparent 0%, 
-        rgba(255, 255, 255, 0.1) 45%, 
-        rgba(255, 255, 255, 0.25) 50%, 
-        rgba(255, 255, 255, 0.1) 55%, 
-        transparent 100%);
-    z-index: 3;
-    pointer-events: none;
-    animation: shimmer-img 3s infinite;
-}}
-
-@keyframes shimmer-img {{
-    0% {{ transform: translateX(-100%); }}
-    100% {{ transform: translateX(100%); }}
-}}
-
-.med-thermo {{
-    width: 90px;
-    height: 160px;
-}}
-
-/* ==================== ESTADÍSTICAS ==================== */
-.med-stats {{
-    display: grid;
-    grid-template-columns: 1fr auto 1fr auto 1fr;
-    align-items: center;
-    padding: 12px;
-    background: rgba(255, 255, 255, 0.02);
-    border-radius: 12px;
-    border: 1px solid rgba(255, 255, 255, 0.05);
-    margin-bottom: 12px;
-}}
-
-.stat-item {{
-    text-align: center;
-}}
-
-.stat-label {{
-    font-size: 9px;
-    color: rgba(255, 255, 255, 0.5);
-    font-weight: 700;
-    text-transform: uppercase;
-    letter-spacing: 0.5px;
-    margin-bottom: 4px;
-}}
-
-.stat-value {{
-    font-size: 14px;
-    font-weight: 900;
-    color: #FFFFFF;
-}}
-
-.stat-value.warning {{
-    color: #FFB800;
-}}
-
-.stat-divider {{
-    width: 1px;
-    height: 30px;
-    background: rgba(255, 255, 255, 0.1);
-}}
-
-/* ==================== BARRA DE PROGRESO ==================== */
-.progress-bar {{
-    height: 22px;
-    border-radius: 16px;
-    background: rgba(255, 255, 255, 0.04);
-    border: 1px solid rgba(255, 255, 255, 0.08);
-    overflow: hidden;
-    position: relative;
-}}
-
-.progress-bar::before {{
-    content: '';
-    position: absolute;
-    top: 0;
-    left: 0;
-    right: 0;
-    height: 50%;
-    background: linear-gradient(180deg, rgba(255, 255, 255, 0.08) 0%, transparent 100%);
-    pointer-events: none;
-    z-index: 2;
-}}
-
-.progress-fill {{
-    height: 100%;
-    transition: width 1.5s cubic-bezier(0.4, 0, 0.2, 1);
-    position: relative;
-    z-index: 1;
-}}
-
-.progress-fill::after {{
-    content: '';
-    position: absolute;
-    top: 0;
-    left: 0;
-    right: 0;
-    height: 50%;
-    background: linear-gradient(180deg, rgba(255, 255, 255, 0.25) 0%, transparent 100%);
-}}
-
-.progress-glow {{
-    position: absolute;
-    top: 0;
-    left: 0;
-    height: 100%;
-    filter: blur(12px);
-    transition: width 1.5s cubic-bezier(0.4, 0, 0.2, 1);
-}}
-
-/* ==================== OVERLAY DONACIÓN ==================== */
-.donation-overlay {{
-    position: fixed;
-    top: 30px;
-    right: 30px;
-    padding: 20px 28px;
-    background: linear-gradient(135deg, rgba(15, 23, 42, 0.98) 0%, rgba(8, 15, 30, 0.98) 100%);
-    backdrop-filter: blur(30px) saturate(180%);
-    border: 1px solid rgba(0, 212, 255, 0.4);
-    border-radius: 20px;
-    font-weight: 700;
-    font-size: 15px;
-    z-index: 999;
-    box-shadow: 
-        0 20px 60px rgba(0, 0, 0, 0.6),
-        0 0 40px rgba(0, 212, 255, 0.3),
-        inset 0 1px 0 rgba(255, 255, 255, 0.15);
-    animation: slideInRight 0.6s cubic-bezier(0.4, 0, 0.2, 1);
-    min-width: 280px;
-}}
-
-@keyframes slideInRight {{
-    from {{
-        transform: translateX(500px);
-        opacity: 0;
-    }}
-    to {{
-        transform: translateX(0);
-        opacity: 1;
-    }}
-}}
-
-.donation-header {{
-    opacity: 0.6;
-    font-size: 11px;
-    text-transform: uppercase;
-    letter-spacing: 1px;
-    margin-bottom: 8px;
-    font-weight: 800;
-}}
-
-.donation-name {{
-    font-size: 18px;
-    color: #00FF9F;
-    font-weight: 900;
-    margin-bottom: 12px;
-    text-shadow: 0 0 20px rgba(0, 255, 159, 0.5);
-}}
-
-.donation-details {{
-    margin-top: 12px;
-    padding-top: 12px;
-    border-top: 1px solid rgba(255, 255, 255, 0.1);
-    display: flex;
-    justify-content: space-between;
-    gap: 16px;
-}}
-
-.donation-detail {{
-    flex: 1;
-}}
-
-.donation-detail-label {{
-    font-size: 10px;
-    opacity: 0.6;
-    text-transform: uppercase;
-    letter-spacing: 0.5px;
-    margin-bottom: 4px;
-}}
-
-.donation-detail-value {{
-    font-size: 16px;
-    font-weight: 900;
-    color: #00D4FF;
-}}
-
-/* ==================== RESPONSIVE ==================== */
-@media (max-width: 1400px) {{
-    .grid {{ grid-template-columns: repeat(3, 1fr); }}
-}}
-
-@media (max-width: 1024px) {{
-    .grid {{ grid-template-columns: repeat(2, 1fr); }}
-    .summary {{ grid-template-columns: 1fr; }}
-    .panel {{ grid-template-columns: 1fr; }}
-}}
-
-@media (max-width: 768px) {{
-    .grid {{ grid-template-columns: 1fr; }}
-}}
-</style>
-</head>
-
-<body>
-
-<!-- OVERLAY ÚLTIMA DONACIÓN -->
-<div class="donation-overlay">
-    <div class="donation-header">🎁 Última donación</div>
-    <div class="donation-name">{ultimo_donante}</div>
-    <div class="donation-details">
-        <div class="donation-detail">
-            <div class="donation-detail-label">Monto</div>
-            <div class="donation-detail-value">{formatear_numero(ultimo_monto)}</div>
-        </div>
-        <div class="donation-detail">
-            <div class="donation-detail-label">Hora</div>
-            <div class="donation-detail-value">{ultima_hora}</div>
-        </div>
-    </div>
-</div>
-
-<div class="main">
-
-    <!-- HEADER -->
-    <div class="header">
-        <div style="display: flex; align-items: center; gap: 24px;">
-            <div class="logo">Generosidad<br>Colombia<br>2026</div>
-            <div>
-                <div class="title">Círculo de Generosidad 2026</div>
-                <div class="subtitle">{fecha_hoy}</div>
-            </div>
-        </div>
-</div><div class="header-badge">Cuba nos necesita</div></div></div></div>
-
-    <!-- SUMMARY -->
-    <div class="summary">
-        <div class="summary-card">
-            <div class="summary-label">Total Meta</div>
-            <div class="summary-number">{formatear_numero(total_meta)}</div>
-        </div>
-
-        <div class="summary-card">
-            <div class="summary-label">Total Recolectado</div>
-            <div class="summary-number">{formatear_numero(total_recaudado)}</div>
-        </div>
-
-        <div class="summary-card">
-            <div class="summary-label">Avance Global</div>
-            <div class="global-progress">
-                <div class="progress-track">
-                    <div class="progress-active"></div>
-                </div>
-                <div class="progress-percent">{porcentaje_total:.1f}%</div>
-            </div>
-        </div>
-    </div>
-
-    <!-- PANEL -->
-    <div class="panel">
-        <div class="panel-card">
-            <div class="panel-label">🎯 Medicamento más crítico</div>
-            <div class="panel-title" style="color: #FF3D71;">{critico_nombre}</div>
-            <div class="panel-info">Avance: <b>{critico_pct:.1f}%</b></div>
-            <div class="panel-info">Faltan: <b style="color: #FFB800;">{formatear_numero(critico_faltante)}</b></div>
-        </div>
-
-        <div class="panel-card">
-            <div class="panel-label">🚀 Medicamento más avanzado</div>
-            <div class="panel-title" style="color: #00FF9F;">{mas_av_nombre}</div>
-            <div class="panel-info">Avance: <b>{mas_av_pct:.1f}%</b></div>
-        </div>
-    </div>
-
-    <!-- GRID 2x2 -->
-    <div class="grid">
-        {cards_html}
-    </div>
-
-</div>
-
-<script>
-    // ✅ CONFETI INTELIGENTE - Solo se activa cuando hay NUEVA donación
-    const mostrarConfeti = {str(st.session_state.mostrar_confeti).lower()};
-    
-    if(mostrarConfeti) {{
-        // Celebración por nueva donación
-        confetti({{
-            particleCount: 200,
-            spread: 120,
-            origin: {{ y: 0.6 }},
-            colors: ['#00D4FF', '#FF3D71', '#00FF9F', '#B24BF3', '#FFB800']
-        }});
-        
-        setTimeout(() => {{
-            confetti({{
-                particleCount: 150,
-                angle: 60,
-                spread: 80,
-                origin: {{ x: 0 }},
-                colors: ['#00D4FF', '#00FF9F']
-            }});
-        }}, 250);
-        
-        setTimeout(() => {{
-            confetti({{
-                particleCount: 150,
-                angle: 120,
-                spread: 80,
-                origin: {{ x: 1 }},
-                colors: ['#FF3D71', '#B24BF3']
-            }});
-        }}, 500);
-    }}
-</script>
-
-</body>
-</html>
-"""
-
-components.html(html, height=1400, scrolling=True)
+        # Solo llega aquí en arranque en frío sin ninguna copia buena que mostrar
+        st.error("❌ Error cargando datos desde la API")
+        st.write(e)
+        st.stop()
+
+    # ==============================
+    # INICIALIZAR SESSION STATE
+    # ==============================
+    # Huellas de las donaciones ya vistas por esta sesión (referencia al array
+    # compartido del tick anterior, no una copia)
+    if 'huellas_vistas' not in st.session_state:
+        st.session_state.huellas_vistas = None
+
+    if 'mostrar_confeti' not in st.session_state:
+        st.session_state.mostrar_confeti = False
+
+    # La última versión "buena" es el snapshot del cliente API, compartido por
+    # todo el proceso: las sesiones no guardan copias de las donaciones
+    # Guardar hash de dataset completo
+    st.session_state.hash_donaciones = snapshot.hash_donaciones
+
+    # ==============================
+    # CACHÉ DE RENDER POR HASH DEL DATASET
+    # ==============================
+    @st.cache_resource(show_spinner=False)
+    def obtener_motor_totales():
+        # Totales por medicamento compartidos por proceso; se actualizan solo
+        # con las filas nuevas de cada snapshot
+        return MotorTotales()
+
+    @st.cache_resource(max_entries=16, show_spinner=False)
+    def construir_dashboard(hash_donaciones, hash_metas, fecha_hoy, modo_render, _snapshot):
+        # Clave = (hash donaciones, hash metas, fecha). El snapshot va con "_" para
+        # que Streamlit no lo hashee: un tick sin cambios solo compara los hashes.
+        # cache_resource: todas las sesiones comparten el mismo resultado sin
+        # copiarlo (es de solo lectura).
+        metricas.contar("cache_fallos_total", cache="render")
+        estado = obtener_motor_totales().actualizar(_snapshot)
+        dashboard = {
+            "avance": estado.avance,
+            "ultima": estado.ultima,
+            "resumen": estado.resumen,
+            "huellas": estado.huellas,
+        }
+        with metricas.medir(f"render.{modo_render}", medicamentos=len(estado.lista_medicamentos)):
+            if modo_render == "delta":
+                dashboard["estado"] = estado_tablero(estado.avance, estado.lista_medicamentos, estado.ultima, fecha_hoy)
+            else:
+                dashboard["html"] = pagina_html(estado.avance, estado.lista_medicamentos, estado.ultima, fecha_hoy)
+        return dashboard
+
+    # ==============================
+    # MÉTRICAS PARA PROMETHEUS
+    # ==============================
+    # Con DASHBOARD_METRICAS_PUERTO se sirve /metrics en ese puerto (local, ver
+    # metricas.py). Los indicadores se calculan en cada lectura del scraper.
+    # Si el puerto está ocupado la excepción no queda en caché: cada rerun lo
+    # vuelve a intentar y cada sesión lo avisa una vez
+
+    @st.cache_resource(show_spinner=False)
+    def iniciar_metricas(puerto):
+        cliente = obtener_cliente_api(API_URL)
+        motor = obtener_motor_totales()
+        metricas.indicador("sesiones_activas", "Sesiones de navegador abiertas en este proceso", sesiones_activas)
+        metricas.indicador("snapshot_edad_segundos", "Segundos desde que se obtuvo el snapshot de la API", cliente.edad)
+        metricas.indicador("datos_antiguedad_segundos", "Segundos desde la donación más reciente (ahora - fecha_hora)",
+                           motor.antiguedad)
+        if hasattr(cliente, "circuito_abierto"):
+            metricas.indicador("api_circuito_abierto", "1 si el circuit breaker corta las llamadas a la API",
+                               lambda: int(cliente.circuito_abierto()))
+        return metricas.iniciar_servidor(puerto)
+
+    if METRICAS_PUERTO:
+        try:
+            iniciar_metricas(METRICAS_PUERTO)
+        except OSError as e:
+            if not st.session_state.get("aviso_metricas"):
+                st.session_state.aviso_metricas = True
+                log.warning("No se pudo iniciar el endpoint de métricas en el puerto %d: %s", METRICAS_PUERTO, e)
+                st.warning(f"⚠️ Sin endpoint de métricas en el puerto {METRICAS_PUERTO}: {e}")
+
+    fecha_hoy = datetime.now().strftime("%d de %B de %Y")
+    metricas.contar("cache_consultas_total", cache="render")
+    with metricas.medir("app.dashboard", filas=snapshot.donaciones.num_rows):
+        dashboard = construir_dashboard(snapshot.hash_donaciones, snapshot.hash_metas, fecha_hoy, MODO_RENDER, snapshot)
+    avance = dashboard["avance"]
+
+    # ==============================
+    # DETECCIÓN NUEVA DONACIÓN
+    # ==============================
+    huellas_vistas = st.session_state.huellas_vistas
+
+    with metricas.medir("app.deteccion") as etapa:
+        if huellas_vistas is None:
+            # Primera carga de la sesión: se celebra la última donación
+            nuevas = [dashboard["ultima"]] if dashboard["ultima"] is not None else []
+        elif huellas_vistas is dashboard["huellas"]:
+            nuevas = []
+        else:
+            nuevas = donaciones_nuevas(dashboard["resumen"], huellas_vistas)
+        etapa.anotar(nuevas=len(nuevas))
+
+    st.session_state.huellas_vistas = dashboard["huellas"]
+    hay_nueva_donacion = len(nuevas) > 0
+    st.session_state.mostrar_confeti = hay_nueva_donacion
+
+    with metricas.medir(f"app.componente.{MODO_RENDER}") as etapa:
+        if MODO_RENDER == "delta":
+            tablero(
+                estado=dict(dashboard["estado"], confeti=st.session_state.mostrar_confeti, nuevas=cola_tablero(nuevas)),
+                key="tablero",
+                default=None,
+            )
+        else:
+            html = dashboard["html"].rellenar(
+                mostrar_confeti=str(st.session_state.mostrar_confeti).lower(),
+                nuevas_donaciones=cola_donaciones_json(nuevas),
+            )
+            etapa.anotar(bytes=len(html))
+
+            components.html(html, height=1400, scrolling=True)
+
+    metricas.registrar("app.rerun", time.perf_counter() - inicio_rerun)
+
+    if DIAGNOSTICO:
+        edad = obtener_cliente_api(API_URL).edad()
+        with st.expander("⏱️ Diagnóstico de rendimiento", expanded=True):
+            st.caption(
+                f"{snapshot.donaciones.num_rows} donaciones · datos de hace {edad or 0:.1f} s · "
+                f"versión {snapshot.version or '-'} · p50/p95/p99 de las últimas {metricas.VENTANA} mediciones por etapa"
+            )
+            st.dataframe(pd.DataFrame(metricas.resumen()), hide_index=True)
+
+    if PERFIL is not None:
+        # Se guarda en la sesión: el resultado sigue a la vista en los siguientes ticks
+        st.session_state.perfil = perfilado.terminar(PERFIL)
+finally:
+    # Con una excepción o st.stop() a medias el perfilador no queda encendido
+    perfilado.detener(PERFIL)
+
+if 'perfil' in st.session_state:
+    ruta_perfil, tabla_perfil = st.session_state.perfil
+    with st.expander("🔬 Perfil de este rerun (cProfile)", expanded=True):
+        st.caption(
+            f"Guardado en {ruta_perfil or '(no se pudo guardar)'} · "
+            f"{len(tabla_perfil)} funciones con más tiempo acumulado; clic en una columna para ordenar"
+        )
+        st.dataframe(tabla_perfil, hide_index=True)
@@ -0,0 +1,74 @@
+"""Benchmark: agregación columnar vs. el antiguo melt + groupby + apply.
+
+    python benchmarks/bench_agregacion.py --filas 100000
+
+Compara la coerción numérica y el cálculo de `avance` contra una copia de
+la implementación anterior y verifica que ambas den el mismo resultado.
+"""
+import os
+import sys
+import argparse
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from generador import generar  # noqa: E402
+from medicion import mejor_de  # noqa: E402
+from procesamiento import normalizar_metas, coercer_bloque_numerico, calcular_avance  # noqa: E402
+
+
+# ==============================
+# IMPLEMENTACIÓN ANTERIOR (referencia)
+# ==============================
+def coercer_anterior(donaciones, lista_medicamentos):
+    for med in lista_medicamentos:
+        if med not in donaciones.columns:
+            donaciones[med] = 0
+        donaciones[med] = pd.to_numeric(donaciones[med], errors="coerce").fillna(0)
+    return donaciones
+
+
+def calcular_avance_anterior(donaciones, metas, lista_medicamentos):
+    donaciones_largo = donaciones.melt(
+        id_vars=[c for c in donaciones.columns if c not in lista_medicamentos],
+        value_vars=lista_medicamentos,
+        var_name="medicamento",
+        value_name="cantidad"
+    )
+    donaciones_largo = donaciones_largo[donaciones_largo["cantidad"] > 0]
+    donado_por_med = donaciones_largo.groupby("medicamento", as_index=False)["cantidad"].sum()
+    avance = metas.merge(donado_por_med, on="medicamento", how="left")
+    avance["cantidad"] = avance["cantidad"].fillna(0)
+    avance["faltante"] = (avance["meta"] - avance["cantidad"]).clip(lower=0)
+    avance["porcentaje"] = avance.apply(lambda r: (r["cantidad"] / r["meta"] * 100) if r["meta"]>0 else 0, axis=1)
+    return avance
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--filas", type=int, default=100_000)
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--basura", type=float, default=0.05, help="proporción de cantidades con texto no numérico")
+    args = parser.parse_args()
+
+    datos = generar(args.filas, basura=args.basura)
+    donaciones_raw, metas_raw = datos["donaciones"], datos["metas"]
+    metas, lista = normalizar_metas(pd.DataFrame(metas_raw[1:], columns=metas_raw[0]))
+    base = pd.DataFrame(donaciones_raw[1:], columns=donaciones_raw[0])
+
+    t_coer_ant, d_ant = mejor_de(lambda: coercer_anterior(base.copy(), lista), args.repeticiones)
+    t_coer_nue, bloque = mejor_de(lambda: coercer_bloque_numerico(base[lista]), args.repeticiones)
+    d_nue = base.copy()
+    d_nue[lista] = bloque
+    t_agr_ant, av_ant = mejor_de(lambda: calcular_avance_anterior(d_ant, metas, lista), args.repeticiones)
+    t_agr_nue, av_nue = mejor_de(lambda: calcular_avance(d_nue, metas, lista), args.repeticiones)
+
+    pd.testing.assert_frame_equal(av_ant.reset_index(drop=True), av_nue.reset_index(drop=True), check_dtype=False)
+
+    print(f"filas: {args.filas:,}  (mejor de {args.repeticiones})")
+    print(f"coerción numérica   anterior {t_coer_ant * 1000:8.1f} ms   por bloque {t_coer_nue * 1000:8.1f} ms   "
+          f"x{t_coer_ant / t_coer_nue:.1f}")
+    print(f"agregación avance   anterior {t_agr_ant * 1000:8.1f} ms   columnar {t_agr_nue * 1000:8.1f} ms   "
+          f"x{t_agr_ant / t_agr_nue:.1f}")
+    print("resultado idéntico ✓")
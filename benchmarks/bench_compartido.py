@@ -0,0 +1,68 @@
+"""Benchmark: réplicas con ClienteAPI propio vs. leyendo el snapshot compartido.
+
+    python benchmarks/bench_compartido.py --filas 100000 --replicas 4
+
+Con un ClienteAPI por réplica, cada proceso descarga y decodifica la hoja
+(y las llamadas a la API se multiplican por el número de réplicas). Con el
+recolector (snapshot_compartido.py) solo él lo hace; cada réplica mapea
+las tablas publicadas. Se mide lo que cuesta en una réplica tener el
+snapshot listo en ambos casos y la memoria de Arrow que asigna.
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import threading
+
+import pyarrow as pa
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datos import CACHE_TTL, ClienteAPI  # noqa: E402
+from generador import generar  # noqa: E402
+from medicion import mejor_de  # noqa: E402
+from servidor_local import HojaLocal, crear_servidor  # noqa: E402
+from snapshot_compartido import LectorSnapshot, PublicadorSnapshot  # noqa: E402
+
+def memoria_arrow(fn):
+    # Bytes de Arrow que siguen reservados con el snapshot listo
+    antes = pa.total_allocated_bytes()
+    snapshot = fn()
+    asignado = pa.total_allocated_bytes() - antes
+    del snapshot
+    return asignado
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--filas", type=int, default=100_000)
+    parser.add_argument("--replicas", type=int, default=4)
+    parser.add_argument("--repeticiones", type=int, default=3)
+    args = parser.parse_args()
+
+    datos = generar(args.filas)
+    servidor = crear_servidor(HojaLocal(datos["donaciones"], datos["metas"]), puerto=0)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{servidor.server_address[1]}"
+
+    def con_cliente():
+        return ClienteAPI(url, copia_local=None)._ingerir(None)
+
+    directorio = tempfile.mkdtemp()
+    PublicadorSnapshot(directorio).publicar(con_cliente())
+
+    def con_lector():
+        return LectorSnapshot(directorio).obtener()
+
+    # Reloj de pared: el servidor local corre en otro hilo de este proceso
+    t_cli, _ = mejor_de(con_cliente, args.repeticiones, reloj=time.perf_counter)
+    t_lec, _ = mejor_de(con_lector, args.repeticiones, reloj=time.perf_counter)
+    mem_cli, mem_lec = memoria_arrow(con_cliente), memoria_arrow(con_lector)
+    servidor.shutdown()
+
+    print(f"filas: {args.filas:,}  réplicas: {args.replicas}  (snapshot listo en una réplica, mejor de {args.repeticiones})")
+    print(f"ClienteAPI propio   {t_cli * 1e3:8.1f} ms   {mem_cli / 2**20:7.1f} MiB Arrow   "
+          f"{args.replicas * 60 / CACHE_TTL:5.0f} llamadas/min a la API")
+    print(f"snapshot compartido {t_lec * 1e3:8.1f} ms   {mem_lec / 2**20:7.1f} MiB Arrow   "
+          f"{60 / CACHE_TTL:5.0f} llamadas/min a la API   x{t_cli / t_lec:.0f}")
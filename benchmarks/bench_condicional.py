@@ -0,0 +1,108 @@
+"""Benchmark: refresco con la hoja sin cambios, con y sin token de versión.
+
+    python benchmarks/bench_condicional.py --filas 100000
+
+Contra servidor_local.py en un hilo. Sin token, cada tick descarga la hoja
+completa (o, con ingesta incremental, la cabecera y las metas) y la
+decodifica para descubrir que no cambió nada. Con token (ETag en
+`If-None-Match`) el servidor responde 304. Se mide por tick los bytes que
+escribe el servidor y el tiempo de `_ingerir` en el cliente.
+
+Al final se comprueba que añadir una fila con medicamentos vacíos y hacer
+después la recarga completa periódica no cambia el hash ni la carga: si no,
+cada recarga reconstruiría MotorTotales y el render aunque la hoja sea la
+misma.
+"""
+import os
+import sys
+import time
+import logging
+import argparse
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datos import ClienteAPI  # noqa: E402
+from generador import CABECERA, generar  # noqa: E402
+from medicion import mejor_de  # noqa: E402
+from servidor_local import HojaLocal, crear_servidor  # noqa: E402
+
+class ContarBytes:
+    total = 0
+
+    def __init__(self, wfile):
+        self._wfile = wfile
+
+    def write(self, datos):
+        ContarBytes.total += len(datos)
+        return self._wfile.write(datos)
+
+    def __getattr__(self, nombre):
+        return getattr(self._wfile, nombre)
+
+
+def medir_tick(cliente, anterior, repeticiones):
+    bytes_antes = ContarBytes.total
+    # Reloj de pared: el servidor local corre en otro hilo de este proceso
+    mejor, snapshot = mejor_de(lambda: cliente._ingerir(anterior), repeticiones, reloj=time.perf_counter)
+    assert snapshot.hash_donaciones == anterior.hash_donaciones
+    return mejor, (ContarBytes.total - bytes_antes) / repeticiones
+
+
+def comprobar_anexar(hoja, url, formatos):
+    cliente = ClienteAPI(url, copia_local=None, incremental=True, formatos=formatos)
+    anterior = cliente._ingerir(None)
+    cabecera = anterior.donaciones.column_names
+    # Una donación de un solo medicamento: el resto de celdas llegan vacías
+    medicamentos = len(cabecera) - len(CABECERA)
+    hoja.agregar([["28/2/2026 23:59:59", "Persona nueva", "Donante nuevo", "", 3] + [""] * (medicamentos - 1)])
+    anexado = cliente._ingerir(anterior)
+    assert anexado.donaciones.schema == anterior.donaciones.schema, "las filas nuevas cambiaron el tipo de columnas"
+    cliente._ultima_carga_completa = float("-inf")
+    recargado = cliente._ingerir(anexado)
+    assert (recargado.hash_donaciones, recargado.carga) == (anexado.hash_donaciones, anexado.carga), \
+        "la recarga completa de la misma hoja invalidó el snapshot"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--filas", type=int, default=100_000)
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--formato", default="json", help="formatos del cliente, p. ej. arrow,csv,json")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    # Sin basura: las columnas de medicamentos llegan como enteros, que es lo
+    # que comprobar_anexar debe conservar
+    datos = generar(args.filas, basura=0)
+    hoja = HojaLocal(datos["donaciones"], datos["metas"])
+    servidor = crear_servidor(hoja, puerto=0)
+
+    class Manejador(servidor.RequestHandlerClass):
+        def setup(self):
+            super().setup()
+            self.wfile = ContarBytes(self.wfile)
+
+    servidor.RequestHandlerClass = Manejador
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{servidor.server_address[1]}"
+
+    resultados = {}
+    for nombre, incremental, con_token in (
+        ("completa", False, False),
+        ("completa + ETag", False, True),
+        ("incremental", True, False),
+        ("incremental + ETag", True, True),
+    ):
+        cliente = ClienteAPI(url, copia_local=None, incremental=incremental, formatos=args.formato.split(","))
+        anterior = cliente._ingerir(None)
+        if not con_token:
+            anterior = anterior._replace(version="")
+        resultados[nombre] = medir_tick(cliente, anterior, args.repeticiones)
+    comprobar_anexar(hoja, url, args.formato.split(","))
+    servidor.shutdown()
+
+    base = resultados["completa"][0]
+    print(f"filas: {args.filas:,}  formato: {args.formato}  (tick sin cambios, mejor de {args.repeticiones})")
+    for nombre, (segundos, bytes_tick) in resultados.items():
+        print(f"{nombre:18} {segundos * 1e3:8.2f} ms   {bytes_tick / 1024:10.1f} KiB por tick   x{base / segundos:.0f}")
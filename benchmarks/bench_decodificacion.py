@@ -0,0 +1,94 @@
+"""Benchmark: decodificación por trozos a columnas tipadas vs. resp.json() + DataFrame.
+
+    python benchmarks/bench_decodificacion.py --filas 100000
+
+Antes la respuesta entera pasaba a texto, después a listas anidadas de
+objetos Python (`resp.json()`), y pandas la copiaba a columnas object
+(`pd.DataFrame(donaciones_raw[1:], ...)`). Ahora se lee en trozos de
+TAMANO_TROZO bytes y cada lote de filas se vuelca a arrays Arrow tipados.
+Se mide CPU y pico de memoria (tracemalloc para objetos Python más el pico
+del pool de Arrow, donde pandas guarda el texto) hasta tener el DataFrame,
+y el coste de normalizarlo después.
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+import tracemalloc
+
+import pandas as pd
+import pyarrow as pa
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from generador import carga, generar, lista_medicamentos  # noqa: E402
+from medicion import mejor_de  # noqa: E402
+from procesamiento import normalizar_donaciones  # noqa: E402
+from tablas import TAMANO_TROZO, decodificar_json  # noqa: E402
+
+MEDICAMENTOS = lista_medicamentos(4)
+
+
+def anterior(cuerpo):
+    data = json.loads(cuerpo.decode("utf-8"))
+    donaciones_raw = data["donaciones"]
+    return pd.DataFrame(donaciones_raw[1:], columns=donaciones_raw[0])
+
+
+def nuevo(cuerpo):
+    trozos = (cuerpo[i:i + TAMANO_TROZO] for i in range(0, len(cuerpo), TAMANO_TROZO))
+    return decodificar_json(trozos)["donaciones"].to_pandas()
+
+
+def medir(fn, cuerpo, repeticiones):
+    mejor, _ = mejor_de(lambda: fn(cuerpo), repeticiones)
+
+    # Pico de memoria en una pasada aparte (tracemalloc ralentiza). Cada
+    # variante corre en su propio proceso: el pico del pool de Arrow es global
+    tracemalloc.start()
+    resultado = fn(cuerpo)
+    pico = tracemalloc.get_traced_memory()[1] + pa.default_memory_pool().max_memory()
+    tracemalloc.stop()
+
+    # Lo siguiente en el pipeline: con columnas tipadas no hay texto que coercer
+    normalizar, _ = mejor_de(lambda: normalizar_donaciones(resultado, MEDICAMENTOS), repeticiones)
+    return {"cpu": mejor, "pico": pico, "normalizar": normalizar, "bytes_df": int(resultado.memory_usage(deep=True).sum()),
+            "columnas": list(resultado.columns), "filas": len(resultado)}
+
+
+def en_proceso(variante, args):
+    salida = subprocess.run(
+        [sys.executable, __file__, "--filas", str(args.filas), "--repeticiones", str(args.repeticiones),
+         "--variante", variante],
+        check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(salida)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--filas", type=int, default=100_000)
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--variante", choices=["anterior", "nuevo"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    # Sin basura: cantidades numéricas, como las serializa Apps Script
+    cuerpo = carga(generar(args.filas, basura=0))
+
+    if args.variante:
+        fn = anterior if args.variante == "anterior" else nuevo
+        print(json.dumps(medir(fn, cuerpo, args.repeticiones)))
+        sys.exit(0)
+
+    ant, nue = en_proceso("anterior", args), en_proceso("nuevo", args)
+    assert ant["columnas"] == nue["columnas"] and ant["filas"] == nue["filas"]
+
+    print(f"filas: {args.filas:,}  respuesta: {len(cuerpo) / 2**20:.1f} MiB  "
+          f"(CPU, mejor de {args.repeticiones})")
+    print(f"decodificar + DataFrame  anterior {ant['cpu'] * 1e3:8.1f} ms   por trozos {nue['cpu'] * 1e3:8.1f} ms   "
+          f"x{ant['cpu'] / nue['cpu']:.1f}")
+    print(f"normalizar_donaciones    anterior {ant['normalizar'] * 1e3:8.1f} ms   por trozos {nue['normalizar'] * 1e3:8.1f} ms   "
+          f"x{ant['normalizar'] / nue['normalizar']:.1f}")
+    print(f"pico de memoria          anterior {ant['pico'] / 2**20:8.1f} MiB  por trozos {nue['pico'] / 2**20:8.1f} MiB  "
+          f"-{(1 - nue['pico'] / ant['pico']) * 100:.0f}%")
+    print(f"DataFrame                anterior {ant['bytes_df'] / 2**20:8.1f} MiB  por trozos {nue['bytes_df'] / 2**20:8.1f} MiB")
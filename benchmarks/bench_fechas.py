@@ -0,0 +1,68 @@
+"""Benchmark: parseo de `fecha_hora` con formato detectado y caché vs. inferencia en cada tick.
+
+    python benchmarks/bench_fechas.py --filas 100000 --nuevas 50
+
+Antes cada reconstrucción pasaba toda la columna por
+`pd.to_datetime(..., dayfirst=True)`, que infiere el formato y parsea fila a
+fila. El lector detecta el formato de Google Forms una vez, parsea con
+formato explícito y, en una carga completa con las mismas filas más unas
+pocas nuevas, solo parsea las nuevas. Se comprueba además que el resultado
+coincide con el anterior.
+"""
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from generador import generar  # noqa: E402
+from medicion import mejor_de  # noqa: E402
+from procesamiento import LectorFechas  # noqa: E402
+
+
+def marcas(filas):
+    # Como las escribe Google Forms en una hoja en español: día y hora sin cero
+    return pd.Series([fila[0] for fila in generar(filas, fechas="forms")["donaciones"][1:]])
+
+
+def anterior(textos):
+    return pd.to_datetime(textos.astype(str).str.strip(), dayfirst=True, errors="coerce").to_numpy()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--filas", type=int, default=100_000)
+    parser.add_argument("--nuevas", type=int, default=50)
+    parser.add_argument("--repeticiones", type=int, default=5)
+    args = parser.parse_args()
+
+    def nuevo():
+        # Sin conversión de zona para comparar con la referencia
+        return LectorFechas(zona_origen="")
+
+    textos = marcas(args.filas + args.nuevas)
+    previas, todas = textos[:args.filas], textos
+
+    t_ant, ref = mejor_de(lambda: anterior(todas), args.repeticiones)
+    t_frio, res = mejor_de(lambda: nuevo().leer(todas), args.repeticiones)
+
+    def con_cache():
+        lector = nuevo()
+        lector.leer(previas)
+        t0 = time.process_time()
+        fechas = lector.leer(todas)
+        return time.process_time() - t0, fechas
+
+    t_cache, res_cache = min((con_cache() for _ in range(args.repeticiones)), key=lambda r: r[0])
+    assert np.array_equal(ref.astype("datetime64[us]"), res, equal_nan=True)
+    assert np.array_equal(res, res_cache, equal_nan=True)
+
+    print(f"filas: {args.filas:,} + {args.nuevas} nuevas  (CPU, mejor de {args.repeticiones})")
+    print(f"carga completa   inferencia {t_ant * 1e3:8.1f} ms   formato detectado {t_frio * 1e3:8.1f} ms   "
+          f"x{t_ant / t_frio:.1f}")
+    print(f"con caché        inferencia {t_ant * 1e3:8.1f} ms   solo filas nuevas {t_cache * 1e3:8.1f} ms   "
+          f"x{t_ant / t_cache:.1f}")
@@ -0,0 +1,78 @@
+"""Benchmark: memoria por sesión y del resumen compartido por proceso.
+
+    python benchmarks/bench_memoria.py --filas 100000 --sesiones 50
+
+Antes cada sesión guardaba su propia copia de las donaciones
+(`st.session_state.donaciones_guardadas`), así que la memoria crecía con
+cada pantalla conectada. Ahora todas leen el mismo snapshot del proceso y
+cada sesión solo guarda referencias. Se mide con tracemalloc lo que añade
+cada sesión simulada en ambos casos, y el tamaño del resumen por donación
+con tipos compactos frente a object/float64.
+"""
+import os
+import sys
+import argparse
+import tracemalloc
+
+import pandas as pd
+import pyarrow as pa
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datos import Snapshot  # noqa: E402
+from generador import generar  # noqa: E402
+from procesamiento import MotorTotales  # noqa: E402
+from tablas import tabla_desde_filas  # noqa: E402
+
+def memoria_sesiones(crear_sesion, sesiones):
+    # Bytes que siguen vivos tras crear N sesiones, divididos por sesión.
+    # pandas guarda el texto en buffers de Arrow, fuera de tracemalloc
+    tracemalloc.start()
+    antes = tracemalloc.get_traced_memory()[0] + pa.total_allocated_bytes()
+    estados = [crear_sesion() for _ in range(sesiones)]
+    despues = tracemalloc.get_traced_memory()[0] + pa.total_allocated_bytes()
+    tracemalloc.stop()
+    del estados
+    return (despues - antes) / sesiones
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--filas", type=int, default=100_000)
+    parser.add_argument("--sesiones", type=int, default=20)
+    args = parser.parse_args()
+
+    # Sin basura: montos enteros, el caso en que el resumen los guarda compactos
+    datos = generar(args.filas, basura=0)
+    donaciones_raw, metas_raw = datos["donaciones"], datos["metas"]
+    snapshot = Snapshot(tabla_desde_filas(donaciones_raw), tabla_desde_filas(metas_raw), 0.0, "donaciones", "metas")
+    estado = MotorTotales().actualizar(snapshot)
+
+    def sesion_anterior():
+        return {
+            "donaciones_guardadas": pd.DataFrame(donaciones_raw[1:], columns=donaciones_raw[0]),
+            "ultima_donacion_id": estado.ultima["id"],
+            "mostrar_confeti": False,
+            "hash_donaciones": snapshot.hash_donaciones,
+        }
+
+    def sesion_actual():
+        return {
+            "huellas_vistas": estado.huellas,
+            "mostrar_confeti": False,
+            "hash_donaciones": snapshot.hash_donaciones,
+        }
+
+    por_sesion_ant = memoria_sesiones(sesion_anterior, args.sesiones)
+    por_sesion_nue = memoria_sesiones(sesion_actual, args.sesiones)
+
+    resumen = estado.resumen
+    resumen_ant = resumen.assign(donante=resumen["donante"].astype(object), monto=resumen["monto"].astype("float64"))
+    bytes_ant = resumen_ant.memory_usage(deep=True).sum()
+    bytes_nue = resumen.memory_usage(deep=True).sum()
+
+    print(f"filas: {args.filas:,}  sesiones: {args.sesiones}")
+    print(f"memoria por sesión     anterior {por_sesion_ant / 2**20:9.2f} MiB   compartida {por_sesion_nue:9.0f} B")
+    print(f"resumen por proceso    anterior {bytes_ant / 2**20:9.2f} MiB   compacto   {bytes_nue / 2**20:6.2f} MiB   "
+          f"-{(1 - bytes_nue / bytes_ant) * 100:.0f}%")
+    print("tipos:", ", ".join(f"{c}={t}" for c, t in resumen.dtypes.astype(str).items()))
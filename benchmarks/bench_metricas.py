@@ -0,0 +1,42 @@
+"""Benchmark: coste de la instrumentación por etapa (metricas.py), apagada y encendida.
+
+    python benchmarks/bench_metricas.py
+
+Apagada, `medir()` devuelve un contexto vacío compartido; encendida guarda
+la duración en la ventana y escribe la línea JSON del log (aquí a un
+handler nulo). Se compara con un rerun del dashboard, que tiene ~12 etapas.
+"""
+import os
+import sys
+import time
+import logging
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import metricas  # noqa: E402
+
+ETAPAS_POR_RERUN = 12
+
+
+def por_llamada(n):
+    t0 = time.perf_counter()
+    for _ in range(n):
+        with metricas.medir("bench.etapa", filas=100) as etapa:
+            etapa.anotar(bytes=1)
+    return (time.perf_counter() - t0) / n
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--llamadas", type=int, default=200_000)
+    args = parser.parse_args()
+
+    apagada = min(por_llamada(args.llamadas) for _ in range(3))
+    metricas.log.addHandler(logging.NullHandler())
+    metricas.log.propagate = False
+    metricas.activar()
+    encendida = min(por_llamada(args.llamadas // 10) for _ in range(3))
+
+    print(f"por etapa   apagada {apagada * 1e9:7.0f} ns   encendida {encendida * 1e6:6.2f} µs")
+    print(f"por rerun   apagada {apagada * ETAPAS_POR_RERUN * 1e6:7.2f} µs   encendida {encendida * ETAPAS_POR_RERUN * 1e6:6.1f} µs")
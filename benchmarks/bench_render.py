@@ -0,0 +1,166 @@
+"""Benchmark: plantilla compilada y tarjetas memoizadas vs. la página armada en cada render.
+
+    python benchmarks/bench_render.py --medicamentos 6
+
+Mide CPU por render (página completa cuando cambian los datos y relleno
+por sesión sobre la página cacheada) y bytes enviados a cada espectador.
+La referencia anterior arma la página sin minificar en cada render, como
+hacía el f-string, con un bloque <defs> por termómetro, y resuelve los
+valores de sesión con str.replace.
+"""
+import os
+import sys
+import argparse
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import render  # noqa: E402
+from activos import URL_CONFETI, URL_FUENTES  # noqa: E402
+from generador import lista_medicamentos  # noqa: E402
+from medicion import mejor_de  # noqa: E402
+from plantilla import Plantilla  # noqa: E402
+from procesamiento import avance_desde_totales, normalizar_metas  # noqa: E402
+
+# ==============================
+# IMPLEMENTACIÓN ANTERIOR (referencia)
+# ==============================
+with open(os.path.join(render.DIR_TABLERO, "pagina.html"), encoding="utf-8") as f:
+    PAGINA_SIN_COMPILAR = f.read()
+with open(os.path.join(render.DIR_TABLERO, "estilos.css"), encoding="utf-8") as f:
+    ESTILOS_SIN_MINIFICAR = f.read()
+with open(os.path.join(render.DIR_TABLERO, "tarjeta.html"), encoding="utf-8") as f:
+    TARJETA_SIN_COMPILAR = f.read()
+
+
+def termometro_anterior(pct, color="#00d4ff"):
+    pct = max(0, min(float(pct), 100))
+    altura = int(120 * (pct / 100))
+    y = 150 - altura
+    return f"""
+    <svg viewBox="0 0 130 210">
+        <defs>
+            <linearGradient id="bulb{hash(color)}" x1="0%" y1="0%" x2="0%" y2="100%">
+                <stop offset="0%" style="stop-color:{color};stop-opacity:1" />
+                <stop offset="50%" style="stop-color:{color};stop-opacity:0.8" />
+                <stop offset="100%" style="stop-color:{color};stop-opacity:0.6" />
+            </linearGradient>
+            <linearGradient id="tube{hash(color)}" x1="0%" y1="0%" x2="0%" y2="100%">
+                <stop offset="0%" style="stop-color:{color};stop-opacity:1" />
+                <stop offset="100%" style="stop-color:{color};stop-opacity:0.7" />
+            </linearGradient>
+            <filter id="neon{hash(color)}">
+                <feGaussianBlur stdDeviation="4" result="coloredBlur"/>
+                <feMerge>
+                    <feMergeNode in="coloredBlur"/>
+                    <feMergeNode in="coloredBlur"/>
+                    <feMergeNode in="SourceGraphic"/>
+                </feMerge>
+            </filter>
+        </defs>
+        <circle cx="65" cy="170" r="26" fill="{color}" opacity="0.15" filter="blur(8px)"/>
+        <circle cx="65" cy="170" r="22" fill="rgba(10,15,30,0.5)" stroke="{color}" stroke-width="2.5" opacity="0.5"/>
+        <rect x="52" y="35" width="26" height="135" rx="13" fill="rgba(10,15,30,0.5)" stroke="{color}" stroke-width="2.5" opacity="0.5"/>
+        <clipPath id="clipT{hash(color)}">
+            <rect x="52" y="35" width="26" height="135" rx="13"/>
+        </clipPath>
+        <rect x="52" y="{y}" width="26" height="{altura}" fill="url(#tube{hash(color)})" clip-path="url(#clipT{hash(color)})" filter="url(#neon{hash(color)})"/>
+        <circle cx="65" cy="170" r="18" fill="url(#bulb{hash(color)})" filter="url(#neon{hash(color)})"/>
+        <circle cx="65" cy="170" r="10" fill="white" opacity="0.3"/>
+        <line x1="79" y1="50" x2="88" y2="50" stroke="{color}" stroke-width="2" opacity="0.6"/>
+        <line x1="79" y1="80" x2="88" y2="80" stroke="{color}" stroke-width="2" opacity="0.6"/>
+        <line x1="79" y1="110" x2="88" y2="110" stroke="{color}" stroke-width="2" opacity="0.6"/>
+        <line x1="79" y1="140" x2="88" y2="140" stroke="{color}" stroke-width="2" opacity="0.6"/>
+        <text x="65" y="200" text-anchor="middle" fill="{color}" font-size="14" font-weight="900" opacity="0.9">{pct:.0f}%</text>
+    </svg>
+    """
+
+
+def tarjetas_anterior(avance, lista):
+    cards_html = ""
+    for _, r in avance.iterrows():
+        pct = float(r["porcentaje"])
+        color = render.color_medicamento(r["medicamento"], lista)
+        cards_html += Plantilla(TARJETA_SIN_COMPILAR).rellenar(
+            nombre=r["medicamento"],
+            color=color,
+            pct=f"{pct:.1f}",
+            pct_bar=max(0, min(pct, 100)),
+            img=render.IMG_MAP.get(r["medicamento"].lower(), render.DEFAULT_IMG),
+            thermo=termometro_anterior(pct, color=color),
+            donado=render.formatear_numero(r["cantidad"]),
+            meta=render.formatear_numero(r["meta"]),
+            faltante=render.formatear_numero(r["faltante"]),
+        )
+    return cards_html
+
+
+def pagina_anterior(avance, lista, ultima, fecha_hoy):
+    # Equivalente al f-string: todo el texto se vuelve a unir en cada render
+    r = render.resumen_avance(avance)
+    return Plantilla(PAGINA_SIN_COMPILAR).rellenar(
+        estilos=ESTILOS_SIN_MINIFICAR,
+        defs_termometros="",
+        confeti_js=URL_CONFETI,
+        fuentes_css=URL_FUENTES,
+        ultimo_donante=ultima["donante"],
+        ultimo_monto=render.formatear_numero(ultima["monto"]),
+        ultima_hora=ultima["hora"],
+        fecha_hoy=fecha_hoy,
+        total_meta=render.formatear_numero(r["total_meta"]),
+        total_recaudado=render.formatear_numero(r["total_recaudado"]),
+        porcentaje_total=f"{r['porcentaje_total']:.1f}",
+        critico_nombre=r["critico_nombre"],
+        critico_pct=f"{r['critico_pct']:.1f}",
+        critico_faltante=render.formatear_numero(r["critico_faltante"]),
+        mas_av_nombre=r["mas_av_nombre"],
+        mas_av_pct=f"{r['mas_av_pct']:.1f}",
+        cards_html=tarjetas_anterior(avance, lista),
+        mostrar_confeti="__MOSTRAR_CONFETI__",
+        nuevas_donaciones="__NUEVAS_DONACIONES__",
+    )
+
+
+def sesion_anterior(html):
+    return html.replace("__MOSTRAR_CONFETI__", "false").replace("__NUEVAS_DONACIONES__", "[]")
+
+
+def medir(fn, repeticiones):
+    # Cada medición son 100 llamadas: una sola dura microsegundos
+    segundos, resultado = mejor_de(lambda: [fn() for _ in range(100)][-1], repeticiones)
+    return segundos / 100, resultado
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--medicamentos", type=int, default=4)
+    parser.add_argument("--repeticiones", type=int, default=5)
+    args = parser.parse_args()
+
+    nombres = lista_medicamentos(args.medicamentos)
+    metas, lista = normalizar_metas(pd.DataFrame([[n, 1000] for n in nombres], columns=["Medicamento", "Meta"]))
+    avance = avance_desde_totales(metas, pd.Series({n: 137.0 * (i + 1) for i, n in enumerate(lista)}))
+    ultima = {"donante": "Donante anónimo", "monto": 250, "hora": "10:15"}
+    fecha = "01 de febrero de 2026"
+
+    t_pag_ant, html_ant = medir(lambda: pagina_anterior(avance, lista, ultima, fecha), args.repeticiones)
+    t_pag_nue, plantilla = medir(lambda: render.pagina_html(avance, lista, ultima, fecha), args.repeticiones)
+    t_tar_ant, _ = medir(lambda: tarjetas_anterior(avance, lista), args.repeticiones)
+    t_tar_nue, _ = medir(lambda: render.tarjetas_html(avance, lista), args.repeticiones)
+    t_ses_ant, final_ant = medir(lambda: sesion_anterior(html_ant), args.repeticiones)
+    t_ses_nue, final_nue = medir(lambda: plantilla.rellenar(mostrar_confeti="false", nuevas_donaciones="[]"),
+                                 args.repeticiones)
+
+    bytes_ant = len(final_ant.encode("utf-8"))
+    bytes_nue = len(final_nue.encode("utf-8"))
+
+    print(f"medicamentos: {len(lista)}  (CPU, mejor de {args.repeticiones} x 100)")
+    print(f"página completa     anterior {t_pag_ant * 1e6:8.1f} µs   compilada {t_pag_nue * 1e6:8.1f} µs   "
+          f"x{t_pag_ant / t_pag_nue:.1f}")
+    print(f"tarjetas sin cambios anterior {t_tar_ant * 1e6:8.1f} µs   memoizadas {t_tar_nue * 1e6:8.1f} µs   "
+          f"x{t_tar_ant / t_tar_nue:.1f}")
+    print(f"relleno por sesión  anterior {t_ses_ant * 1e6:8.1f} µs   compilada {t_ses_nue * 1e6:8.1f} µs   "
+          f"x{t_ses_ant / t_ses_nue:.1f}")
+    print(f"bytes por espectador anterior {bytes_ant:,}   compilada {bytes_nue:,}   "
+          f"-{(1 - bytes_nue / bytes_ant) * 100:.0f}%")
@@ -0,0 +1,91 @@
+"""Benchmark: tamaño y decodificación de la respuesta en JSON, CSV y Arrow.
+
+    python benchmarks/bench_transporte.py --filas 100000
+
+La API respondía siempre una lista de listas en JSON. Ahora el cliente
+negocia CSV o Arrow (tablas.py) y decodifica según el Content-Type. Se mide
+lo que viaja por la red (JSON y CSV con gzip; Arrow con zstd por dentro),
+el CPU de descomprimir y decodificar hasta la tabla Arrow, y se comprueba
+que los tres formatos dan la misma tabla (también con celdas cuyo texto
+imita las líneas de sección del CSV) y que el que pide el cliente por
+defecto (datos.FORMATOS) no ocupa en la red más que el JSON.
+"""
+import os
+import sys
+import gzip
+import json
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datos import FORMATOS as PREFERENCIA  # noqa: E402
+from generador import carga, generar  # noqa: E402
+from medicion import mejor_de  # noqa: E402
+from tablas import (  # noqa: E402
+    TAMANO_TROZO, codificar_arrow, codificar_csv, decodificar_arrow, decodificar_csv, decodificar_json,
+)
+
+
+def _trozos(contenido):
+    return (contenido[i:i + TAMANO_TROZO] for i in range(0, len(contenido), TAMANO_TROZO))
+
+
+def _con_gunzip(decodificar):
+    return lambda comprimido: decodificar(gzip.decompress(comprimido))
+
+
+FORMATOS = {
+    "json": lambda c: decodificar_json(_trozos(c)),
+    "csv": decodificar_csv,
+    "arrow": decodificar_arrow,
+}
+
+
+def comprobar_almohadillas():
+    # Texto libre del formulario con líneas que empiezan como las de sección
+    datos = generar(100)
+    datos["donaciones"][1][2] = "Ana\n#metas\nMedicamento,Meta"
+    datos["donaciones"][2][2] = "#donaciones"
+    datos["donaciones"][3][3] = "línea\n##dos"
+    referencia = decodificar_json(_trozos(json.dumps(datos).encode("utf-8")))
+    decodificado = decodificar_csv(codificar_csv(datos))
+    for hoja in ("donaciones", "metas"):
+        assert decodificado[hoja].equals(referencia[hoja]), f"CSV: celdas con '#' alteran la hoja {hoja}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--filas", type=int, default=100_000)
+    parser.add_argument("--repeticiones", type=int, default=3)
+    args = parser.parse_args()
+
+    # Sin basura: cantidades numéricas, como las serializa Apps Script
+    cuerpo = generar(args.filas, basura=0)
+    resultados = {}
+    for nombre, decodificar in FORMATOS.items():
+        if nombre == "arrow":
+            contenido = codificar_arrow(cuerpo, compresion=None)
+            comprimido = carga(cuerpo, nombre)
+        else:
+            contenido = carga(cuerpo, nombre)
+            # Mismo nivel que servidor_local.py
+            comprimido = gzip.compress(contenido, compresslevel=5)
+            decodificar = _con_gunzip(decodificar)
+        cpu, datos = mejor_de(lambda: decodificar(comprimido), args.repeticiones)
+        resultados[nombre] = (len(contenido), len(comprimido), cpu, datos)
+
+    referencia = resultados["json"][3]
+    for nombre, (*_, datos) in resultados.items():
+        assert datos["donaciones"].equals(referencia["donaciones"]), nombre
+        assert datos["metas"].equals(referencia["metas"]), nombre
+
+    base_gzip, base_cpu = resultados["json"][1], resultados["json"][2]
+    print(f"filas: {args.filas:,}  (descomprimir + decodificar, CPU, mejor de {args.repeticiones})")
+    for nombre, (crudo, comprimido, cpu, _) in resultados.items():
+        print(f"{nombre:6}  cuerpo {crudo / 2**20:7.2f} MiB   en red {comprimido / 2**20:6.2f} MiB "
+              f"({comprimido / base_gzip * 100:3.0f}%)   decodificar {cpu * 1e3:8.1f} ms   x{base_cpu / cpu:.1f}")
+    comprobar_almohadillas()
+
+    preferido = PREFERENCIA[0]
+    print(f"por defecto en el cliente: {preferido}")
+    assert resultados[preferido][1] <= base_gzip, f"{preferido} ocupa en la red más que el JSON con gzip"
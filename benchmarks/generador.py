@@ -0,0 +1,126 @@
+"""Generador de respuestas sintéticas con la forma de la hoja de Google Forms.
+
+    python benchmarks/generador.py --filas 100000 --formato csv --salida /tmp/carga.csv
+
+Reproducible (misma semilla, misma carga) y configurable: filas (de 100 a
+1M), número de medicamentos, proporción de donantes anónimos, formato de
+la marca temporal y proporción de celdas numéricas con basura ("10 cajas",
+"1,5", "n/a"...). Devuelve lo mismo que serializa Apps Script: la hoja de
+donaciones y la de metas como listas de filas, con las cantidades como
+números y las celdas vacías como "". `carga()` lo codifica en cualquiera
+de los formatos de transporte de tablas.py.
+"""
+import os
+import sys
+import json
+import argparse
+from datetime import datetime, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tablas import codificar_arrow, codificar_csv  # noqa: E402
+
+MEDICAMENTOS = [
+    "Multivitaminas (gotas)",
+    "Vitaminas C (gotas)",
+    "Vitamina D2 forte (gotas)",
+    "Fumarato ferroso en suspensión",
+    "Vitamina A y D2 (gotas)",
+    "Vitamina B (gotas)",
+]
+
+CABECERA = [
+    "Marca temporal",
+    "Nombre completo del donante (persona o entidad)",
+    "Nombre o entidad donante para mostrar en el dashboard (opcional)",
+    "Contacto (opcional)",
+]
+
+# Cómo llega la marca temporal según la configuración regional de la hoja,
+# o ISO si la API serializa el Date
+FORMATOS_FECHA = {
+    "forms": lambda f: f"{f.day}/{f.month}/{f.year} {f.hour}:{f.minute:02d}:{f.second:02d}",
+    "forms_us": lambda f: f"{f.month}/{f.day}/{f.year} {f.hour}:{f.minute:02d}:{f.second:02d}",
+    "sin_segundos": lambda f: f.strftime("%d/%m/%Y %H:%M"),
+    "iso": lambda f: f.strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+}
+
+# Lo que escribe a mano quien rellena el formulario en un campo numérico
+BASURA = ["n/a", "10 cajas", "1,5", " 12 ", "—", "diez", "12.5", "-3", "x", "1e3"]
+
+FILAS_MIN, FILAS_MAX = 100, 1_000_000
+INICIO = datetime(2026, 2, 1, 8, 0, 0)
+
+
+def lista_medicamentos(n):
+    # Los reales primero; a partir de ahí nombres de relleno
+    return (MEDICAMENTOS + [f"Medicamento {i} (tabletas)" for i in range(len(MEDICAMENTOS), n)])[:n]
+
+
+def generar(filas=10_000, medicamentos=4, anonimos=0.3, fechas="forms", basura=0.01, semilla=7):
+    """Devuelve {"donaciones": [[...]], "metas": [[...]], "desde": 0, "total": filas}."""
+    if not FILAS_MIN <= filas <= FILAS_MAX:
+        raise ValueError(f"filas debe estar entre {FILAS_MIN} y {FILAS_MAX}")
+    formatear_fecha = FORMATOS_FECHA[fechas]
+    rng = np.random.default_rng(semilla)
+    meds = lista_medicamentos(medicamentos)
+
+    # Marcas en orden de llegada, con huecos de 1 a 30 s
+    segundos = np.cumsum(rng.integers(1, 31, size=filas)).tolist()
+    marcas = [formatear_fecha(INICIO + timedelta(seconds=s)) for s in segundos]
+
+    donantes = [f"Donante {i}" for i in range(max(filas // 20, 1))]
+    indices = rng.integers(0, len(donantes), size=filas)
+    anonimo = rng.random(filas) < anonimos
+    publicos = ["" if a else donantes[i] for a, i in zip(anonimo.tolist(), indices.tolist())]
+    completos = [f"Persona {i}" for i in range(filas)]
+    contactos = np.where(rng.random(filas) < 0.5, "", "+53 5" + np.char.zfill(rng.integers(0, 10**7, filas).astype(str), 7))
+
+    # Cada donación trae uno o dos medicamentos; el resto de celdas vacías
+    cantidades = rng.integers(1, 41, size=(filas, medicamentos))
+    llenas = rng.random((filas, medicamentos)) < 0.5 / medicamentos
+    llenas[np.arange(filas), rng.integers(0, medicamentos, size=filas)] = True
+    celdas = np.where(llenas, cantidades, 0).astype(object)
+    celdas[~llenas] = ""
+    sucias = llenas & (rng.random((filas, medicamentos)) < basura)
+    celdas[sucias] = rng.choice(np.array(BASURA, dtype=object), size=int(sucias.sum()))
+    celdas = celdas.tolist()
+
+    donaciones = [CABECERA + meds] + [
+        [marca, completo, publico, contacto, *cantidades_fila]
+        for marca, completo, publico, contacto, cantidades_fila in zip(marcas, completos, publicos, contactos.tolist(), celdas)
+    ]
+    metas = [["Medicamento", "Meta"]] + [[m, int(rng.integers(1, 6)) * 10_000] for m in meds]
+    return {"donaciones": donaciones, "metas": metas, "desde": 0, "total": filas}
+
+
+def carga(datos, formato="json"):
+    """Cuerpo de la respuesta de la API en `formato` (json, csv o arrow)."""
+    if formato == "csv":
+        return codificar_csv(datos)
+    if formato == "arrow":
+        return codificar_arrow(datos)
+    return json.dumps(datos, ensure_ascii=False).encode("utf-8")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Respuesta sintética de la API con la forma de la hoja del formulario")
+    parser.add_argument("--filas", type=int, default=10_000)
+    parser.add_argument("--medicamentos", type=int, default=4)
+    parser.add_argument("--anonimos", type=float, default=0.3, help="proporción de donantes sin nombre público")
+    parser.add_argument("--fechas", choices=sorted(FORMATOS_FECHA), default="forms")
+    parser.add_argument("--basura", type=float, default=0.01, help="proporción de cantidades con texto no numérico")
+    parser.add_argument("--semilla", type=int, default=7)
+    parser.add_argument("--formato", choices=["json", "csv", "arrow"], default="json")
+    parser.add_argument("--salida", help="fichero de salida (por defecto, la salida estándar)")
+    args = parser.parse_args()
+
+    cuerpo = carga(generar(args.filas, args.medicamentos, args.anonimos, args.fechas, args.basura, args.semilla),
+                   args.formato)
+    if args.salida:
+        with open(args.salida, "wb") as f:
+            f.write(cuerpo)
+    else:
+        sys.stdout.buffer.write(cuerpo)
@@ -0,0 +1,18 @@
+"""Medición común de los benchmarks: mejor tiempo de N repeticiones.
+
+CPU del proceso (`time.process_time`) por defecto: en esta máquina el reloj
+de pared tiene mucho ruido. Los benchmarks con un servidor local en otro
+hilo pasan `reloj=time.perf_counter`, porque el CPU del servidor también
+cuenta para el proceso.
+"""
+import time
+
+
+def mejor_de(fn, repeticiones, reloj=time.process_time):
+    """Devuelve (mejor tiempo en segundos, resultado de la última llamada)."""
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        t0 = reloj()
+        resultado = fn()
+        mejor = min(mejor, reloj() - t0)
+    return mejor, resultado
@@ -0,0 +1,212 @@
+"""Suite de benchmarks del pipeline completo con comparación contra una línea base.
+
+    python benchmarks/suite.py --filas 100000 --guardar     # medir y guardar la línea base
+    python benchmarks/suite.py --filas 100000               # medir y comparar (código 1 si empeora)
+
+Genera una carga sintética (generador.py) y mide por separado cada etapa
+de lo que hace app.py en un tick: decodificar la respuesta (JSON, CSV y
+Arrow), pasarla a pandas, normalizar columnas (con la coerción numérica,
+que además se mide sola), parsear fechas, resumir y calcular huellas,
+detectar donaciones nuevas, agregar totales, renderizar tarjetas y armar
+la página. `motor` es la reconstrucción completa de MotorTotales.
+
+De cada etapa: CPU (mejor de N repeticiones) y pico de memoria en una
+pasada aparte, sumando tracemalloc (objetos Python) y el pico de un pool
+de Arrow propio de la etapa (pandas guarda ahí el texto). Esa pasada usa
+su propio juego de etapas, que se libera antes que los pools: ningún pool
+se destruye con buffers suyos todavía vivos. Una etapa
+empeora si supera la línea base en más de --tolerancia y además en más
+del umbral de ruido. Las líneas base son de una máquina: se guardan y se
+comparan en la misma.
+"""
+import gc
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tracemalloc
+
+import pyarrow as pa
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import render  # noqa: E402
+from datos import Snapshot  # noqa: E402
+from generador import FILAS_MAX, FILAS_MIN, FORMATOS_FECHA, carga, generar  # noqa: E402
+from medicion import mejor_de  # noqa: E402
+from procesamiento import (  # noqa: E402
+    LectorFechas, MotorTotales, avance_desde_totales, coercer_bloque_numerico, donaciones_nuevas,
+    normalizar_donaciones, normalizar_metas, resumir_donaciones, sumar_medicamentos, ultima_donacion,
+)
+from tablas import TAMANO_TROZO, decodificar_arrow, decodificar_csv, decodificar_json  # noqa: E402
+
+LINEA_BASE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "linea_base.json")
+# Por debajo de esto una diferencia es ruido, no una regresión
+RUIDO_MS = 1.0
+RUIDO_MIB = 1.0
+# Donaciones llegadas desde el tick anterior en la etapa de detección
+NUEVAS = 10
+FECHA_HOY = "01 de febrero de 2026"
+
+
+def _trozos(contenido):
+    return (contenido[i:i + TAMANO_TROZO] for i in range(0, len(contenido), TAMANO_TROZO))
+
+
+def etapas(cuerpos):
+    """Lista de (nombre, fn) en el orden del pipeline.
+
+    Cada etapa parte del resultado de las anteriores, que se calcula una
+    vez al construir la lista (fuera de la medición).
+    """
+    datos = decodificar_json(_trozos(cuerpos["json"]))
+    metas, lista = normalizar_metas(datos["metas"].to_pandas())
+    lista = tuple(lista)
+    crudas = datos["donaciones"].to_pandas()
+    donaciones = normalizar_donaciones(crudas, lista)
+    lector = LectorFechas()
+    resumen = resumir_donaciones(donaciones, lista, lector)
+    previas = resumen["huella"].to_numpy()[:-NUEVAS]
+    avance = avance_desde_totales(metas, sumar_medicamentos(donaciones, lista))
+    ultima = ultima_donacion(resumen)
+    nuevas = donaciones_nuevas(resumen, previas)
+    bloque = crudas[[c for c in crudas.columns if c in lista]]
+    snapshot = Snapshot(datos["donaciones"], datos["metas"], 0.0, "donaciones", "metas")
+
+    def tarjetas():
+        render.tarjeta_html.cache_clear()
+        return render.tarjetas_html(avance, lista)
+
+    def pagina():
+        # Con datos nuevos: sin tarjetas memoizadas
+        render.tarjeta_html.cache_clear()
+        return render.pagina_html(avance, lista, ultima, FECHA_HOY).rellenar(
+            mostrar_confeti="true", nuevas_donaciones=render.cola_donaciones_json(nuevas),
+        )
+
+    return [
+        ("decodificar.json", lambda: decodificar_json(_trozos(cuerpos["json"]))),
+        ("decodificar.csv", lambda: decodificar_csv(cuerpos["csv"])),
+        ("decodificar.arrow", lambda: decodificar_arrow(cuerpos["arrow"])),
+        ("a_pandas", lambda: datos["donaciones"].to_pandas()),
+        ("normalizar", lambda: normalizar_donaciones(crudas, lista)),
+        ("normalizar.coercion", lambda: coercer_bloque_numerico(bloque)),
+        # Lector nuevo: formato sin detectar y sin fechas ya parseadas
+        ("fechas", lambda: LectorFechas().leer(donaciones["fecha_hora"])),
+        # Lector caliente: solo huellas, donante y monto
+        ("resumen", lambda: resumir_donaciones(donaciones, lista, lector)),
+        ("deteccion", lambda: donaciones_nuevas(resumen, previas)),
+        ("agregacion", lambda: avance_desde_totales(metas, sumar_medicamentos(donaciones, lista))),
+        ("tarjetas", tarjetas),
+        ("pagina", pagina),
+        ("motor", lambda: MotorTotales().actualizar(snapshot)),
+    ]
+
+
+def _pico(fn):
+    gc.collect()
+    pool = pa.proxy_memory_pool(pa.default_memory_pool())
+    anterior = pa.default_memory_pool()
+    pa.set_memory_pool(pool)
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1] + pool.max_memory(), pool
+    finally:
+        tracemalloc.stop()
+        pa.set_memory_pool(anterior)
+
+
+def medir(cuerpos, repeticiones):
+    """{etapa: {"cpu_ms", "pico_mib"}} de todas las etapas."""
+    resultados = {}
+    for nombre, fn in etapas(cuerpos):
+        segundos, _ = mejor_de(fn, repeticiones)
+        resultados[nombre] = {"cpu_ms": round(segundos * 1e3, 3)}
+
+    # Pico de memoria en una pasada aparte (tracemalloc ralentiza). Lo que
+    # una etapa deja vivo (la caché del lector de fechas en `resumen`) está
+    # reservado en su pool: se suelta el juego de etapas antes que los pools
+    pools = []
+    for nombre, fn in etapas(cuerpos):
+        pico, pool = _pico(fn)
+        pools.append(pool)
+        resultados[nombre]["pico_mib"] = round(pico / 2**20, 3)
+    del fn
+    gc.collect()
+    vivos = sum(pool.bytes_allocated() for pool in pools)
+    assert vivos == 0, f"{vivos} bytes de Arrow siguen reservados en los pools de las etapas"
+    return resultados
+
+
+def comparar(resultados, base, tolerancia):
+    """Devuelve {etapa: [avisos]} con las etapas que empeoran respecto a `base`."""
+    regresiones = {}
+    for nombre, actual in resultados.items():
+        previo = base.get(nombre)
+        if previo is None:
+            continue
+        avisos = []
+        for clave, ruido in (("cpu_ms", RUIDO_MS), ("pico_mib", RUIDO_MIB)):
+            if actual[clave] > previo[clave] * (1 + tolerancia) and actual[clave] - previo[clave] > ruido:
+                avisos.append(f"{clave} {previo[clave]:.1f} -> {actual[clave]:.1f}")
+        if avisos:
+            regresiones[nombre] = avisos
+    return regresiones
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks por etapa del pipeline del dashboard")
+    parser.add_argument("--filas", type=int, default=100_000, help=f"de {FILAS_MIN} a {FILAS_MAX}")
+    parser.add_argument("--medicamentos", type=int, default=4)
+    parser.add_argument("--anonimos", type=float, default=0.3)
+    parser.add_argument("--fechas", choices=sorted(FORMATOS_FECHA), default="forms")
+    parser.add_argument("--basura", type=float, default=0.01)
+    parser.add_argument("--semilla", type=int, default=7)
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--base", default=LINEA_BASE, help="fichero JSON de la línea base")
+    parser.add_argument("--guardar", action="store_true", help="guardar esta ejecución como línea base")
+    parser.add_argument("--tolerancia", type=float, default=0.3, help="empeoramiento relativo admitido (0.3 = 30%%)")
+    args = parser.parse_args()
+
+    parametros = {k: getattr(args, k) for k in ("filas", "medicamentos", "anonimos", "fechas", "basura", "semilla")}
+    t0 = time.perf_counter()
+    datos = generar(**parametros)
+    cuerpos = {formato: carga(datos, formato) for formato in ("json", "csv", "arrow")}
+    del datos
+    print(f"filas: {args.filas:,}  medicamentos: {args.medicamentos}  fechas: {args.fechas}  "
+          f"json {len(cuerpos['json']) / 2**20:.1f} MiB  csv {len(cuerpos['csv']) / 2**20:.1f} MiB  "
+          f"arrow {len(cuerpos['arrow']) / 2**20:.1f} MiB  (generado en {time.perf_counter() - t0:.1f} s)")
+
+    resultados = medir(cuerpos, args.repeticiones)
+
+    base = {}
+    if os.path.exists(args.base) and not args.guardar:
+        with open(args.base, encoding="utf-8") as f:
+            guardada = json.load(f)
+        if guardada["parametros"] != parametros:
+            print(f"La línea base es de otros parámetros ({guardada['parametros']}): no se compara")
+        else:
+            base = guardada["etapas"]
+    regresiones = comparar(resultados, base, args.tolerancia)
+
+    print(f"{'etapa':22} {'CPU ms':>10} {'pico MiB':>10}" + (f" {'base ms':>10} {'base MiB':>10}" if base else ""))
+    for nombre, r in resultados.items():
+        linea = f"{nombre:22} {r['cpu_ms']:10.1f} {r['pico_mib']:10.1f}"
+        if nombre in base:
+            linea += f" {base[nombre]['cpu_ms']:10.1f} {base[nombre]['pico_mib']:10.1f}"
+        if nombre in regresiones:
+            linea += "   EMPEORA: " + ", ".join(regresiones[nombre])
+        print(linea)
+
+    if args.guardar:
+        with open(args.base, "w", encoding="utf-8") as f:
+            json.dump({"parametros": parametros, "maquina": platform.node(), "python": platform.python_version(),
+                       "etapas": resultados}, f, indent=2)
+        print(f"Línea base guardada en {args.base}")
+    elif base:
+        print(f"{len(regresiones)} etapas empeoran más de un {args.tolerancia:.0%}" if regresiones else "Sin regresiones")
+
+    sys.exit(1 if regresiones else 0)
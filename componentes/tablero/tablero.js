@@ -0,0 +1,300 @@
+// ==============================
+// COMPONENTE DEL TABLERO: RENDER POR DELTAS
+// ==============================
+// Streamlit envía en cada rerun un mensaje "streamlit:render" con el estado
+// (render.estado_tablero). La página ya está cargada: aquí solo se parchea el
+// DOM, así las transiciones de .progress-fill, .img-fill-container, etc. se
+// animan en lugar de reiniciarse.
+
+function enviarAStreamlit(tipo, datos) {
+    window.parent.postMessage(Object.assign({ isStreamlitMessage: true, type: tipo }, datos), "*");
+}
+
+function ajustarAltura() {
+    enviarAStreamlit("streamlit:setFrameHeight", { height: document.documentElement.scrollHeight });
+}
+
+function pct1(x) { return x.toFixed(1) + "%"; }
+
+function campo(nombre, texto) {
+    const el = document.querySelector('[data-campo="' + nombre + '"]');
+    if (el && el.textContent !== texto) el.textContent = texto;
+}
+
+// ==============================
+// TARJETAS
+// ==============================
+const idsColor = new Map();
+
+function idColor(color) {
+    // Gradientes una vez por color para todo el documento (ver index.html);
+    // el filtro y el recorte ya son únicos
+    if (!idsColor.has(color)) {
+        const n = idsColor.size;
+        document.getElementById("termo-defs").insertAdjacentHTML("beforeend", `
+            <linearGradient id="termo-bulb-${n}" x1="0%" y1="0%" x2="0%" y2="100%">
+                <stop offset="0%" style="stop-color:${color};stop-opacity:1" />
+                <stop offset="50%" style="stop-color:${color};stop-opacity:0.8" />
+                <stop offset="100%" style="stop-color:${color};stop-opacity:0.6" />
+            </linearGradient>
+            <linearGradient id="termo-tube-${n}" x1="0%" y1="0%" x2="0%" y2="100%">
+                <stop offset="0%" style="stop-color:${color};stop-opacity:1" />
+                <stop offset="100%" style="stop-color:${color};stop-opacity:0.7" />
+            </linearGradient>`);
+        idsColor.set(color, n);
+    }
+    return idsColor.get(color);
+}
+
+function termometroSvg(color) {
+    const n = idColor(color);
+    return `
+    <svg viewBox="0 0 130 210">
+        <circle cx="65" cy="170" r="26" fill="${color}" opacity="0.15" filter="blur(8px)"/>
+        <circle cx="65" cy="170" r="22" fill="rgba(10,15,30,0.5)" stroke="${color}" stroke-width="2.5" opacity="0.5"/>
+        <rect x="52" y="35" width="26" height="135" rx="13" fill="rgba(10,15,30,0.5)" stroke="${color}" stroke-width="2.5" opacity="0.5"/>
+        <rect class="thermo-nivel" x="52" y="150" width="26" height="0" fill="url(#termo-tube-${n})" clip-path="url(#termo-clip)" filter="url(#termo-neon)"/>
+        <circle cx="65" cy="170" r="18" fill="url(#termo-bulb-${n})" filter="url(#termo-neon)"/>
+        <circle cx="65" cy="170" r="10" fill="white" opacity="0.3"/>
+        <g stroke="${color}" stroke-width="2" opacity="0.6">
+            <line x1="79" y1="50" x2="88" y2="50"/>
+            <line x1="79" y1="80" x2="88" y2="80"/>
+            <line x1="79" y1="110" x2="88" y2="110"/>
+            <line x1="79" y1="140" x2="88" y2="140"/>
+        </g>
+        <text class="thermo-texto" x="65" y="200" text-anchor="middle" fill="${color}" font-size="14" font-weight="900" opacity="0.9"></text>
+    </svg>`;
+}
+
+function crearTarjeta(med) {
+    const card = document.createElement("div");
+    card.className = "med-card";
+    card.innerHTML = `
+        <div class="med-header">
+            <div class="med-title"></div>
+            <div class="med-badge"></div>
+        </div>
+        <div class="med-body">
+            <div class="med-image-container">
+                <div class="image-glow"></div>
+                <div class="img-wrapper">
+                    <img class="img-base"/>
+                    <div class="img-fill-container" style="height: 0%;">
+                        <img class="img-colored"/>
+                    </div>
+                    <div class="img-shimmer"></div>
+                </div>
+            </div>
+            <div class="med-thermo"></div>
+        </div>
+        <div class="med-stats">
+            <div class="stat-item">
+                <div class="stat-label">Donado</div>
+                <div class="stat-value stat-donado"></div>
+            </div>
+            <div class="stat-divider"></div>
+            <div class="stat-item">
+                <div class="stat-label">Meta</div>
+                <div class="stat-value stat-meta"></div>
+            </div>
+            <div class="stat-divider"></div>
+            <div class="stat-item">
+                <div class="stat-label">Faltan</div>
+                <div class="stat-value warning stat-faltante"></div>
+            </div>
+        </div>
+        <div class="progress-bar">
+            <div class="progress-fill" style="width: 0%;"></div>
+            <div class="progress-glow" style="width: 0%; opacity: 0.3;"></div>
+        </div>`;
+    card.querySelector(".med-title").textContent = med.nombre;
+    return card;
+}
+
+function pintarColor(card, med) {
+    // Solo cuando cambia el color (orden de metas) o la imagen
+    if (card.dataset.color === med.color && card.dataset.img === med.img) return;
+    const c = med.color;
+    const badge = card.querySelector(".med-badge");
+    badge.style.background = c + "20";
+    badge.style.color = c;
+    badge.style.border = "1px solid " + c + "40";
+    card.querySelector(".image-glow").style.background = c + "30";
+    card.querySelector(".img-base").src = med.img;
+    const coloreada = card.querySelector(".img-colored");
+    coloreada.src = med.img;
+    coloreada.style.filter = "drop-shadow(0 0 12px " + c + ") brightness(1.2)";
+    card.querySelector(".med-thermo").innerHTML = termometroSvg(c);
+    card.querySelector(".stat-donado").style.color = c;
+    card.querySelector(".progress-fill").style.background = "linear-gradient(90deg, " + c + ", " + c + "cc)";
+    card.querySelector(".progress-glow").style.background = c;
+    card.dataset.color = c;
+    card.dataset.img = med.img;
+    card.dataset.pct = "";
+}
+
+function actualizarTarjeta(card, med) {
+    pintarColor(card, med);
+    if (card.dataset.pct === String(med.pct)) {
+        card.querySelector(".stat-donado").textContent = med.donado;
+        card.querySelector(".stat-meta").textContent = med.meta;
+        card.querySelector(".stat-faltante").textContent = med.faltante;
+        return;
+    }
+    const pct = med.pct;
+    const bar = Math.max(0, Math.min(pct, 100));
+    card.querySelector(".med-badge").textContent = pct1(pct);
+    card.querySelector(".img-fill-container").style.height = bar + "%";
+    card.querySelector(".progress-fill").style.width = bar + "%";
+    card.querySelector(".progress-glow").style.width = bar + "%";
+
+    const altura = Math.floor(120 * (bar / 100));
+    const nivel = card.querySelector(".thermo-nivel");
+    nivel.setAttribute("y", 150 - altura);
+    nivel.setAttribute("height", altura);
+    card.querySelector(".thermo-texto").textContent = bar.toFixed(0) + "%";
+
+    card.querySelector(".stat-donado").textContent = med.donado;
+    card.querySelector(".stat-meta").textContent = med.meta;
+    card.querySelector(".stat-faltante").textContent = med.faltante;
+    card.dataset.pct = String(pct);
+}
+
+function actualizarTarjetas(medicamentos) {
+    const grid = document.querySelector(".grid");
+    const existentes = new Map();
+    for (const card of grid.children) existentes.set(card.querySelector(".med-title").textContent, card);
+
+    medicamentos.forEach((med, i) => {
+        let card = existentes.get(med.nombre);
+        if (card) {
+            existentes.delete(med.nombre);
+        } else {
+            card = crearTarjeta(med);
+        }
+        // Mantener el orden de las metas sin recrear nodos
+        if (grid.children[i] !== card) grid.insertBefore(card, grid.children[i] || null);
+        actualizarTarjeta(card, med);
+    });
+    for (const card of existentes.values()) card.remove();
+}
+
+// ==============================
+// OVERLAY Y CONFETI
+// ==============================
+function celebrar() {
+    if (typeof confetti !== "function") return;
+    confetti({
+        particleCount: 200,
+        spread: 120,
+        origin: { y: 0.6 },
+        colors: ['#00D4FF', '#FF3D71', '#00FF9F', '#B24BF3', '#FFB800']
+    });
+    setTimeout(() => {
+        confetti({
+            particleCount: 150,
+            angle: 60,
+            spread: 80,
+            origin: { x: 0 },
+            colors: ['#00D4FF', '#00FF9F']
+        });
+    }, 250);
+    setTimeout(() => {
+        confetti({
+            particleCount: 150,
+            angle: 120,
+            spread: 80,
+            origin: { x: 1 },
+            colors: ['#FF3D71', '#B24BF3']
+        });
+    }, 500);
+}
+
+function mostrarDonacion(d, animar) {
+    campo("ultimo_donante", d.donante);
+    campo("ultimo_monto", d.monto);
+    campo("ultima_hora", d.hora);
+    if (!animar) return;
+    const overlay = document.querySelector(".donation-overlay");
+    overlay.style.animation = "none";
+    void overlay.offsetWidth;
+    overlay.style.animation = "";
+}
+
+let temporizadoresCola = [];
+
+function mostrarNuevas(estado) {
+    const nuevas = estado.nuevas || [];
+    if (!estado.confeti || nuevas.length === 0) {
+        // Sin novedades: no interrumpir una cola que se esté mostrando
+        if (temporizadoresCola.length === 0) mostrarDonacion(estado.ultima, false);
+        return;
+    }
+    temporizadoresCola.forEach(clearTimeout);
+    temporizadoresCola = [];
+    // Varias donaciones en el mismo tick: el overlay las recorre una a una
+    const paso = Math.min(4000, 12000 / nuevas.length);
+    nuevas.forEach((d, i) => {
+        temporizadoresCola.push(setTimeout(() => {
+            mostrarDonacion(d, true);
+            celebrar();
+            if (i === nuevas.length - 1) temporizadoresCola = [];
+        }, i * paso));
+    });
+}
+
+// ==============================
+// ACTIVOS (CONFETI Y FUENTE)
+// ==============================
+let activosCargados = false;
+
+function cargarActivos(activos) {
+    // Una sola vez: vienen de la caché local de Streamlit (o de la URL
+    // remota si no se pudieron descargar, ver activos.py)
+    if (activosCargados || !activos) return;
+    activosCargados = true;
+    const hoja = document.createElement("link");
+    hoja.rel = "stylesheet";
+    hoja.href = activos.fuentes;
+    document.head.appendChild(hoja);
+    const script = document.createElement("script");
+    script.src = activos.confeti;
+    document.head.appendChild(script);
+}
+
+// ==============================
+// APLICAR ESTADO
+// ==============================
+let versionAplicada = null;
+
+function aplicar(estado) {
+    // El mismo estado puede llegar repetido (reruns sin cambios): no tocar nada
+    const version = JSON.stringify(estado);
+    if (version === versionAplicada) return;
+    versionAplicada = version;
+    cargarActivos(estado.activos);
+
+    campo("fecha_hoy", estado.fecha_hoy);
+    campo("total_meta", estado.total_meta);
+    campo("total_recaudado", estado.total_recaudado);
+    campo("porcentaje_total", pct1(estado.porcentaje_total));
+    document.querySelector(".progress-active").style.width = pct1(estado.porcentaje_total);
+    campo("critico_nombre", estado.critico_nombre);
+    campo("critico_pct", pct1(estado.critico_pct));
+    campo("critico_faltante", estado.critico_faltante);
+    campo("mas_av_nombre", estado.mas_av_nombre);
+    campo("mas_av_pct", pct1(estado.mas_av_pct));
+
+    actualizarTarjetas(estado.medicamentos);
+    mostrarNuevas(estado);
+    ajustarAltura();
+}
+
+window.addEventListener("message", (evento) => {
+    if (evento.data && evento.data.type === "streamlit:render") {
+        aplicar(evento.data.args.estado);
+    }
+});
+
+new ResizeObserver(ajustarAltura).observe(document.body);
+enviarAStreamlit("streamlit:componentReady", { apiVersion: 1 });
@@ -0,0 +1,430 @@
+import os
+import hashlib
+import time
+import random
+import logging
+import threading
+from typing import NamedTuple
+
+import pyarrow as pa
+import requests
+from requests.adapters import HTTPAdapter
+
+from copia_local import DIR_COPIA_LOCAL, cargar_copia, guardar_copia
+from metricas import contar, medir
+from tablas import (
+    TAMANO_TROZO, TIPOS_CONTENIDO, concatenar_tablas, decodificar_arrow, decodificar_csv,
+    decodificar_json, hash_tabla, mismo_contenido,
+)
+
+log = logging.getLogger(__name__)
+
+# ==============================
+# CONFIGURACIÓN DEL FETCH
+# ==============================
+# Segundos que una respuesta de la API se comparte entre TODAS las sesiones
+CACHE_TTL = float(os.environ.get("DASHBOARD_CACHE_TTL", "15"))
+# Las metas cambian como mucho un par de veces al día: se piden aparte, con
+# su propio TTL (o al invalidarlas, ver ClienteAPI.invalidar_metas)
+CACHE_TTL_METAS = float(os.environ.get("DASHBOARD_CACHE_TTL_METAS", "3600"))
+# (conexión, lectura) en segundos; Apps Script puede tardar bastante en responder
+TIMEOUT_CONEXION = float(os.environ.get("DASHBOARD_TIMEOUT_CONEXION", "3.05"))
+TIMEOUT_LECTURA = float(os.environ.get("DASHBOARD_TIMEOUT_LECTURA", "20"))
+REINTENTOS = int(os.environ.get("DASHBOARD_REINTENTOS", "3"))
+BACKOFF_BASE = float(os.environ.get("DASHBOARD_BACKOFF_BASE", "0.5"))
+BACKOFF_MAX = float(os.environ.get("DASHBOARD_BACKOFF_MAX", "8"))
+# Tras N refrescos fallidos seguidos el circuito se abre y no se llama a la API
+FALLOS_CIRCUITO = int(os.environ.get("DASHBOARD_FALLOS_CIRCUITO", "5"))
+ENFRIAMIENTO_CIRCUITO = float(os.environ.get("DASHBOARD_ENFRIAMIENTO_CIRCUITO", "60"))
+# Pedir solo las filas nuevas (?desde=N) en lugar de la hoja completa
+INGESTA_INCREMENTAL = os.environ.get("DASHBOARD_INGESTA_INCREMENTAL", "1") == "1"
+# Cada cuántos segundos se fuerza igualmente una carga completa (filas editadas)
+RECARGA_COMPLETA = float(os.environ.get("DASHBOARD_RECARGA_COMPLETA", "600"))
+# Mínimo de segundos entre refrescos forzados (webhook, invalidar_metas):
+# los avisos que lleguen antes se agrupan en uno al final del intervalo
+INTERVALO_FORZADO = float(os.environ.get("DASHBOARD_INTERVALO_FORZADO", "5"))
+# Formatos de transporte aceptados, por orden de preferencia (tablas.py);
+# JSON queda siempre como último recurso. CSV con gzip es lo que menos
+# ocupa en la red; Arrow decodifica mucho más rápido pero pesa más que el
+# JSON comprimido (nombres y fechas no se repiten): solo compensa en un
+# enlace rápido con CPU justa, p. ej. DASHBOARD_FORMATOS=arrow,csv,json
+FORMATOS = [f for f in os.environ.get("DASHBOARD_FORMATOS", "csv,json").split(",") if f in TIPOS_CONTENIDO]
+
+# Códigos HTTP que vale la pena reintentar (cuotas y fallos transitorios)
+CODIGOS_REINTENTABLES = {429, 500, 502, 503, 504}
+
+
+class Snapshot(NamedTuple):
+    # Hojas como tablas Arrow (tablas.py): una columna tipada por campo
+    donaciones: pa.Table
+    metas: pa.Table
+    obtenido_en: float
+    hash_donaciones: str
+    hash_metas: str
+    # Índice (sin cabecera) de la primera fila nueva respecto al snapshot
+    # anterior; 0 significa que la hoja se cargó completa
+    filas_nuevas_desde: int = 0
+    # Sube con cada carga completa que cambia filas ya conocidas: dentro de
+    # una misma carga las filas solo se añaden al final
+    carga: int = 0
+    # Token de versión de la hoja que dio el endpoint (ETag o `version`);
+    # "" si no los envía
+    version: str = ""
+    # Cuándo se descargaron las metas (pueden ser más viejas que las donaciones)
+    metas_obtenidas_en: float = float("-inf")
+
+
+def encadenar_hash(hash_anterior, filas_nuevas):
+    # Hash incremental: depende del anterior y solo de las filas añadidas
+    contenido = hash_anterior + hash_tabla(filas_nuevas)
+    return hashlib.md5(contenido.encode()).hexdigest()
+
+
+class ErrorAPI(Exception):
+    pass
+
+
+class ClienteAPI:
+    """Cliente compartido por proceso con stale-while-revalidate.
+
+    `obtener()` devuelve al instante la última copia buena y, si venció el
+    TTL, lanza UN refresco en segundo plano. Solo espera a la red en el
+    arranque en frío, cuando todavía no hay nada que mostrar.
+
+    Con ingesta incremental se envía `?desde=N` (filas ya conocidas) y el
+    endpoint responde solo con la cabecera y las filas posteriores, además
+    de `desde` y `total`. Si el endpoint ignora el parámetro, o el total no
+    cuadra (filas borradas), se recarga la hoja completa. Las ediciones de
+    filas antiguas no cambian el total: para eso se fuerza una carga
+    completa cada `recarga_completa` segundos.
+
+    Con `copia_local` cada snapshot nuevo se guarda en disco (copia_local.py)
+    y al crear el cliente se parte de esa copia, ya vencida: el primer
+    `obtener()` no espera a la red y el refresco pide solo lo posterior a
+    su marca de agua.
+
+    El formato se negocia con `?formato=` y la cabecera Accept (`formatos`,
+    por orden de preferencia); la respuesta se decodifica según su
+    Content-Type, así que un endpoint que solo sabe JSON sigue sirviendo.
+
+    Fetch condicional: cada respuesta puede traer un token de versión (ETag
+    o la clave `version`, p. ej. el `getLastUpdated()` de la hoja). El
+    siguiente refresco lo devuelve en `If-None-Match` y `?version=`, y si
+    nada cambió el endpoint contesta 304 o `{"sin_cambios": true}`: unos
+    pocos bytes y nada que decodificar. La recarga completa periódica no
+    lo envía, por si el token no cubre las ediciones de filas antiguas.
+
+    Las metas van en otro nivel de caché: mientras no venzan (`ttl_metas`)
+    se pide `?hojas=donaciones` y el snapshot conserva las metas, su hash y
+    todo lo derivado de ellas. `invalidar_metas()` fuerza a pedirlas en el
+    siguiente refresco. Las peticiones que traen metas no son condicionales:
+    el token es de la hoja completa y pudo avanzar por un cambio de metas
+    que no se descargó.
+    """
+
+    def __init__(self, url, ttl=CACHE_TTL, ttl_metas=CACHE_TTL_METAS, timeout=(TIMEOUT_CONEXION, TIMEOUT_LECTURA),
+                 reintentos=REINTENTOS, backoff_base=BACKOFF_BASE, backoff_max=BACKOFF_MAX,
+                 fallos_circuito=FALLOS_CIRCUITO, enfriamiento_circuito=ENFRIAMIENTO_CIRCUITO,
+                 incremental=INGESTA_INCREMENTAL, recarga_completa=RECARGA_COMPLETA,
+                 copia_local=DIR_COPIA_LOCAL, formatos=FORMATOS, intervalo_forzado=INTERVALO_FORZADO):
+        self.url = url
+        self.ttl = ttl
+        self.ttl_metas = ttl_metas
+        self.timeout = timeout
+        self.reintentos = reintentos
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.fallos_circuito = fallos_circuito
+        self.enfriamiento_circuito = enfriamiento_circuito
+        self.incremental = incremental
+        self.recarga_completa = recarga_completa
+        self.copia_local = copia_local
+        self.formatos = [f for f in formatos if f != "json"] + ["json"]
+        self.intervalo_forzado = intervalo_forzado
+        self._ultima_carga_completa = 0.0
+        self._metas_invalidadas_en = float("-inf")
+
+        # Una sola conexión TLS reutilizada entre ticks (keep-alive)
+        self._http = requests.Session()
+        self._http.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=4))
+        self._http.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=4))
+        # requests ya pide gzip y lo descomprime al leer el cuerpo
+        self._http.headers["Accept"] = ", ".join(
+            f"{TIPOS_CONTENIDO[f]};q={1 - i / 10:.1f}" for i, f in enumerate(self.formatos)
+        )
+
+        self._cond = threading.Condition()
+        self._snapshot = None
+        self._refrescando = False
+        self._refresco_pendiente = False
+        self._ultimo_forzado = float("-inf")
+        self._forzado_programado = False
+        self._suscriptores = []
+        self._fallos_seguidos = 0
+        self._circuito_abierto_hasta = 0.0
+        self.ultimo_error = None
+
+        if copia_local:
+            self._snapshot = self._restaurar_copia()
+
+    # ------------------------------
+    # API pública
+    # ------------------------------
+    def obtener(self):
+        ahora = time.monotonic()
+        with self._cond:
+            snap = self._snapshot
+            vencido = snap is None or ahora - snap.obtenido_en >= self.ttl
+            # Tasa de aciertos: un snapshot vencido cuenta como fallo aunque
+            # se sirva al instante (stale-while-revalidate)
+            contar("cache_consultas_total", cache="api")
+            if vencido:
+                contar("cache_fallos_total", cache="api")
+            if vencido and not self._refrescando and not self.circuito_abierto(ahora):
+                self._lanzar_refresco()
+
+            if snap is not None:
+                return snap
+
+            # Arranque en frío: esperar a la descarga en curso (single-flight)
+            limite = sum(self.timeout) * (self.reintentos + 1) + self.backoff_max * self.reintentos
+            self._cond.wait_for(lambda: self._snapshot is not None or not self._refrescando, timeout=limite)
+            if self._snapshot is None:
+                raise ErrorAPI(self.ultimo_error or "La API no respondió a tiempo")
+            return self._snapshot
+
+    def forzar_refresco(self):
+        # Refresco inmediato sin esperar al TTL (p. ej. al llegar un webhook).
+        # Si ya hay uno en curso se encadena otro al terminar, para no perder
+        # filas escritas durante la descarga actual. Como mucho uno cada
+        # `intervalo_forzado` segundos: una ráfaga de avisos (o alguien
+        # repitiendo POST) no encadena descargas seguidas contra la cuota.
+        with self._cond:
+            espera = self._ultimo_forzado + self.intervalo_forzado - time.monotonic()
+            if espera > 0:
+                if not self._forzado_programado:
+                    self._forzado_programado = True
+                    temporizador = threading.Timer(espera, self._forzar_programado)
+                    temporizador.daemon = True
+                    temporizador.start()
+                return
+            self._ultimo_forzado = time.monotonic()
+            if self._refrescando:
+                self._refresco_pendiente = True
+            elif not self.circuito_abierto():
+                self._lanzar_refresco()
+
+    def _forzar_programado(self):
+        with self._cond:
+            self._forzado_programado = False
+        self.forzar_refresco()
+
+    def invalidar_metas(self):
+        # Las metas se piden en el siguiente refresco, que se lanza ya (p. ej.
+        # desde un disparador onEdit de la hoja de metas)
+        self._metas_invalidadas_en = time.monotonic()
+        self.forzar_refresco()
+
+    def suscribir(self, callback):
+        # callback(snapshot) se llama desde el hilo de refresco cada vez que
+        # llega un snapshot con datos distintos
+        self._suscriptores.append(callback)
+
+    def circuito_abierto(self, ahora=None):
+        ahora = time.monotonic() if ahora is None else ahora
+        return ahora < self._circuito_abierto_hasta
+
+    def edad(self):
+        snap = self._snapshot
+        return None if snap is None else time.monotonic() - snap.obtenido_en
+
+    # ------------------------------
+    # Internos
+    # ------------------------------
+    def _restaurar_copia(self):
+        copia = cargar_copia(self.copia_local, self.url)
+        if copia is None:
+            return None
+        donaciones, metas, marca = copia
+        log.info("Copia local cargada: %d donaciones", marca["filas"])
+        # Nace vencida para que el primer obtener() sincronice en segundo
+        # plano; la marca de agua vale como última carga completa (delta)
+        self._ultima_carga_completa = time.monotonic()
+        return Snapshot(donaciones, metas, time.monotonic() - self.ttl,
+                        marca["hash_donaciones"], marca["hash_metas"], carga=marca["carga"],
+                        version=marca.get("version_hoja", ""))
+
+    def _lanzar_refresco(self):
+        # Requiere tener self._cond
+        self._refrescando = True
+        threading.Thread(target=self._refrescar, name="refresco-api", daemon=True).start()
+
+    def _descargar(self, desde=None, version="", hojas=None):
+        """Devuelve las hojas decodificadas, o None si siguen en `version`."""
+        params = {"desde": desde} if desde else {}
+        if hojas:
+            params["hojas"] = ",".join(hojas)
+        if len(self.formatos) > 1:
+            params["formato"] = ",".join(self.formatos)
+        cabeceras = {}
+        if version:
+            params["version"] = version
+            cabeceras["If-None-Match"] = f'"{version}"'
+        with medir("api.peticion", desde=desde or 0) as etapa, \
+                self._http.get(self.url, params=params, headers=cabeceras, timeout=self.timeout, stream=True) as resp:
+            etapa.anotar(estado=resp.status_code)
+            if resp.status_code == 304:
+                return None
+            resp.raise_for_status()
+            tipo = resp.headers.get("Content-Type", "").split(";")[0].strip()
+            try:
+                if tipo == TIPOS_CONTENIDO["arrow"]:
+                    data = decodificar_arrow(resp.content)
+                elif tipo == TIPOS_CONTENIDO["csv"]:
+                    data = decodificar_csv(resp.content)
+                else:
+                    # JSON (o lo que sea): las hojas se decodifican a columnas
+                    # a medida que llega el cuerpo
+                    data = decodificar_json(resp.iter_content(TAMANO_TROZO))
+            except (ValueError, pa.ArrowException) as e:
+                # Como resp.json(): p. ej. una página de error de Apps Script
+                raise requests.exceptions.InvalidJSONError(f"Respuesta inválida ({tipo or 'sin tipo'}): {e}") from e
+            # Bytes tal como llegaron por la red (comprimidos si hubo gzip)
+            recibidos = resp.raw.tell()
+            etapa.anotar(formato=tipo, bytes=recibidos,
+                         filas=data["donaciones"].num_rows if "donaciones" in data else 0)
+            contar("api_bytes_total", recibidos, formato=tipo or "desconocido")
+            if data.get("sin_cambios"):
+                return None
+            # El ETag manda; si no hay, el token que venga en el cuerpo
+            etag = resp.headers.get("ETag", "").removeprefix("W/").strip('"')
+            data["version"] = etag or str(data.get("version") or "")
+            return data
+
+    def _descargar_con_reintentos(self, desde=None, version="", hojas=None):
+        for intento in range(self.reintentos + 1):
+            try:
+                return self._descargar(desde, version, hojas)
+            except requests.RequestException as e:
+                status = getattr(e.response, "status_code", None)
+                reintentable = status is None or status in CODIGOS_REINTENTABLES
+                if not reintentable or intento == self.reintentos:
+                    raise
+                # Backoff exponencial con "full jitter" para no sincronizar réplicas
+                espera = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** intento))
+                log.warning("Fallo consultando la API (%s), reintento en %.2fs", e, espera)
+                time.sleep(espera)
+
+    def _ingerir(self, anterior):
+        # Solo lo ejecuta el hilo de refresco (single-flight), sin lock
+        ahora = time.monotonic()
+        pedir_metas = (
+            anterior is None or ahora - anterior.metas_obtenidas_en >= self.ttl_metas
+            or anterior.metas_obtenidas_en < self._metas_invalidadas_en
+        )
+        hojas = None if pedir_metas else ["donaciones"]
+        # Fuera de la recarga completa periódica se pregunta por la versión
+        # conocida y, con ingesta incremental, por las filas posteriores
+        condicional = anterior is not None and ahora - self._ultima_carga_completa < self.recarga_completa
+        conocidas = anterior.donaciones.num_rows if condicional and self.incremental else 0
+        data = self._descargar_con_reintentos(conocidas, anterior.version if condicional and not pedir_metas else "", hojas)
+        if data is None:
+            # Sin cambios: ni descarga ni decodificación; tampoco invalida el render
+            return anterior._replace(obtenido_en=time.monotonic(), filas_nuevas_desde=conocidas)
+        donaciones, version = data["donaciones"], data["version"]
+        metas = self._metas_de(data, anterior, ahora)
+
+        if conocidas and data.get("desde") == conocidas:
+            misma_hoja = (
+                donaciones.column_names == anterior.donaciones.column_names
+                and data.get("total") == conocidas + donaciones.num_rows
+            )
+            if misma_hoja:
+                if not donaciones.num_rows:
+                    return anterior._replace(**metas, version=version, obtenido_en=time.monotonic(),
+                                             filas_nuevas_desde=conocidas)
+                return Snapshot(
+                    concatenar_tablas(anterior.donaciones, donaciones), obtenido_en=time.monotonic(),
+                    hash_donaciones=encadenar_hash(anterior.hash_donaciones, donaciones),
+                    filas_nuevas_desde=conocidas, carga=anterior.carga, version=version, **metas,
+                )
+            log.info("La hoja cambió más allá de añadir filas; recarga completa")
+            data = self._descargar_con_reintentos(hojas=hojas)
+            donaciones, version = data["donaciones"], data["version"]
+            metas = self._metas_de(data, anterior, ahora)
+
+        # Carga completa. Los hashes se calculan aquí, fuera del camino de render;
+        # si la hoja no cambió se conserva el hash anterior (no invalida el render)
+        self._ultima_carga_completa = time.monotonic()
+        if anterior is None:
+            return Snapshot(donaciones, obtenido_en=time.monotonic(), hash_donaciones=hash_tabla(donaciones),
+                            version=version, **metas)
+        if mismo_contenido(donaciones, anterior.donaciones):
+            return anterior._replace(**metas, obtenido_en=time.monotonic(),
+                                     filas_nuevas_desde=donaciones.num_rows, version=version)
+        return Snapshot(donaciones, obtenido_en=time.monotonic(), hash_donaciones=hash_tabla(donaciones),
+                        carga=anterior.carga + 1, version=version, **metas)
+
+    def _metas_de(self, data, anterior, pedidas_en):
+        # Campos de metas del snapshot nuevo. Un endpoint que ignora ?hojas=
+        # las manda en cada respuesta: si no cambiaron se conserva el hash
+        # (no invalida el render)
+        if "metas" not in data:
+            if anterior is None:
+                raise ErrorAPI("La respuesta de la API no trae la hoja de metas")
+            return {"metas": anterior.metas, "hash_metas": anterior.hash_metas,
+                    "metas_obtenidas_en": anterior.metas_obtenidas_en}
+        metas = data["metas"]
+        if anterior is not None and mismo_contenido(metas, anterior.metas):
+            return {"metas": anterior.metas, "hash_metas": anterior.hash_metas, "metas_obtenidas_en": pedidas_en}
+        return {"metas": metas, "hash_metas": hash_tabla(metas), "metas_obtenidas_en": pedidas_en}
+
+    def _refrescar(self):
+        anterior = self._snapshot
+        try:
+            with medir("api.refresco") as etapa:
+                snapshot = self._ingerir(anterior)
+                etapa.anotar(filas=snapshot.donaciones.num_rows, nuevas=snapshot.donaciones.num_rows - snapshot.filas_nuevas_desde)
+        except Exception as e:
+            with self._cond:
+                self.ultimo_error = e
+                self._fallos_seguidos += 1
+                if self._fallos_seguidos >= self.fallos_circuito:
+                    self._circuito_abierto_hasta = time.monotonic() + self.enfriamiento_circuito
+                    log.error("Circuito abierto %.0fs tras %d fallos seguidos: %s",
+                              self.enfriamiento_circuito, self._fallos_seguidos, e)
+                else:
+                    log.warning("Refresco de la API fallido (%d seguidos): %s", self._fallos_seguidos, e)
+                self._terminar_refresco()
+            return
+
+        cambio = anterior is None or (anterior.hash_donaciones, anterior.hash_metas) != (snapshot.hash_donaciones, snapshot.hash_metas)
+        if cambio and self.copia_local:
+            # Todavía dentro del refresco (single-flight): una sola escritura a la vez
+            try:
+                guardar_copia(snapshot, self.copia_local, self.url)
+            except Exception as e:
+                log.warning("No se pudo guardar la copia local: %s", e)
+
+        with self._cond:
+            self._snapshot = snapshot
+            self.ultimo_error = None
+            self._fallos_seguidos = 0
+            self._circuito_abierto_hasta = 0.0
+            self._terminar_refresco()
+
+        if cambio:
+            for callback in self._suscriptores:
+                try:
+                    callback(snapshot)
+                except Exception as e:
+                    log.warning("Suscriptor del cliente API falló: %s", e)
+
+    def _terminar_refresco(self):
+        # Requiere tener self._cond
+        if self._refresco_pendiente and not self.circuito_abierto():
+            self._refresco_pendiente = False
+            self._lanzar_refresco()
+        else:
+            self._refrescando = False
+        self._cond.notify_all()
@@ -0,0 +1,311 @@
+"""Instrumentación por etapa del pipeline: fetch, normalización, render.
+
+Apagada por defecto: `medir()` devuelve un contexto vacío compartido y el
+coste en el camino caliente es comprobar un booleano. Se enciende para todo
+el proceso con DASHBOARD_METRICAS=1 (o `activar()`), o mientras haya alguna
+sesión con el panel de diagnóstico abierto (`?diagnostico=1`,
+`activar_sesion()`): cada una la mantiene encendida PLAZO_SESION segundos
+desde su último rerun y, cuando vencen todas, se apaga sola. Encendida,
+cada etapa guarda sus últimas VENTANA duraciones (p50/p95/p99) y el último
+valor de sus campos (bytes, filas...). Con `activar()` cada medición sale
+además como una línea JSON en el logger "metricas" (el panel no las
+enciende):
+
+    {"etapa": "api.peticion", "ms": 182.4, "bytes": 98213, "formato": "csv"}
+
+Uso:
+    with medir("motor.normalizar", filas=n) as etapa:
+        ...
+        etapa.anotar(columnas=k)
+
+Para operaciones, `iniciar_servidor()` expone lo mismo en formato de texto
+de Prometheus (`GET /metrics`): un histograma y los errores por etapa
+(la frecuencia sale de `rate(tablero_etapa_segundos_count[1m])`; con
+`etapa="app.rerun"`, reruns por segundo), los contadores de `contar()` y los indicadores de
+`indicador()`, que se evalúan en cada lectura. El servidor enciende la
+recolección pero no las líneas de log.
+"""
+import os
+import json
+import time
+import bisect
+import logging
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+VENTANA = int(os.environ.get("DASHBOARD_METRICAS_VENTANA", "512"))
+# Segundos que una sesión con el panel abierto mantiene la medición
+# encendida tras su último rerun (más que el respaldo del modo push)
+PLAZO_SESION = float(os.environ.get("DASHBOARD_METRICAS_PLAZO", "600"))
+PERCENTILES = (50, 95, 99)
+# Límites (segundos) de los histogramas por etapa: de un rerun en caché
+# a una respuesta lenta de Apps Script
+LIMITES = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+PREFIJO = "tablero"
+HOST = os.environ.get("DASHBOARD_METRICAS_HOST", "127.0.0.1")
+
+AYUDA = {
+    "etapa_segundos": "Duración de cada etapa del pipeline (api.peticion = fetch a la API; rate() de _count = frecuencia)",
+    "etapa_errores_total": "Mediciones de la etapa que terminaron en excepción",
+    "api_bytes_total": "Bytes recibidos de la API, tal como llegaron por la red",
+    "cache_consultas_total": "Consultas a cada caché (api = snapshot del cliente, render = dashboard por hash)",
+    "cache_fallos_total": "Consultas que no encontraron el resultado vigente en la caché",
+}
+
+
+class _EtapaNula:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def anotar(self, **campos):
+        pass
+
+
+class _Etapa:
+    __slots__ = ("nombre", "campos", "inicio")
+
+    def __init__(self, nombre, campos):
+        self.nombre = nombre
+        self.campos = campos
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, tipo, *exc):
+        if tipo is not None:
+            self.campos["error"] = tipo.__name__
+        registrar(self.nombre, time.perf_counter() - self.inicio, **self.campos)
+        return False
+
+    def anotar(self, **campos):
+        self.campos.update(campos)
+
+
+ETAPA_NULA = _EtapaNula()
+
+
+class _Registro:
+    def __init__(self):
+        # Encendida para todo el proceso (variable de entorno, activar())
+        self.fija = os.environ.get("DASHBOARD_METRICAS", "0") == "1"
+        self.activo = self.fija
+        # Líneas JSON por medición: solo con DASHBOARD_METRICAS=1 o activar()
+        self.lineas = self.fija
+        # Sesiones del panel de diagnóstico -> instante en que vence su plazo
+        self.sesiones = {}
+        self.lock = threading.Lock()
+        self.duraciones = {}
+        self.campos = {}
+        self.conteos = {}
+        # Para Prometheus: histograma acumulado desde el arranque
+        # ([cubetas], suma) y errores
+        self.histogramas = {}
+        self.errores = {}
+        self.contadores = {}
+        self.indicadores = {}
+
+
+REGISTRO = _Registro()
+
+
+def activa():
+    return REGISTRO.activo
+
+
+def activar(lineas_log=True):
+    REGISTRO.fija = REGISTRO.activo = True
+    if not lineas_log:
+        return
+    REGISTRO.lineas = True
+    if log.level == logging.INFO:
+        return
+    # Streamlit no configura logging para este módulo: sin handler, las
+    # líneas INFO no saldrían
+    if not log.handlers and not logging.getLogger().handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(asctime)s %(name)s %(message)s"))
+        log.addHandler(handler)
+    log.setLevel(logging.INFO)
+    log.info("Instrumentación activada")
+
+
+def activar_sesion(sesion, plazo=PLAZO_SESION):
+    # Sin líneas de log: cualquiera puede abrir el panel desde la URL
+    with REGISTRO.lock:
+        REGISTRO.sesiones[sesion] = time.monotonic() + plazo
+        REGISTRO.activo = True
+
+
+def caducar_sesiones():
+    # Se llama en cada rerun; apaga la medición cuando ya no queda ninguna
+    # sesión de diagnóstico vigente y nada la fijó para todo el proceso
+    if not REGISTRO.activo or REGISTRO.fija:
+        return
+    ahora = time.monotonic()
+    with REGISTRO.lock:
+        for sesion, vence in list(REGISTRO.sesiones.items()):
+            if vence <= ahora:
+                del REGISTRO.sesiones[sesion]
+        if not REGISTRO.sesiones:
+            REGISTRO.activo = False
+
+
+def medir(nombre, **campos):
+    if not REGISTRO.activo:
+        return ETAPA_NULA
+    return _Etapa(nombre, campos)
+
+
+def registrar(nombre, segundos, **campos):
+    if not REGISTRO.activo:
+        return
+    with REGISTRO.lock:
+        duraciones = REGISTRO.duraciones.get(nombre)
+        if duraciones is None:
+            duraciones = REGISTRO.duraciones[nombre] = deque(maxlen=VENTANA)
+            REGISTRO.histogramas[nombre] = [[0] * (len(LIMITES) + 1), 0.0]
+        duraciones.append(segundos)
+        REGISTRO.conteos[nombre] = REGISTRO.conteos.get(nombre, 0) + 1
+        histograma = REGISTRO.histogramas[nombre]
+        histograma[0][bisect.bisect_left(LIMITES, segundos)] += 1
+        histograma[1] += segundos
+        if "error" in campos:
+            REGISTRO.errores[nombre] = REGISTRO.errores.get(nombre, 0) + 1
+        if campos:
+            REGISTRO.campos.setdefault(nombre, {}).update(campos)
+    if REGISTRO.lineas and log.isEnabledFor(logging.INFO):
+        log.info(json.dumps({"etapa": nombre, "ms": round(segundos * 1e3, 3), **campos}, ensure_ascii=False, default=str))
+
+
+def contar(metrica, valor=1, **etiquetas):
+    """Suma `valor` al contador `<PREFIJO>_<metrica>` con esas etiquetas."""
+    if not REGISTRO.activo:
+        return
+    clave = (metrica, tuple(sorted(etiquetas.items())))
+    with REGISTRO.lock:
+        REGISTRO.contadores[clave] = REGISTRO.contadores.get(clave, 0) + valor
+
+
+def indicador(metrica, ayuda, funcion):
+    """Registra un gauge que se calcula al leer /metrics (None = sin dato)."""
+    REGISTRO.indicadores[metrica] = (ayuda, funcion)
+
+
+def resumen():
+    """Una fila por etapa: mediciones, p50/p95/p99 en ms y últimos campos."""
+    with REGISTRO.lock:
+        etapas = {n: (np.fromiter(d, float), REGISTRO.conteos[n], dict(REGISTRO.campos.get(n, {})))
+                  for n, d in REGISTRO.duraciones.items()}
+    filas = []
+    for nombre, (duraciones, conteo, campos) in sorted(etapas.items()):
+        p = np.percentile(duraciones, PERCENTILES) * 1e3
+        filas.append({"etapa": nombre, "n": conteo, **{f"p{q}_ms": round(v, 2) for q, v in zip(PERCENTILES, p)}, **campos})
+    return filas
+
+
+def reiniciar():
+    with REGISTRO.lock:
+        for datos in (REGISTRO.duraciones, REGISTRO.campos, REGISTRO.conteos, REGISTRO.histogramas,
+                      REGISTRO.errores, REGISTRO.contadores):
+            datos.clear()
+
+
+# ==============================
+# EXPOSICIÓN EN FORMATO PROMETHEUS
+# ==============================
+def _etiquetas(pares):
+    if not pares:
+        return ""
+    def escapar(valor):
+        return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+    return "{" + ",".join(f'{k}="{escapar(v)}"' for k, v in pares) + "}"
+
+
+def _numero(valor):
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+def texto_prometheus():
+    with REGISTRO.lock:
+        histogramas = {n: (list(c), s) for n, (c, s) in REGISTRO.histogramas.items()}
+        errores = dict(REGISTRO.errores)
+        contadores = dict(REGISTRO.contadores)
+
+    lineas = []
+
+    def cabecera(metrica, tipo, ayuda):
+        lineas.append(f"# HELP {PREFIJO}_{metrica} {ayuda}")
+        lineas.append(f"# TYPE {PREFIJO}_{metrica} {tipo}")
+
+    cabecera("etapa_segundos", "histogram", AYUDA["etapa_segundos"])
+    for nombre, (cubetas, suma) in sorted(histogramas.items()):
+        acumulado = 0
+        for limite, n in zip((*LIMITES, "+Inf"), cubetas):
+            acumulado += n
+            lineas.append(f"{PREFIJO}_etapa_segundos_bucket{_etiquetas([('etapa', nombre), ('le', limite)])} {acumulado}")
+        lineas.append(f"{PREFIJO}_etapa_segundos_sum{_etiquetas([('etapa', nombre)])} {_numero(suma)}")
+        lineas.append(f"{PREFIJO}_etapa_segundos_count{_etiquetas([('etapa', nombre)])} {acumulado}")
+
+    cabecera("etapa_errores_total", "counter", AYUDA["etapa_errores_total"])
+    for nombre in sorted(histogramas):
+        lineas.append(f"{PREFIJO}_etapa_errores_total{_etiquetas([('etapa', nombre)])} {errores.get(nombre, 0)}")
+
+    vistos = set()
+    for (metrica, pares), valor in sorted(contadores.items()):
+        if metrica not in vistos:
+            cabecera(metrica, "counter", AYUDA.get(metrica, metrica))
+            vistos.add(metrica)
+        lineas.append(f"{PREFIJO}_{metrica}{_etiquetas(pares)} {_numero(valor)}")
+
+    for metrica, (ayuda, funcion) in sorted(REGISTRO.indicadores.items()):
+        try:
+            valor = funcion()
+        except Exception as e:
+            log.warning("No se pudo calcular %s: %s", metrica, e)
+            valor = None
+        if valor is None:
+            continue
+        cabecera(metrica, "gauge", ayuda)
+        lineas.append(f"{PREFIJO}_{metrica} {_numero(valor)}")
+    return "\n".join(lineas) + "\n"
+
+
+def crear_servidor(host=HOST, puerto=9464):
+    class Manejador(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_response(404)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            cuerpo = texto_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(cuerpo)))
+            self.end_headers()
+            self.wfile.write(cuerpo)
+
+        def log_message(self, *args):
+            pass
+
+    return ThreadingHTTPServer((host, puerto), Manejador)
+
+
+def iniciar_servidor(puerto, host=HOST):
+    servidor = crear_servidor(host, puerto)
+    threading.Thread(target=servidor.serve_forever, name="metricas", daemon=True).start()
+    activar(lineas_log=False)
+    log.warning("Métricas de Prometheus en http://%s:%d/metrics", host, puerto)
+    return servidor
@@ -0,0 +1,78 @@
+"""Perfil de cProfile de una sola ejecución del script (`?perfil=1`).
+
+Para investigar una pantalla lenta sin redesplegar: se abre el dashboard
+con `?perfil=1` y ese rerun, y solo ese, se ejecuta bajo cProfile. El
+perfil se guarda en DIR_PERFILES como `perfil-<fecha>.prof` (se abre con
+`python -m pstats` o snakeviz) y la página muestra las TOP_PERFIL funciones
+con más tiempo acumulado. Sin el parámetro el coste es leer un query
+param: no se activa ningún perfilador.
+
+cProfile solo observa el hilo que lo activa: el del rerun de esa sesión.
+El refresco en segundo plano de datos.py y las demás sesiones quedan fuera.
+"""
+import os
+import pstats
+import logging
+import cProfile
+from datetime import datetime
+
+import pandas as pd
+
+log = logging.getLogger(__name__)
+
+RAIZ = os.path.dirname(os.path.abspath(__file__))
+DIR_PERFILES = os.environ.get("DASHBOARD_DIR_PERFILES", os.path.join(RAIZ, "perfiles"))
+TOP_PERFIL = int(os.environ.get("DASHBOARD_TOP_PERFIL", "40"))
+
+
+def iniciar():
+    perfil = cProfile.Profile()
+    try:
+        perfil.enable()
+    except ValueError as e:
+        # Python 3.12+: solo un perfilador a la vez (otra sesión perfilando)
+        log.warning("No se pudo iniciar el perfil: %s", e)
+        return None
+    return perfil
+
+
+def detener(perfil):
+    if perfil is not None:
+        perfil.disable()
+
+
+def _funcion(archivo, linea, nombre):
+    if archivo == "~":
+        # Funciones en C: "<built-in method ...>"
+        return nombre
+    if archivo.startswith(RAIZ):
+        archivo = os.path.relpath(archivo, RAIZ)
+    elif "site-packages" in archivo:
+        archivo = archivo.split("site-packages" + os.sep, 1)[1]
+    return f"{archivo}:{linea}({nombre})"
+
+
+def terminar(perfil, directorio=DIR_PERFILES, top=TOP_PERFIL):
+    """Detiene el perfil, lo guarda y devuelve (ruta o None, DataFrame top-N)."""
+    perfil.disable()
+    ruta = None
+    try:
+        os.makedirs(directorio, exist_ok=True)
+        ruta = os.path.join(directorio, f"perfil-{datetime.now():%Y%m%d-%H%M%S-%f}.prof")
+        perfil.dump_stats(ruta)
+    except OSError as e:
+        log.warning("No se pudo guardar el perfil: %s", e)
+        ruta = None
+
+    filas = [
+        {
+            "funcion": _funcion(*clave),
+            "llamadas": llamadas,
+            "propio_ms": propio * 1e3,
+            "acumulado_ms": acumulado * 1e3,
+            "por_llamada_ms": acumulado * 1e3 / llamadas if llamadas else 0.0,
+        }
+        for clave, (_, llamadas, propio, acumulado, _) in pstats.Stats(perfil).stats.items()
+    ]
+    tabla = pd.DataFrame(filas, columns=["funcion", "llamadas", "propio_ms", "acumulado_ms", "por_llamada_ms"])
+    return ruta, tabla.nlargest(top, "acumulado_ms").round(3)
@@ -0,0 +1,86 @@
+"""Plantillas compiladas una sola vez.
+
+La página del dashboard es casi toda estática: hoja de estilos, cabecera,
+scripts. Aquí se lee y minifica al arrancar y se parte en trozos fijos y
+huecos `{{nombre}}`; cada render solo une los trozos con los valores.
+"""
+import re
+
+HUECO = re.compile(r"\{\{(\w+)\}\}")
+
+
+# ==============================
+# MINIFICACIÓN
+# ==============================
+def minificar_css(css):
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.S)
+    css = re.sub(r"\s+", " ", css)
+    # Sin espacios alrededor de llaves, punto y coma y comas, ni tras ":"
+    css = re.sub(r"\s*([{};,])\s*", r"\1", css)
+    css = re.sub(r":\s+", ":", css)
+    return css.replace(";}", "}").strip()
+
+
+def minificar_js(js):
+    lineas = (l.strip() for l in js.splitlines())
+    return "\n".join(l for l in lineas if l and not l.startswith("//"))
+
+
+def minificar_html(html):
+    # Los <script> en línea se tratan aparte: el espacio en JS sí importa
+    partes = re.split(r"(<script>.*?</script>)", html, flags=re.S)
+    salida = []
+    for parte in partes:
+        if parte.startswith("<script>"):
+            salida.append("<script>" + minificar_js(parte[8:-9]) + "</script>")
+        else:
+            parte = re.sub(r"<!--.*?-->", "", parte, flags=re.S)
+            parte = re.sub(r">\s+<", "><", parte)
+            parte = re.sub(r"\s+", " ", parte)
+            salida.append(parte)
+    return "".join(salida).strip()
+
+
+# ==============================
+# PLANTILLA
+# ==============================
+class Plantilla:
+    """Texto partido en trozos fijos y huecos `{{nombre}}`."""
+
+    def __init__(self, texto):
+        partes = HUECO.split(texto)
+        self.fijos = partes[0::2]
+        self.huecos = partes[1::2]
+
+    def rellenar(self, **valores):
+        salida = [self.fijos[0]]
+        for hueco, fijo in zip(self.huecos, self.fijos[1:]):
+            salida.append(str(valores[hueco]))
+            salida.append(fijo)
+        return "".join(salida)
+
+    def parcial(self, **valores):
+        # Rellena los huecos dados y deja el resto para más tarde (p. ej. lo
+        # que depende de cada sesión sobre una página cacheada)
+        fijos = []
+        huecos = []
+        actual = [self.fijos[0]]
+        for hueco, fijo in zip(self.huecos, self.fijos[1:]):
+            if hueco in valores:
+                actual.append(str(valores[hueco]))
+            else:
+                fijos.append("".join(actual))
+                huecos.append(hueco)
+                actual = []
+            actual.append(fijo)
+        fijos.append("".join(actual))
+        nueva = Plantilla.__new__(Plantilla)
+        nueva.fijos = fijos
+        nueva.huecos = huecos
+        return nueva
+
+
+def cargar_plantilla(ruta, **estaticos):
+    with open(ruta, encoding="utf-8") as f:
+        texto = minificar_html(f.read())
+    return Plantilla(texto).parcial(**estaticos)
@@ -0,0 +1,439 @@
+import os
+import logging
+import threading
+from functools import lru_cache
+from typing import NamedTuple, Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from dateutil.tz import tzlocal
+from pandas.api.types import union_categoricals
+
+from metricas import medir
+from tablas import texto_celda
+
+log = logging.getLogger(__name__)
+
+# ==============================
+# FILTRAR: EXCLUIR VITAMINA A Y D2 Y VITAMINA B
+# ==============================
+MEDICAMENTOS_EXCLUIR = ["Vitamina A y D2 (gotas)", "Vitamina B (gotas)"]
+
+# Columnas que no forman parte de la huella de una donación
+COLUMNAS_FUERA_DE_HUELLA = ['Donante', 'Contacto (opcional)']
+# Máximo de donaciones nuevas que recorre el overlay en un tick
+MAX_COLA_OVERLAY = 10
+
+
+# ==============================
+# ESQUEMA: PLAN DE COLUMNAS POR CABECERA
+# ==============================
+# Las cabeceras del formulario casi nunca cambian: se resuelven una vez por
+# tupla de cabecera (lru_cache, por su hash) en un plan de columnas que se
+# aplica con una sola selección + renombrado. Una cabecera que no encaja
+# se avisa en el log en lugar de acabar en totales a cero.
+COLUMNAS_FECHA = ["Marca temporal", "Timestamp", "timestamp"]
+COLUMNA_NOMBRE_PUBLICO = "Nombre o entidad donante para mostrar en el dashboard (opcional)"
+COLUMNA_CONTACTO = "Contacto (opcional)"
+COLUMNAS_DESCARTAR = ["Nombre completo del donante (persona o entidad)", "Donante"]
+
+
+class PlanColumnas(NamedTuple):
+    # Posiciones de la hoja que se conservan y su nombre normalizado
+    posiciones: list
+    nombres: list
+    # Posición (ya en la selección) de la columna del donante público, o None
+    donante: Optional[int]
+    # Medicamentos sin columna en la hoja: valen 0
+    faltantes: list
+
+
+@lru_cache(maxsize=64)
+def plan_donaciones(cabecera, medicamentos):
+    limpias = [str(c).strip() for c in cabecera]
+    fecha = next((c for c in COLUMNAS_FECHA if c in limpias), None)
+    posiciones = [i for i, c in enumerate(limpias) if c not in COLUMNAS_DESCARTAR]
+    nombres = ["fecha_hora" if limpias[i] == fecha else limpias[i] for i in posiciones]
+
+    columna_donante = next((c for c in (COLUMNA_NOMBRE_PUBLICO, COLUMNA_CONTACTO) if c in nombres), None)
+    donante = nombres.index(columna_donante) if columna_donante else None
+    faltantes = [m for m in medicamentos if m not in nombres]
+
+    conocidas = set(COLUMNAS_FECHA + COLUMNAS_DESCARTAR + MEDICAMENTOS_EXCLUIR + [COLUMNA_NOMBRE_PUBLICO, COLUMNA_CONTACTO]) | set(medicamentos)
+    extra = [c for c in limpias if c not in conocidas]
+    if fecha is None or faltantes or columna_donante is None:
+        log.warning(
+            "Cabecera de donaciones desconocida: fecha=%s donante=%s medicamentos sin columna=%s "
+            "columnas no reconocidas=%s", fecha, columna_donante, faltantes, extra,
+        )
+    elif extra:
+        log.info("Columnas de donaciones no usadas: %s", extra)
+    return PlanColumnas(posiciones, nombres, donante, faltantes)
+
+
+@lru_cache(maxsize=16)
+def plan_metas(cabecera):
+    limpias = [str(c).strip().lower() for c in cabecera]
+
+    def buscar(exacta, *fragmentos):
+        if exacta in limpias:
+            return limpias.index(exacta)
+        return next((i for i, c in enumerate(limpias) if any(f in c for f in fragmentos)), None)
+
+    meta = buscar("meta", "meta")
+    medicamento = buscar("medicamento", "medicamento", "nombre")
+    if meta is None or medicamento is None:
+        log.error("Cabecera de metas desconocida: %s", list(cabecera))
+        raise ValueError(f"Cabecera de metas desconocida: {list(cabecera)}")
+    return [medicamento, meta]
+
+
+# ==============================
+# NORMALIZACIÓN METAS
+# ==============================
+def normalizar_metas(metas):
+    metas = metas.iloc[:, plan_metas(tuple(metas.columns))].set_axis(["medicamento", "meta"], axis=1)
+
+    metas["medicamento"] = metas["medicamento"].astype(str).str.strip()
+    metas["meta"] = pd.to_numeric(metas["meta"], errors="coerce").fillna(0)
+
+    metas = metas[~metas["medicamento"].isin(MEDICAMENTOS_EXCLUIR)].copy()
+    lista_medicamentos = metas["medicamento"].tolist()
+    return metas, lista_medicamentos
+
+
+# ==============================
+# NORMALIZACIÓN DONACIONES
+# ==============================
+def coercer_bloque_numerico(bloque):
+    # Una sola coerción para todo el bloque ancho de medicamentos (en vez de
+    # una llamada por columna). Las cantidades se repiten mucho, así que se
+    # parsean solo los valores distintos y se reparten con los códigos.
+    if all(t.kind in "iuf" for t in bloque.dtypes):
+        # Columnas que ya llegan tipadas (tablas.py): nada que parsear
+        return bloque.astype(float).fillna(0.0)
+    valores = bloque.to_numpy(dtype=object).ravel()
+    codigos, distintos = pd.factorize(valores, use_na_sentinel=False)
+    numeros = pd.to_numeric(distintos, errors="coerce").astype(float)
+    numeros = np.nan_to_num(numeros, nan=0.0)[codigos].reshape(bloque.shape)
+    return pd.DataFrame(numeros, index=bloque.index, columns=bloque.columns)
+
+
+def normalizar_donaciones(donaciones, lista_medicamentos):
+    meds = list(dict.fromkeys(lista_medicamentos))
+    plan = plan_donaciones(tuple(donaciones.columns), tuple(meds))
+    donaciones = donaciones.iloc[:, plan.posiciones].set_axis(plan.nombres, axis=1)
+
+    if plan.donante is not None:
+        donantes = donaciones.iloc[:, plan.donante].fillna("").astype(str).str.strip()
+        anonimo = (donantes == "") | (donantes.str.lower() == "nan")
+        donaciones["donante_publico"] = donantes.mask(anonimo, "Donante anónimo")
+    else:
+        donaciones["donante_publico"] = "Donante anónimo"
+
+    # Crear columnas medicamentos. Siempre float: el dtype no debe depender de
+    # qué filas trae el lote (el id de donación incluye los valores formateados)
+    for med in plan.faltantes:
+        donaciones[med] = 0
+    donaciones[meds] = coercer_bloque_numerico(donaciones[meds])
+
+    return donaciones
+
+
+# ==============================
+# FECHAS: FORMATO DETECTADO UNA VEZ Y ZONA HORARIA DEL EVENTO
+# ==============================
+# Formatos en que llega la marca temporal de Google Forms (según la
+# configuración regional de la hoja, o ISO si la API serializa Date).
+# Ante la duda gana el primero: día/mes, como hacía dayfirst=True.
+FORMATOS_FECHA = ["%d/%m/%Y %H:%M:%S", "%d/%m/%Y %H:%M", "ISO8601", "%m/%d/%Y %H:%M:%S", "%m/%d/%Y %H:%M"]
+# Zona de las marcas sin zona de la hoja (la de la hoja de cálculo); vacía:
+# ya están en hora del evento y no se convierten
+ZONA_ORIGEN = os.environ.get("DASHBOARD_ZONA_ORIGEN", "")
+# Zona del evento: la hora que se muestra en "última donación" y contra la
+# que se mide la antigüedad de los datos (p. ej. "America/Bogota"). Vacía:
+# la hora local del servidor. No hay un valor por defecto que sirva para
+# todos los despliegues: se fija donde se conoce dónde es el evento
+ZONA_LOCAL = os.environ.get("DASHBOARD_ZONA_LOCAL", "")
+TAMANO_MUESTRA = 200
+CON_ZONA = r"(Z|[+-]\d\d:?\d\d)$"
+
+
+class LectorFechas:
+    """Convierte la columna de fecha del formulario a hora local del evento.
+
+    El formato se detecta una vez sobre una muestra y luego se parsea con
+    formato explícito (strptime de Arrow, sin inferencia fila a fila). Se
+    guarda lo último leído: en una reconstrucción solo se parsean las filas
+    que no coinciden con el prefijo ya conocido.
+    """
+
+    def __init__(self, zona_origen=ZONA_ORIGEN, zona_local=ZONA_LOCAL, formatos=FORMATOS_FECHA):
+        self.zona_origen = zona_origen
+        self.zona_local = zona_local or tzlocal()
+        self.formatos = formatos
+        self.formato = None
+        self._textos = pa.array([], type=pa.large_string())
+        self._fechas = np.array([], dtype="datetime64[us]")
+
+    def leer(self, valores, desde=0):
+        # `valores` son las filas de la hoja a partir de la posición `desde`.
+        # Devuelve un array datetime64[us] en hora local del evento (NaT si
+        # no se entiende)
+        textos = pa.array(pd.Series(valores).fillna("").astype(str), type=pa.large_string())
+        if isinstance(textos, pa.ChunkedArray):
+            # Columna que viene troceada de la tabla Arrow del snapshot
+            textos = textos.combine_chunks()
+        textos = pc.utf8_trim_whitespace(textos)
+        if desde > len(self._textos):
+            desde = 0
+            self._textos, self._fechas = self._textos[:0], self._fechas[:0]
+        previos = self._textos[desde:]
+        n = min(len(textos), len(previos))
+        distinta = pc.index(pc.equal(textos[:n], previos[:n]), False).as_py()
+        conocidas = n if distinta < 0 else distinta
+        fechas = np.concatenate([self._fechas[desde:desde + conocidas], self._parsear(textos[conocidas:])])
+        self._textos = pa.concat_arrays([self._textos[:desde], textos])
+        self._fechas = np.concatenate([self._fechas[:desde], fechas])
+        return fechas
+
+    def _parsear(self, textos):
+        if len(textos) == 0:
+            return np.array([], dtype="datetime64[us]")
+        if self.formato is None:
+            self.formato = self._detectar(textos)
+        fechas = self._con_formato(textos, self.formato)
+        # Si la hoja cambió de formato (p. ej. otra configuración regional)
+        # y casi nada encaja, se vuelve a detectar
+        no_vacios = pc.sum(pc.not_equal(textos, "")).as_py()
+        if no_vacios and fechas.count() < no_vacios / 2:
+            formato = self._detectar(textos)
+            if formato != self.formato:
+                log.warning("Formato de fecha %r ya no encaja, se cambia a %r", self.formato, formato)
+                self.formato = formato
+                fechas = self._con_formato(textos, formato)
+        return self._a_hora_local(fechas)
+
+    def _detectar(self, textos):
+        muestra = pc.filter(textos, pc.not_equal(textos, ""))[:TAMANO_MUESTRA]
+        if len(muestra) == 0:
+            return self.formatos[0]
+        aciertos = {f: self._con_formato(muestra, f).count() for f in self.formatos}
+        mejor = max(self.formatos, key=lambda f: aciertos[f])
+        if aciertos[mejor] < len(muestra) / 2:
+            # Ningún formato conocido: inferencia de pandas, como antes
+            log.warning("Formato de fecha desconocido (p. ej. %r), se infiere fila a fila", muestra[0].as_py())
+            return None
+        log.info("Formato de fecha detectado: %s", mejor)
+        return mejor
+
+    @staticmethod
+    def _con_formato(textos, formato):
+        if formato is None:
+            return pd.to_datetime(textos.to_pandas(), dayfirst=True, errors="coerce")
+        if formato == "ISO8601":
+            # Con zona (p. ej. "...Z") se unifica en UTC; sin zona queda tal cual
+            utc = pc.any(pc.match_substring_regex(textos, CON_ZONA)).as_py()
+            return pd.to_datetime(textos.to_pandas(), format="ISO8601", utc=utc, errors="coerce")
+        parseadas = pc.strptime(textos, format=formato, unit="s", error_is_null=True)
+        return pd.Series(parseadas.to_numpy(zero_copy_only=False)).astype("datetime64[us]")
+
+    def _a_hora_local(self, fechas):
+        if fechas.dt.tz is not None:
+            fechas = fechas.dt.tz_convert(self.zona_local).dt.tz_localize(None)
+        elif self.zona_origen and self.zona_origen != self.zona_local:
+            fechas = (fechas.dt.tz_localize(self.zona_origen, ambiguous=True, nonexistent="shift_forward")
+                      .dt.tz_convert(self.zona_local).dt.tz_localize(None))
+        return fechas.to_numpy().astype("datetime64[us]")
+
+
+# ==============================
+# DETECCIÓN NUEVA DONACIÓN
+# ==============================
+def _texto_huella(columna):
+    # El tipo de una columna depende del lote en que llegó (tablas.py): la
+    # huella usa el texto de la celda, con 10, 10.0 y "10" iguales y el vacío
+    # igual que un nulo. Los medicamentos ya son siempre float
+    if columna.dtype.kind in "iufb":
+        return columna.map(texto_celda, na_action="ignore").fillna("").astype(str)
+    return columna.fillna("").astype(str)
+
+
+def resumir_donaciones(donaciones, lista_medicamentos, lector=None, desde=0):
+    # Una fila por donación con su huella, donante, monto y fecha. La huella
+    # se calcula vectorizada para todas las filas a la vez.
+    fecha_hora = np.full(len(donaciones), np.datetime64("NaT"), dtype="datetime64[us]")
+    if "fecha_hora" in donaciones.columns:
+        try:
+            with medir("motor.fechas", filas=len(donaciones)):
+                fecha_hora = (lector or LectorFechas()).leer(donaciones["fecha_hora"], desde)
+        except Exception as e:
+            print(f"Error procesando fechas de donaciones: {e}")
+
+    meds = list(dict.fromkeys(lista_medicamentos))
+    huella = donaciones.loc[:, ~donaciones.columns.isin(COLUMNAS_FUERA_DE_HUELLA)]
+    for i, columna in enumerate(huella.columns):
+        if columna not in meds:
+            huella.isetitem(i, _texto_huella(huella.iloc[:, i]))
+    # Tipos compactos: este resumen vive una vez por proceso y lo leen todas
+    # las sesiones. Donantes como categoría (se repiten mucho, sobre todo
+    # "Donante anónimo") y montos con el entero más pequeño que los contenga
+    # (float solo si alguna cantidad trae decimales)
+    return pd.DataFrame({
+        "huella": pd.util.hash_pandas_object(huella, index=False).to_numpy(),
+        "donante": pd.Categorical(donaciones["donante_publico"]),
+        "monto": pd.to_numeric(donaciones[meds].sum(axis=1), downcast="integer").to_numpy(),
+        "fecha_hora": fecha_hora,
+    })
+
+
+def concatenar_resumenes(anterior, nuevo):
+    # pd.concat convierte a object dos categóricas con categorías distintas
+    donante = union_categoricals([anterior["donante"], nuevo["donante"]], ignore_order=True)
+    resumen = pd.concat([anterior.drop(columns="donante"), nuevo.drop(columns="donante")], ignore_index=True)
+    resumen.insert(1, "donante", donante)
+    return resumen
+
+
+def _como_donacion(fila):
+    return {
+        "id": int(fila["huella"]),
+        "donante": fila["donante"],
+        "monto": float(fila["monto"]),
+        "hora": fila["fecha_hora"].strftime("%H:%M:%S") if pd.notna(fila["fecha_hora"]) else "",
+        "fecha_hora": fila["fecha_hora"],
+    }
+
+
+def ultima_donacion(resumen):
+    # La más reciente por fecha_hora (en empate, la que llegó después); sin ordenar
+    validas = resumen["fecha_hora"].dropna()
+    if len(validas) == 0:
+        return None
+    return _como_donacion(resumen.loc[validas.iloc[::-1].idxmax()])
+
+
+def donaciones_nuevas(resumen, huellas_previas, maximo=MAX_COLA_OVERLAY):
+    # Diferencia de conjuntos entre las huellas actuales y las del tick
+    # anterior: detecta TODAS las donaciones llegadas, no solo la última
+    nuevas = resumen[~np.isin(resumen["huella"].to_numpy(), huellas_previas)]
+    nuevas = nuevas.sort_values("fecha_hora", kind="stable").tail(maximo)
+    return [_como_donacion(fila) for _, fila in nuevas.iterrows()]
+
+
+# ==============================
+# PROCESAMIENTO DE DATOS PARA DASHBOARD
+# ==============================
+def sumar_medicamentos(donaciones, lista_medicamentos):
+    # Suma por columna sobre el bloque ancho; igual que el antiguo melt +
+    # filtro cantidad > 0 + groupby, solo cuentan las cantidades positivas
+    meds = list(dict.fromkeys(lista_medicamentos))
+    return donaciones[meds].clip(lower=0).sum()
+
+
+def avance_desde_totales(metas, totales):
+    avance = metas.copy()
+    avance["cantidad"] = avance["medicamento"].map(totales).fillna(0)
+    avance["faltante"] = (avance["meta"] - avance["cantidad"]).clip(lower=0)
+    avance["porcentaje"] = (avance["cantidad"] / avance["meta"].where(avance["meta"] > 0) * 100).fillna(0)
+    return avance
+
+
+def calcular_avance(donaciones, metas, lista_medicamentos):
+    return avance_desde_totales(metas, sumar_medicamentos(donaciones, lista_medicamentos))
+
+
+# ==============================
+# TOTALES INCREMENTALES POR MEDICAMENTO
+# ==============================
+class EstadoDashboard(NamedTuple):
+    avance: pd.DataFrame
+    ultima: dict
+    lista_medicamentos: tuple
+    # Resumen por donación y sus huellas (array inmutable compartido)
+    resumen: pd.DataFrame
+    huellas: np.ndarray
+
+
+class MotorTotales:
+    """Totales por medicamento que se actualizan solo con las filas nuevas.
+
+    Se comparte entre sesiones. Una actualización cuesta O(filas nuevas);
+    solo se reconstruye desde cero cuando cambian los medicamentos de las
+    metas, la cabecera de la hoja o la carga completa de la que vienen los
+    datos. Las metas se normalizan solo cuando cambia su hash: un cambio de
+    objetivos sin medicamentos nuevos no toca los totales.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clave = None
+        self._filas = 0
+        self._hash_metas = None
+        self.metas = None
+        self.lista_medicamentos = ()
+        self.totales = None
+        self.resumen = None
+        self.ultima = None
+        self.lector_fechas = LectorFechas()
+
+    def actualizar(self, snapshot):
+        # Devuelve el EstadoDashboard correspondiente al snapshot dado
+        filas = snapshot.donaciones.num_rows
+        with self._lock, medir("motor.actualizar", filas=filas) as etapa:
+            if snapshot.hash_metas != self._hash_metas:
+                self.metas, lista = normalizar_metas(snapshot.metas.to_pandas())
+                # Tupla: también es la clave de las cachés derivadas de las
+                # metas (plan de columnas, colores e imágenes de render.py)
+                self.lista_medicamentos = tuple(lista)
+                self._hash_metas = snapshot.hash_metas
+            clave = (snapshot.carga, tuple(snapshot.donaciones.column_names), self.lista_medicamentos)
+            if clave != self._clave or filas < self._filas:
+                self._reconstruir(snapshot)
+                self._clave = clave
+                etapa.anotar(modo="reconstruir", nuevas=filas)
+            elif filas > self._filas:
+                etapa.anotar(modo="sumar", nuevas=filas - self._filas)
+                self._sumar(snapshot.donaciones.slice(self._filas))
+            else:
+                etapa.anotar(modo="sin_cambios", nuevas=0)
+            self._filas = filas
+            return EstadoDashboard(
+                avance_desde_totales(self.metas, self.totales), self.ultima, self.lista_medicamentos,
+                self.resumen, self.resumen["huella"].to_numpy(),
+            )
+
+    def antiguedad(self):
+        # Segundos desde la donación más reciente (hora del evento); None
+        # si aún no hay ninguna con fecha
+        ultima = self.ultima
+        if ultima is None or pd.isna(ultima["fecha_hora"]):
+            return None
+        ahora = pd.Timestamp.now(tz=self.lector_fechas.zona_local).tz_localize(None)
+        return (ahora - ultima["fecha_hora"]).total_seconds()
+
+    def _reconstruir(self, snapshot):
+        with medir("motor.normalizar", filas=snapshot.donaciones.num_rows):
+            donaciones = normalizar_donaciones(snapshot.donaciones.to_pandas(), self.lista_medicamentos)
+        # El lector conserva las fechas ya parseadas: tras una carga completa
+        # solo se parsean las filas que no conocía
+        with medir("motor.resumen", filas=len(donaciones)):
+            self.resumen = resumir_donaciones(donaciones, self.lista_medicamentos, self.lector_fechas)
+            self.ultima = ultima_donacion(self.resumen)
+        with medir("motor.totales", filas=len(donaciones)):
+            self.totales = sumar_medicamentos(donaciones, self.lista_medicamentos)
+
+    def _sumar(self, filas_nuevas):
+        with medir("motor.normalizar", filas=filas_nuevas.num_rows):
+            nuevas = normalizar_donaciones(filas_nuevas.to_pandas(), self.lista_medicamentos)
+        with medir("motor.totales", filas=len(nuevas)):
+            self.totales = self.totales.add(sumar_medicamentos(nuevas, self.lista_medicamentos), fill_value=0)
+
+        with medir("motor.resumen", filas=len(nuevas)):
+            resumen = resumir_donaciones(nuevas, self.lista_medicamentos, self.lector_fechas, self._filas)
+            self.resumen = concatenar_resumenes(self.resumen, resumen)
+            ultima = ultima_donacion(resumen)
+        if ultima is not None and (self.ultima is None or ultima["fecha_hora"] >= self.ultima["fecha_hora"]):
+            self.ultima = ultima
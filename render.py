@@ -0,0 +1,316 @@
+import os
+import json
+from functools import lru_cache
+from typing import NamedTuple
+
+from activos import Activos, activos_en_disco, URL_CONFETI, URL_FUENTES
+from plantilla import cargar_plantilla, minificar_css, minificar_html
+
+# Hoja de estilos compartida por la página HTML y el componente del tablero
+DIR_TABLERO = os.path.join(os.path.dirname(os.path.abspath(__file__)), "componentes", "tablero")
+with open(os.path.join(DIR_TABLERO, "estilos.css"), encoding="utf-8") as f:
+    ESTILOS = minificar_css(f.read())
+
+
+# ==============================
+# PALETA DE COLORES PREMIUM HEALTHTECH
+# ==============================
+COLORES_MEDICAMENTOS = [
+    "#00D4FF",  # Cyan eléctrico
+    "#FF3D71",  # Rosa neón
+    "#00FF9F",  # Verde esmeralda
+    "#FFB800",  # Dorado brillante
+    "#B24BF3",  # Púrpura vibrante
+    "#FF6B35",  # Naranja cálido
+]
+
+
+# ==============================
+# ✅ IMÁGENES DE MEDICAMENTOS - URLs VERIFICADAS MANUALMENTE
+# ==============================
+IMG_MAP = {
+    "multivitaminas (gotas)": "https://img.icons8.com/?size=100&id=BayY6C34iXTA&format=png&color=000000",
+    "Multivitaminas (gotas)": "https://img.icons8.com/?size=100&id=BayY6C34iXTA&format=png&color=000000",
+    "vitaminas c (gotas)": "https://img.icons8.com/?size=100&id=p514QFRInGPV&format=png&color=000000",
+    "Vitaminas C (gotas)": "https://img.icons8.com/?size=100&id=p514QFRInGPV&format=png&color=000000",
+    "vitamina a y d2 (gotas)": "https://img.icons8.com/?size=100&id=56345&format=png&color=000000",
+    "Vitamina A y D2 (gotas)": "https://img.icons8.com/?size=100&id=56345&format=png&color=000000",
+    "vitamina d2 forte (gotas)": "https://img.icons8.com/?size=100&id=aRMbtEpJbrOj&format=png&color=000000",
+    "Vitamina D2 forte (gotas)": "https://img.icons8.com/?size=100&id=aRMbtEpJbrOj&format=png&color=000000",
+    "vitamina b (gotas)": "https://img.icons8.com/?size=100&id=2t4G6lB9hX4X&format=png&color=000000",
+    "Vitamina B (gotas)": "https://img.icons8.com/?size=100&id=2t4G6lB9hX4X&format=png&color=000000",
+    "fumarato ferroso en suspensión": "https://img.icons8.com/?size=100&id=10XEPhqyfdJh&format=png&color=000000",
+    "Fumarato ferroso en suspensión": "https://img.icons8.com/?size=100&id=10XEPhqyfdJh&format=png&color=000000",
+}
+
+DEFAULT_IMG = "https://cdn-icons-png.flaticon.com/512/2966/2966334.png"
+
+# Confeti, fuente e iconos desde la caché local (ver activos.py): al
+# importar solo se mira el disco, las descargas van aparte. El componente
+# del tablero vive en component/<nombre>/: sube dos niveles
+ICONOS = [DEFAULT_IMG, *IMG_MAP.values()]
+ACTIVOS = Activos(activos_en_disco(ICONOS))
+URL_ACTIVOS_TABLERO = "../../app/static/activos/"
+
+INDICE_COLOR = {c.upper(): i for i, c in enumerate(COLORES_MEDICAMENTOS)}
+
+def cola_tablero(nuevas):
+    return [{"donante": d["donante"], "monto": formatear_numero(d["monto"]), "hora": d["hora"]} for d in nuevas]
+
+
+def cola_donaciones_json(nuevas):
+    # Lista JSON segura para incrustar dentro de <script>
+    return json.dumps(cola_tablero(nuevas), ensure_ascii=False).replace("</", "<\\/")
+
+
+def formatear_numero(x):
+    try:
+        return f"{int(float(x)):,}".replace(",", ".")
+    except:
+        return "0"
+
+def defs_termometros():
+    # Gradientes, filtro y recorte de los termómetros, una vez por documento.
+    # Cada tarjeta los referencia por id: termo-bulb-N / termo-tube-N según
+    # el índice de su color en la paleta
+    gradientes = "".join(f"""
+        <linearGradient id="termo-bulb-{i}" x1="0%" y1="0%" x2="0%" y2="100%">
+            <stop offset="0%" style="stop-color:{color};stop-opacity:1" />
+            <stop offset="50%" style="stop-color:{color};stop-opacity:0.8" />
+            <stop offset="100%" style="stop-color:{color};stop-opacity:0.6" />
+        </linearGradient>
+        <linearGradient id="termo-tube-{i}" x1="0%" y1="0%" x2="0%" y2="100%">
+            <stop offset="0%" style="stop-color:{color};stop-opacity:1" />
+            <stop offset="100%" style="stop-color:{color};stop-opacity:0.7" />
+        </linearGradient>""" for i, color in enumerate(COLORES_MEDICAMENTOS))
+    return f"""
+    <svg width="0" height="0" style="position: absolute;" aria-hidden="true">
+        <defs>{gradientes}
+            <filter id="termo-neon">
+                <feGaussianBlur stdDeviation="4" result="coloredBlur"/>
+                <feMerge>
+                    <feMergeNode in="coloredBlur"/>
+                    <feMergeNode in="coloredBlur"/>
+                    <feMergeNode in="SourceGraphic"/>
+                </feMerge>
+            </filter>
+            <clipPath id="termo-clip">
+                <rect x="52" y="35" width="26" height="135" rx="13"/>
+            </clipPath>
+        </defs>
+    </svg>
+    """
+
+
+def termometro_ultra_moderno_svg(pct, color="#00d4ff"):
+    pct = max(0, min(float(pct), 100))
+    altura = int(120 * (pct / 100))
+    y = 150 - altura
+    n = INDICE_COLOR.get(color.upper(), 0)
+    return minificar_html(f"""
+    <svg viewBox="0 0 130 210">
+        <circle cx="65" cy="170" r="26" fill="{color}" opacity="0.15" filter="blur(8px)"/>
+        <circle cx="65" cy="170" r="22" fill="rgba(10,15,30,0.5)" stroke="{color}" stroke-width="2.5" opacity="0.5"/>
+        <rect x="52" y="35" width="26" height="135" rx="13" fill="rgba(10,15,30,0.5)" stroke="{color}" stroke-width="2.5" opacity="0.5"/>
+        <rect x="52" y="{y}" width="26" height="{altura}" fill="url(#termo-tube-{n})" clip-path="url(#termo-clip)" filter="url(#termo-neon)"/>
+        <circle cx="65" cy="170" r="18" fill="url(#termo-bulb-{n})" filter="url(#termo-neon)"/>
+        <circle cx="65" cy="170" r="10" fill="white" opacity="0.3"/>
+        <g stroke="{color}" stroke-width="2" opacity="0.6">
+            <line x1="79" y1="50" x2="88" y2="50"/>
+            <line x1="79" y1="80" x2="88" y2="80"/>
+            <line x1="79" y1="110" x2="88" y2="110"/>
+            <line x1="79" y1="140" x2="88" y2="140"/>
+        </g>
+        <text x="65" y="200" text-anchor="middle" fill="{color}" font-size="14" font-weight="900" opacity="0.9">{pct:.0f}%</text>
+    </svg>
+    """)
+
+
+# ==============================
+# COLOR E IMÁGENES POR MEDICAMENTO (DERIVADOS DE LAS METAS)
+# ==============================
+class EstiloMedicamento(NamedTuple):
+    color: str
+    img: str
+    img_tablero: str
+
+
+def _estilo(nombre, indice):
+    img = IMG_MAP.get(nombre.lower(), DEFAULT_IMG)
+    return EstiloMedicamento(
+        COLORES_MEDICAMENTOS[indice % len(COLORES_MEDICAMENTOS)],
+        ACTIVOS.url(img),
+        ACTIVOS.url(img, URL_ACTIVOS_TABLERO),
+    )
+
+
+@lru_cache(maxsize=16)
+def estilos_medicamentos(lista_medicamentos):
+    # Una vez por lista de metas (cambia muy rara vez): el color sale de la
+    # posición en las metas y la imagen de IMG_MAP, ya traducida a la caché
+    estilos = {}
+    for i, nombre in enumerate(lista_medicamentos):
+        if nombre not in estilos:
+            estilos[nombre] = _estilo(nombre, i)
+    return estilos
+
+
+def estilo_medicamento(nombre, lista_medicamentos):
+    estilo = estilos_medicamentos(tuple(lista_medicamentos)).get(nombre)
+    return estilo if estilo is not None else _estilo(nombre, 0)
+
+
+def color_medicamento(nombre, lista_medicamentos):
+    return estilo_medicamento(nombre, lista_medicamentos).color
+
+
+# ==============================
+# MEDICAMENTO CRÍTICO Y AVANZADO
+# ==============================
+def resumen_avance(avance):
+    total_recaudado = avance["cantidad"].sum()
+    total_meta = avance["meta"].sum()
+    resumen = {
+        "total_recaudado": total_recaudado,
+        "total_meta": total_meta,
+        "porcentaje_total": (total_recaudado / total_meta * 100) if total_meta>0 else 0,
+    }
+
+    if len(avance) > 0:
+        critico = avance.sort_values("porcentaje", ascending=True).iloc[0]
+        mas_avanzado = avance.sort_values("porcentaje", ascending=False).iloc[0]
+        resumen.update(
+            critico_nombre=critico["medicamento"],
+            critico_pct=float(critico["porcentaje"]),
+            critico_faltante=float(critico["faltante"]),
+            mas_av_nombre=mas_avanzado["medicamento"],
+            mas_av_pct=float(mas_avanzado["porcentaje"]),
+        )
+    else:
+        resumen.update(critico_nombre="N/A", critico_pct=0, critico_faltante=0, mas_av_nombre="N/A", mas_av_pct=0)
+    return resumen
+
+
+# ==============================
+# TARJETAS CON DISEÑO ULTRA PREMIUM
+# ==============================
+TARJETA = cargar_plantilla(os.path.join(DIR_TABLERO, "tarjeta.html"))
+
+
+@lru_cache(maxsize=512)
+def tarjeta_html(nombre, estilo, pct, donado, meta):
+    # Memoizada: una tarjeta sin cambios (mismo medicamento, estilo, % redondeado,
+    # donado y meta) sale de la caché sin reconstruirse
+    pct_bar = max(0, min(pct, 100))
+    return TARJETA.rellenar(
+        nombre=nombre,
+        color=estilo.color,
+        pct=f"{pct:.1f}",
+        pct_bar=pct_bar,
+        img=estilo.img,
+        thermo=termometro_ultra_moderno_svg(pct, color=estilo.color),
+        donado=formatear_numero(donado),
+        meta=formatear_numero(meta),
+        faltante=formatear_numero(max(meta - donado, 0)),
+    )
+
+
+def tarjetas_html(avance, lista_medicamentos):
+    filas = zip(
+        avance["medicamento"].tolist(),
+        avance["cantidad"].tolist(),
+        avance["meta"].tolist(),
+        avance["porcentaje"].tolist(),
+    )
+    return "".join(
+        tarjeta_html(nombre, estilo_medicamento(nombre, lista_medicamentos), round(float(pct), 1), float(donado), float(meta))
+        for nombre, donado, meta, pct in filas
+    )
+
+
+# Página completa compilada una vez al importar: cada render solo rellena
+# los huecos dinámicos
+PAGINA = cargar_plantilla(
+    os.path.join(DIR_TABLERO, "pagina.html"),
+    estilos=ESTILOS,
+    defs_termometros=minificar_html(defs_termometros()),
+    confeti_js=ACTIVOS.url(URL_CONFETI),
+    fuentes_css=ACTIVOS.url(URL_FUENTES),
+)
+
+
+def pagina_html(avance, lista_medicamentos, ultima, fecha_hoy):
+    resumen = resumen_avance(avance)
+    total_recaudado = resumen["total_recaudado"]
+    total_meta = resumen["total_meta"]
+    porcentaje_total = resumen["porcentaje_total"]
+    critico_nombre = resumen["critico_nombre"]
+    critico_pct = resumen["critico_pct"]
+    critico_faltante = resumen["critico_faltante"]
+    mas_av_nombre = resumen["mas_av_nombre"]
+    mas_av_pct = resumen["mas_av_pct"]
+
+    ultimo_donante = ultima["donante"] if ultima else "Donante anónimo"
+    ultimo_monto = ultima["monto"] if ultima else 0
+    ultima_hora = ultima["hora"] if ultima else ""
+
+    # Los huecos mostrar_confeti y nuevas_donaciones quedan abiertos: se
+    # rellenan por sesión sobre la plantilla cacheada
+    return PAGINA.parcial(
+        ultimo_donante=ultimo_donante,
+        ultimo_monto=formatear_numero(ultimo_monto),
+        ultima_hora=ultima_hora,
+        fecha_hoy=fecha_hoy,
+        total_meta=formatear_numero(total_meta),
+        total_recaudado=formatear_numero(total_recaudado),
+        porcentaje_total=f"{porcentaje_total:.1f}",
+        critico_nombre=critico_nombre,
+        critico_pct=f"{critico_pct:.1f}",
+        critico_faltante=formatear_numero(critico_faltante),
+        mas_av_nombre=mas_av_nombre,
+        mas_av_pct=f"{mas_av_pct:.1f}",
+        cards_html=tarjetas_html(avance, lista_medicamentos),
+    )
+
+
+# ==============================
+# ESTADO PARA EL COMPONENTE DEL TABLERO (RENDER POR DELTAS)
+# ==============================
+def estado_tablero(avance, lista_medicamentos, ultima, fecha_hoy):
+    # Solo los valores que cambian: el componente ya tiene la página cargada
+    # y parchea el DOM en su sitio (las transiciones CSS se animan)
+    resumen = resumen_avance(avance)
+    medicamentos = []
+    for nombre, donado, meta, faltante, pct in avance[["medicamento", "cantidad", "meta", "faltante", "porcentaje"]].itertuples(index=False):
+        estilo = estilo_medicamento(nombre, lista_medicamentos)
+        medicamentos.append({
+            "nombre": nombre,
+            "color": estilo.color,
+            "img": estilo.img_tablero,
+            "pct": float(pct),
+            "donado": formatear_numero(donado),
+            "meta": formatear_numero(meta),
+            "faltante": formatear_numero(faltante),
+        })
+
+    return {
+        "fecha_hoy": fecha_hoy,
+        "total_meta": formatear_numero(resumen["total_meta"]),
+        "total_recaudado": formatear_numero(resumen["total_recaudado"]),
+        "porcentaje_total": float(resumen["porcentaje_total"]),
+        "critico_nombre": resumen["critico_nombre"],
+        "critico_pct": resumen["critico_pct"],
+        "critico_faltante": formatear_numero(resumen["critico_faltante"]),
+        "mas_av_nombre": resumen["mas_av_nombre"],
+        "mas_av_pct": resumen["mas_av_pct"],
+        "ultima": {
+            "donante": ultima["donante"] if ultima else "Donante anónimo",
+            "monto": formatear_numero(ultima["monto"] if ultima else 0),
+            "hora": ultima["hora"] if ultima else "",
+        },
+        "medicamentos": medicamentos,
+        "activos": {
+            "confeti": ACTIVOS.url(URL_CONFETI, URL_ACTIVOS_TABLERO),
+            "fuentes": ACTIVOS.url(URL_FUENTES, URL_ACTIVOS_TABLERO),
+        },
+    }
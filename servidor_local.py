@@ -0,0 +1,188 @@
+"""Sustituto local del endpoint de Apps Script para desarrollo y pruebas.
+
+Sirve una hoja en memoria con el mismo formato que la API real
+(`{"donaciones": [...], "metas": [...]}`) y el mismo protocolo incremental:
+
+    GET  /?desde=N     cabecera + filas posteriores a N, con `desde` y `total`
+    GET  /?hojas=donaciones   solo esa hoja (el cliente guarda las metas aparte)
+    POST /donaciones   añade una fila (lista) o varias (lista de listas)
+    POST /metas        reemplaza la hoja de metas (lista de listas con cabecera)
+
+El GET negocia además el transporte (tablas.py): el primer formato de
+`?formato=arrow,csv,json` que conoce o, sin el parámetro, el preferido en
+la cabecera Accept; JSON por defecto. Con `Accept-Encoding: gzip` el
+cuerpo JSON o CSV va comprimido (Arrow ya lleva zstd por dentro).
+
+Cada respuesta lleva la versión de la hoja (cabecera ETag y clave
+`version`), que cambia con cada POST. Si el GET trae esa misma versión en
+`If-None-Match` responde 304 sin cuerpo; si la trae en `?version=` (lo
+único que puede leer Apps Script), `{"sin_cambios": true, ...}`.
+
+Con `--webhook URL` cada POST /donaciones avisa además a esa URL, igual
+que el disparador onFormSubmit de producción (ver webhook.py).
+
+Uso:
+    python servidor_local.py --datos hoja.json --puerto 8765
+    DASHBOARD_API_URL=http://127.0.0.1:8765 streamlit run app.py
+"""
+import gzip
+import json
+import time
+import argparse
+import threading
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+from tablas import TIPOS_CONTENIDO, codificar_arrow, codificar_csv
+
+CODIFICADORES = {
+    "arrow": codificar_arrow,
+    "csv": codificar_csv,
+    "json": lambda cuerpo: json.dumps(cuerpo, ensure_ascii=False).encode("utf-8"),
+}
+# Por debajo de esto gzip no compensa
+MINIMO_GZIP = 1024
+
+
+def negociar_formato(formato, accept):
+    if formato:
+        for f in formato.split(","):
+            if f.strip() in CODIFICADORES:
+                return f.strip()
+    preferencias = []
+    for parte in (accept or "").split(","):
+        tipo, _, parametros = parte.partition(";")
+        q = 1.0
+        for parametro in parametros.split(";"):
+            clave, _, valor = parametro.strip().partition("=")
+            if clave == "q":
+                try:
+                    q = float(valor)
+                except ValueError:
+                    q = 0.0
+        for f, contenido in TIPOS_CONTENIDO.items():
+            if tipo.strip() == contenido and q > 0:
+                preferencias.append((q, f))
+    # sorted es estable: a igual q gana el primero de la cabecera
+    return sorted(preferencias, key=lambda p: -p[0])[0][1] if preferencias else "json"
+
+
+class HojaLocal:
+    def __init__(self, donaciones, metas, webhook=None):
+        self.cabecera = list(donaciones[0])
+        self.filas = [list(f) for f in donaciones[1:]]
+        self.metas = metas
+        self.webhook = webhook
+        self.lock = threading.Lock()
+        # Con el instante de arranque: un token viejo no coincide tras reiniciar
+        self._arranque = f"{time.time_ns():x}"
+        self._cambios = 0
+
+    @classmethod
+    def desde_archivo(cls, ruta, webhook=None):
+        with open(ruta, encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["donaciones"], data["metas"], webhook)
+
+    def agregar(self, filas):
+        with self.lock:
+            self.filas.extend(list(f) for f in filas)
+            self._cambios += 1
+        if self.webhook:
+            threading.Thread(target=self._notificar, daemon=True).start()
+
+    def reemplazar_metas(self, metas):
+        with self.lock:
+            self.metas = metas
+            self._cambios += 1
+
+    def _notificar(self):
+        try:
+            urllib.request.urlopen(urllib.request.Request(self.webhook, method="POST"), timeout=5)
+        except OSError as e:
+            print(f"No se pudo avisar al webhook: {e}")
+
+    @property
+    def version(self):
+        return f"{self._arranque}-{self._cambios}"
+
+    def respuesta(self, desde=0, hojas=("donaciones", "metas")):
+        with self.lock:
+            respuesta = {}
+            if "donaciones" in hojas:
+                respuesta["donaciones"] = [self.cabecera] + self.filas[desde:]
+            if "metas" in hojas:
+                respuesta["metas"] = self.metas
+            return dict(respuesta, desde=desde, total=len(self.filas), version=self.version)
+
+
+def crear_servidor(hoja, host="127.0.0.1", puerto=8765):
+    class Manejador(BaseHTTPRequestHandler):
+        def _responder(self, codigo, cuerpo, formato="json"):
+            datos = CODIFICADORES[formato](cuerpo)
+            self.send_response(codigo)
+            tipo = TIPOS_CONTENIDO[formato]
+            self.send_header("Content-Type", tipo if formato == "arrow" else f"{tipo}; charset=utf-8")
+            if "version" in cuerpo:
+                self.send_header("ETag", f'"{cuerpo["version"]}"')
+            if formato != "arrow" and len(datos) >= MINIMO_GZIP and "gzip" in self.headers.get("Accept-Encoding", ""):
+                datos = gzip.compress(datos, compresslevel=5)
+                self.send_header("Content-Encoding", "gzip")
+            self.send_header("Content-Length", str(len(datos)))
+            self.end_headers()
+            self.wfile.write(datos)
+
+        def do_GET(self):
+            query = parse_qs(urlparse(self.path).query)
+            try:
+                desde = max(0, int(query.get("desde", ["0"])[0]))
+            except ValueError:
+                desde = 0
+            # respuesta() lee filas y versión bajo el mismo lock
+            version = hoja.version
+            if version in (t.strip().removeprefix("W/").strip('"') for t in self.headers.get("If-None-Match", "").split(",")):
+                self.send_response(304)
+                self.send_header("ETag", f'"{version}"')
+                self.end_headers()
+                return
+            if query.get("version", [""])[0] == version:
+                self._responder(200, {"sin_cambios": True, "version": version, "total": len(hoja.filas)})
+                return
+            hojas = query.get("hojas", ["donaciones,metas"])[0].split(",")
+            formato = negociar_formato(query.get("formato", [""])[0], self.headers.get("Accept"))
+            self._responder(200, hoja.respuesta(desde, hojas), formato)
+
+        def do_POST(self):
+            ruta = urlparse(self.path).path
+            if ruta not in ("/donaciones", "/metas"):
+                self._responder(404, {"error": "ruta desconocida"})
+                return
+            largo = int(self.headers.get("Content-Length", 0))
+            filas = json.loads(self.rfile.read(largo) or b"[]")
+            if ruta == "/metas":
+                hoja.reemplazar_metas(filas)
+                self._responder(200, {"metas": len(filas) - 1})
+                return
+            if filas and not isinstance(filas[0], list):
+                filas = [filas]
+            hoja.agregar(filas)
+            self._responder(200, {"total": len(hoja.filas)})
+
+        def log_message(self, *args):
+            pass
+
+    return ThreadingHTTPServer((host, puerto), Manejador)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sustituto local de la API de Apps Script")
+    parser.add_argument("--datos", required=True, help="JSON con las claves donaciones y metas")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--puerto", type=int, default=8765)
+    parser.add_argument("--webhook", help="URL a la que avisar en cada POST /donaciones")
+    args = parser.parse_args()
+
+    servidor = crear_servidor(HojaLocal.desde_archivo(args.datos, args.webhook), args.host, args.puerto)
+    print(f"Sirviendo en http://{args.host}:{args.puerto}")
+    servidor.serve_forever()
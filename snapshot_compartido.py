@@ -0,0 +1,286 @@
+"""Snapshot compartido entre réplicas: un proceso consulta la API y el resto lo lee.
+
+Con varias réplicas de Streamlit detrás de un proxy, cada una tenía su
+propio ClienteAPI: las llamadas a Apps Script (y el CPU de decodificar)
+se multiplicaban por el número de procesos. Ahora un único proceso
+recolector consulta la API con el ClienteAPI de siempre (SWR, delta,
+fetch condicional, copia local) y publica cada snapshot en un directorio;
+los dashboards lo abren con memory map, sin copiarlo, y no tocan la red.
+
+Formato del directorio:
+
+    donaciones-<N>.arrow      hoja de donaciones de la versión N (Arrow IPC)
+    metas-<hash>.arrow        hoja de metas, por hash: no se reescribe si no cambia
+    version.json              {"version": N, "hash_donaciones": ..., "obtenido_en": ...}
+
+`version.json` se reemplaza de forma atómica después de escribir las
+tablas, así que un lector nunca ve una versión a medias. N sube solo
+cuando cambian los datos; en cada refresco sin cambios se reescribe
+`version.json` con el nuevo `obtenido_en` (latido), para que las réplicas
+sepan la edad de los datos. Se conservan las últimas versiones: un lector
+que ya mapeó una versión anterior la sigue leyendo aunque se borre.
+
+Uso:
+    python snapshot_compartido.py --directorio /dev/shm/tablero
+    DASHBOARD_SNAPSHOT_COMPARTIDO=/dev/shm/tablero streamlit run app.py --server.port 8501
+    DASHBOARD_SNAPSHOT_COMPARTIDO=/dev/shm/tablero streamlit run app.py --server.port 8502
+
+En este modo todas las llamadas a la API salen del recolector: sus métricas
+(api.peticion, bytes, caché, circuit breaker) se sirven con
+`--metricas-puerto`, no en el /metrics de las réplicas.
+"""
+import os
+import re
+import json
+import time
+import logging
+import argparse
+import threading
+
+import metricas
+from copia_local import escribir_tabla, leer_tabla
+from datos import ClienteAPI, ErrorAPI, Snapshot
+from webhook import iniciar_receptor
+
+log = logging.getLogger(__name__)
+
+# Cada cuántos segundos mira una réplica si hay versión nueva
+INTERVALO_LECTURA = float(os.environ.get("DASHBOARD_SNAPSHOT_INTERVALO", "1"))
+# Versiones de donaciones que se conservan en disco
+VERSIONES_CONSERVADAS = 3
+FICHERO_VERSION = "version.json"
+FICHERO_DONACIONES = re.compile(r"donaciones-(\d+)\.arrow")
+
+
+def _escribir_json(datos, ruta):
+    temporal = f"{ruta}.{os.getpid()}.tmp"
+    with open(temporal, "w", encoding="utf-8") as f:
+        json.dump(datos, f)
+    os.replace(temporal, ruta)
+
+
+class PublicadorSnapshot:
+    """Escribe cada snapshot del recolector en `directorio` (ver arriba)."""
+
+    def __init__(self, directorio):
+        self.directorio = directorio
+        os.makedirs(directorio, exist_ok=True)
+        # Se continúa la numeración de una ejecución anterior: las réplicas
+        # que siguen abiertas ven la primera publicación como versión nueva
+        try:
+            with open(os.path.join(directorio, FICHERO_VERSION), encoding="utf-8") as f:
+                previa = json.load(f)
+            self.version = previa["version"]
+        except (OSError, ValueError, KeyError):
+            previa, self.version = {}, 0
+        # Y también la de `carga`: sin copia local (o con otra URL) el cliente
+        # nuevo empieza en 0, y una réplica que sigue en carga 0 solo sumaría
+        # las filas del final aunque la hoja traiga filas editadas
+        self._previa = (previa.get("carga"), previa.get("hash_donaciones"))
+        self._desfase_carga = None
+        self._publicado = None
+
+    def _carga(self, snapshot):
+        # `carga` publicada = la del cliente + un desfase fijo en esta ejecución
+        if self._desfase_carga is None:
+            carga, hash_donaciones = self._previa
+            if carga is None:
+                self._desfase_carga = 0
+            elif hash_donaciones == snapshot.hash_donaciones:
+                # Las mismas filas que ya tienen las réplicas: nada que reconstruir
+                self._desfase_carga = carga - snapshot.carga
+            else:
+                self._desfase_carga = carga + 1 - snapshot.carga
+        return snapshot.carga + self._desfase_carga
+
+    def publicar(self, snapshot):
+        if self._publicado is None or (self._publicado.hash_donaciones, self._publicado.hash_metas) != (
+            snapshot.hash_donaciones, snapshot.hash_metas
+        ):
+            self.version += 1
+            escribir_tabla(snapshot.donaciones, self._ruta(f"donaciones-{self.version}.arrow"))
+            ruta_metas = self._ruta(f"metas-{snapshot.hash_metas}.arrow")
+            if not os.path.exists(ruta_metas):
+                escribir_tabla(snapshot.metas, ruta_metas)
+            log.info("Publicada la versión %d: %d donaciones", self.version, snapshot.donaciones.num_rows)
+
+        _escribir_json({
+            "version": self.version,
+            "hash_donaciones": snapshot.hash_donaciones,
+            "hash_metas": snapshot.hash_metas,
+            "filas_nuevas_desde": snapshot.filas_nuevas_desde,
+            "carga": self._carga(snapshot),
+            "version_hoja": snapshot.version,
+            # Reloj de pared: el monotónico no se compara entre procesos
+            "obtenido_en": time.time() - (time.monotonic() - snapshot.obtenido_en),
+        }, self._ruta(FICHERO_VERSION))
+        if self._publicado is None or self._publicado.hash_donaciones != snapshot.hash_donaciones:
+            self._limpiar(snapshot.hash_metas)
+        self._publicado = snapshot
+
+    def _ruta(self, nombre):
+        return os.path.join(self.directorio, nombre)
+
+    def _limpiar(self, hash_metas):
+        for nombre in os.listdir(self.directorio):
+            donaciones = FICHERO_DONACIONES.fullmatch(nombre)
+            viejo = (
+                donaciones is not None and int(donaciones.group(1)) <= self.version - VERSIONES_CONSERVADAS
+            ) or (nombre.startswith("metas-") and nombre != f"metas-{hash_metas}.arrow")
+            if viejo:
+                try:
+                    os.remove(self._ruta(nombre))
+                except OSError:
+                    pass
+
+
+class LectorSnapshot:
+    """Sustituye a ClienteAPI en las réplicas: mismo `obtener()` y `suscribir()`.
+
+    Un hilo mira `version.json` cada `intervalo` segundos (solo un stat si
+    no cambió) y, con versión nueva, mapea las tablas y avisa a los
+    suscriptores. Las metas se reutilizan mientras no cambie su hash.
+    """
+
+    def __init__(self, directorio, intervalo=INTERVALO_LECTURA, espera_arranque=30.0):
+        self.directorio = directorio
+        self.intervalo = intervalo
+        self.espera_arranque = espera_arranque
+        self._lock = threading.Lock()
+        self._despertar = threading.Event()
+        self._snapshot = None
+        self._version = None
+        self._mtime = None
+        self._suscriptores = []
+        self._hilo = None
+        self.ultimo_error = None
+
+    def obtener(self):
+        with self._lock:
+            if self._hilo is None:
+                self._hilo = threading.Thread(target=self._vigilar, name="lector-snapshot", daemon=True)
+                self._hilo.start()
+            limite = time.monotonic() + self.espera_arranque
+            while self._snapshot is None:
+                # Arranque en frío: el recolector puede no haber publicado aún
+                self._leer()
+                if self._snapshot is not None or time.monotonic() >= limite:
+                    break
+                time.sleep(min(self.intervalo, 0.2))
+            if self._snapshot is None:
+                raise ErrorAPI(self.ultimo_error or f"No hay snapshot publicado en {self.directorio}")
+            return self._snapshot
+
+    def forzar_refresco(self):
+        # Aquí no hay API a la que llamar: solo se mira ya si hay versión nueva
+        self._despertar.set()
+
+    def suscribir(self, callback):
+        self._suscriptores.append(callback)
+
+    def edad(self):
+        snap = self._snapshot
+        return None if snap is None else time.monotonic() - snap.obtenido_en
+
+    def _vigilar(self):
+        while True:
+            self._despertar.wait(self.intervalo)
+            self._despertar.clear()
+            with self._lock:
+                nuevo = self._leer()
+            if nuevo is not None:
+                for callback in self._suscriptores:
+                    try:
+                        callback(nuevo)
+                    except Exception as e:
+                        log.warning("Suscriptor del lector de snapshot falló: %s", e)
+
+    def _leer(self):
+        # Requiere self._lock. Devuelve el snapshot si cambió la versión
+        ruta = os.path.join(self.directorio, FICHERO_VERSION)
+        try:
+            estado = os.stat(ruta)
+            # os.replace cambia el inodo: basta con compararlo junto al mtime
+            mtime = (estado.st_ino, estado.st_mtime_ns)
+            if mtime == self._mtime:
+                return None
+            with open(ruta, encoding="utf-8") as f:
+                marca = json.load(f)
+            anterior = self._snapshot
+            obtenido_en = time.monotonic() - max(0.0, time.time() - marca["obtenido_en"])
+            if marca["version"] == self._version:
+                # Latido: mismos datos, refrescados más tarde
+                self._snapshot = anterior._replace(obtenido_en=obtenido_en)
+                self._mtime = mtime
+                return None
+            if anterior is not None and anterior.hash_metas == marca["hash_metas"]:
+                metas = anterior.metas
+            else:
+                metas = leer_tabla(os.path.join(self.directorio, f"metas-{marca['hash_metas']}.arrow"))
+            donaciones = leer_tabla(os.path.join(self.directorio, f"donaciones-{marca['version']}.arrow"))
+        except (OSError, ValueError, KeyError) as e:
+            # Sin publicar todavía, o el recolector reemplazó version.json
+            # entre el stat y la lectura: se reintenta en la siguiente vuelta
+            self.ultimo_error = e
+            return None
+        self._snapshot = Snapshot(
+            donaciones, metas, obtenido_en, marca["hash_donaciones"], marca["hash_metas"],
+            filas_nuevas_desde=marca["filas_nuevas_desde"], carga=marca["carga"], version=marca["version_hoja"],
+        )
+        self._version, self._mtime = marca["version"], mtime
+        self.ultimo_error = None
+        return self._snapshot
+
+
+def recolectar(cliente, publicador, intervalo):
+    """Bucle del recolector: publica cada snapshot nuevo del cliente API."""
+    nuevo = threading.Event()
+    cliente.suscribir(lambda _: nuevo.set())
+    publicado = None
+    while True:
+        try:
+            snapshot = cliente.obtener()
+        except ErrorAPI as e:
+            log.warning("Sin datos que publicar todavía: %s", e)
+            snapshot = None
+        # Cada refresco (con o sin cambios) da un objeto nuevo: se publica
+        # para que el latido llegue a las réplicas
+        if snapshot is not None and snapshot is not publicado:
+            try:
+                publicador.publicar(snapshot)
+                publicado = snapshot
+            except OSError as e:
+                log.error("No se pudo publicar el snapshot: %s", e)
+        nuevo.wait(intervalo)
+        nuevo.clear()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recolector: consulta la API y publica el snapshot para las réplicas")
+    parser.add_argument("--url", default=os.environ.get("DASHBOARD_API_URL"), required="DASHBOARD_API_URL" not in os.environ)
+    parser.add_argument("--directorio", default=os.environ.get("DASHBOARD_SNAPSHOT_COMPARTIDO"),
+                        required="DASHBOARD_SNAPSHOT_COMPARTIDO" not in os.environ)
+    parser.add_argument("--intervalo", type=float, default=1.0, help="segundos entre consultas al cliente API")
+    parser.add_argument("--webhook", action="store_true", help="escuchar avisos del formulario (ver webhook.py)")
+    parser.add_argument("--metricas-puerto", type=int, default=int(os.environ.get("DASHBOARD_METRICAS_PUERTO", "0")),
+                        help="servir /metrics de Prometheus en este puerto (ver metricas.py)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    cliente = ClienteAPI(args.url)
+    publicador = PublicadorSnapshot(args.directorio)
+    if args.metricas_puerto:
+        metricas.indicador("snapshot_edad_segundos", "Segundos desde que se obtuvo el snapshot de la API", cliente.edad)
+        metricas.indicador("snapshot_version", "Versión publicada para las réplicas", lambda: publicador.version)
+        metricas.indicador("api_circuito_abierto", "1 si el circuit breaker corta las llamadas a la API",
+                           lambda: int(cliente.circuito_abierto()))
+        try:
+            metricas.iniciar_servidor(args.metricas_puerto)
+        except OSError as e:
+            parser.error(f"no se pudo iniciar el endpoint de métricas: {e}")
+    if args.webhook:
+        try:
+            iniciar_receptor(cliente.forzar_refresco, al_cambiar_metas=cliente.invalidar_metas)
+        except ValueError as e:
+            parser.error(str(e))
+    recolectar(cliente, publicador, args.intervalo)
@@ -0,0 +1,415 @@
+"""Hojas de cálculo como tablas columnares de Arrow.
+
+La API devuelve cada hoja como lista de listas (cabecera + filas). Con
+`resp.json()` toda la respuesta se materializa como listas anidadas de
+objetos Python, después pandas la copia a columnas object y el slicing
+`[1:]` añade otra copia. Aquí la respuesta se lee por trozos: las filas
+completas de cada trozo se decodifican juntas con el escáner de C de
+`json` y se acumulan en un lote pequeño, y cada lote se vuelca a un array
+tipado por columna. En memoria solo vive a
+la vez un lote de filas Python y las columnas ya compactas.
+
+Tipos por columna: entero o real si todas sus celdas son números (el vacío
+"" cuenta como nulo); si no, texto. Un lote sin ninguna celda rellena queda
+sin tipo (nulo) y toma el de la columna. El tipo puede variar entre lotes o
+entre respuestas: al juntar trozos se unifica (real si se mezclan enteros y
+reales, texto en otro caso) y `texto_celda` da el mismo texto para 10, 10.0
+y "10".
+"""
+import io
+import re
+import csv
+import json
+import codecs
+import hashlib
+from itertools import islice, zip_longest
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import pyarrow.ipc as ipc
+
+# Hojas de la respuesta que se decodifican a columnas
+HOJAS = ("donaciones", "metas")
+# Filas Python que se acumulan antes de volcarlas a columnas tipadas
+TAMANO_LOTE = 8192
+# Bytes que se leen de la respuesta en cada trozo
+TAMANO_TROZO = 1 << 16
+
+BLANCOS = re.compile(r"\s*")
+DECODIFICADOR = json.JSONDecoder()
+
+
+# ==============================
+# COLUMNAS TIPADAS
+# ==============================
+def texto_celda(valor):
+    # 10, 10.0 y "10" son la misma celda de la hoja
+    if isinstance(valor, float) and valor.is_integer():
+        return str(int(valor))
+    return str(valor)
+
+
+def _vacio(valor):
+    return valor is None or valor == ""
+
+
+def _columna(valores, tipo=None):
+    # `tipo` es el del lote anterior de la columna, que casi siempre se repite
+    if tipo in (None, pa.null()) and all(map(_vacio, valores)):
+        # Lote sin ninguna celda rellena (p. ej. un medicamento que nadie
+        # donó en las filas nuevas): sin tipo propio, toma el de la columna
+        # al unificar. Como texto convertiría a texto la columna entera
+        return pa.nulls(len(valores))
+    if tipo in (pa.int64(), pa.float64()):
+        try:
+            return pa.array([None if v == "" else v for v in valores], type=tipo)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            pass
+    try:
+        return pa.array(valores, type=tipo if tipo == pa.string() else None)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        pass
+    try:
+        # Celdas vacías en una columna de números
+        return pa.array([None if v == "" else v for v in valores])
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return pa.array([None if v is None else texto_celda(v) for v in valores], type=pa.string())
+
+
+def _a_texto(trozo):
+    if trozo.type == pa.string():
+        return trozo
+    if trozo.type == pa.null():
+        # Lote de celdas vacías: en una columna de texto son "", como las
+        # vacías de los lotes con texto
+        return pa.array([""] * len(trozo), type=pa.string())
+    return pa.array([None if v is None else texto_celda(v) for v in trozo.to_pylist()], type=pa.string())
+
+
+def _unificar(trozos):
+    tipos = {t.type for t in trozos} - {pa.null()}
+    if not tipos:
+        return pa.chunked_array(trozos, type=pa.null())
+    if tipos == {pa.string()}:
+        return pa.chunked_array([_a_texto(t) for t in trozos], type=pa.string())
+    if len(tipos) == 1:
+        tipo = tipos.pop()
+        return pa.chunked_array([t.cast(tipo) for t in trozos], type=tipo)
+    if tipos <= {pa.int64(), pa.float64()}:
+        return pa.chunked_array([t.cast(pa.float64()) for t in trozos], type=pa.float64())
+    return pa.chunked_array([_a_texto(t) for t in trozos], type=pa.string())
+
+
+class Columnas:
+    """Acumula las filas de una hoja en arrays tipados, uno por columna de la cabecera."""
+
+    def __init__(self, cabecera):
+        self.cabecera = [str(c) for c in cabecera]
+        self._trozos = [[] for _ in self.cabecera]
+        self._lote = []
+
+    def agregar(self, filas):
+        self._lote.extend(filas)
+        # Lotes de tamaño fijo: los tipos de cada trozo no dependen de cómo
+        # llegó la respuesta troceada por la red
+        while len(self._lote) >= TAMANO_LOTE:
+            self._volcar(TAMANO_LOTE)
+
+    def _volcar(self, n=None):
+        n = len(self._lote) if n is None else n
+        lote, self._lote = self._lote[:n], self._lote[n:]
+        if not lote:
+            return
+        # Transponer el lote; las filas cortas se completan con nulos y lo
+        # que pase de la cabecera se ignora
+        ancho = len(self.cabecera)
+        columnas = list(islice(zip_longest(*lote), ancho))
+        columnas += [(None,) * n] * (ancho - len(columnas))
+        for trozos, valores in zip(self._trozos, columnas):
+            trozos.append(_columna(valores, trozos[-1].type if trozos else None))
+
+    def tabla(self):
+        self._volcar()
+        return pa.Table.from_arrays([_unificar(t) for t in self._trozos], names=self.cabecera)
+
+
+def tabla_desde_filas(filas):
+    # Lista de listas (cabecera + filas) -> tabla Arrow
+    if not filas:
+        return pa.table({})
+    columnas = Columnas(filas[0])
+    for i in range(1, len(filas), TAMANO_LOTE):
+        columnas.agregar(filas[i:i + TAMANO_LOTE])
+    return columnas.tabla()
+
+
+def concatenar_tablas(anterior, nuevas):
+    # Misma cabecera; el tipo de cada columna se unifica si los lotes difieren
+    if anterior.schema == nuevas.schema:
+        return pa.concat_tables([anterior, nuevas])
+    columnas = [_unificar(a.chunks + b.chunks) for a, b in zip(anterior.columns, nuevas.columns)]
+    return pa.Table.from_arrays(columnas, names=anterior.column_names)
+
+
+def mismo_contenido(anterior, nueva):
+    # Mismas celdas aunque el tipo de alguna columna dependa de cómo llegaron
+    # los lotes (p. ej. int64 con nulos frente a una carga sin ningún valor)
+    if anterior.column_names != nueva.column_names or anterior.num_rows != nueva.num_rows:
+        return False
+    for a, b in zip(anterior.columns, nueva.columns):
+        if a.type != b.type:
+            comun = _unificar(a.chunks + b.chunks)
+            a, b = comun.slice(0, len(a)), comun.slice(len(a))
+        if not a.equals(b):
+            return False
+    return True
+
+
+def hash_tabla(tabla):
+    # Huella estable del contenido, independiente de cómo esté troceada
+    h = hashlib.md5(json.dumps([tabla.column_names, [str(t) for t in tabla.schema.types]]).encode())
+    h.update(pd.util.hash_pandas_object(tabla.to_pandas(), index=False).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+# ==============================
+# DECODIFICACIÓN POR TROZOS
+# ==============================
+class _Flujo:
+    """Texto JSON que se va leyendo de un iterable de bytes."""
+
+    def __init__(self, trozos):
+        self._trozos = iter(trozos)
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+        self.texto = ""
+        self.pos = 0
+        self.agotado = False
+
+    def _leer_mas(self):
+        if self.agotado:
+            raise ValueError("JSON incompleto")
+        trozo = next(self._trozos, None)
+        if trozo is None:
+            self.agotado = True
+            nuevo = self._utf8.decode(b"", final=True)
+        else:
+            nuevo = self._utf8.decode(trozo)
+        self.texto = self.texto[self.pos:] + nuevo
+        self.pos = 0
+
+    def siguiente(self):
+        # Siguiente carácter significativo, sin consumirlo
+        while True:
+            self.pos = BLANCOS.match(self.texto, self.pos).end()
+            if self.pos < len(self.texto):
+                return self.texto[self.pos]
+            self._leer_mas()
+
+    def consumir(self, esperados):
+        caracter = self.siguiente()
+        if caracter not in esperados:
+            raise ValueError(f"JSON inesperado: {caracter!r} en lugar de {esperados!r}")
+        self.pos += 1
+        return caracter
+
+    def valor(self):
+        self.siguiente()
+        while True:
+            try:
+                valor, fin = DECODIFICADOR.raw_decode(self.texto, self.pos)
+                # Un número al final del texto puede seguir en el próximo trozo
+                if fin < len(self.texto) or self.agotado:
+                    self.pos = fin
+                    return valor
+            except json.JSONDecodeError:
+                if self.agotado:
+                    raise
+            self._leer_mas()
+
+    def filas(self):
+        # Dentro de una hoja: todas las filas completas que ya están en el
+        # texto con una sola llamada al decodificador. Las celdas son
+        # escalares, así que fuera de un texto "]," solo cierra una fila; si
+        # el corte cae dentro de un texto el JSON recortado no es válido y se
+        # lee una sola fila
+        self.siguiente()
+        corte = self.texto.rfind("],", self.pos)
+        if corte > self.pos:
+            try:
+                filas, fin = DECODIFICADOR.raw_decode("[" + self.texto[self.pos:corte + 1] + "]")
+                # `fin` cuenta el "[" añadido. Si la hoja terminó antes del
+                # corte, el array lo cerró su propio "]", que queda por consumir
+                self.pos += fin - 2
+                return filas
+            except json.JSONDecodeError:
+                pass
+        return [self.valor()]
+
+
+def _hoja(flujo):
+    flujo.consumir("[")
+    if flujo.siguiente() == "]":
+        flujo.pos += 1
+        return pa.table({})
+    columnas = Columnas(flujo.valor())
+    while flujo.consumir(",]") == ",":
+        columnas.agregar(flujo.filas())
+    return columnas.tabla()
+
+
+def decodificar_json(trozos, hojas=HOJAS):
+    """Decodifica la respuesta de la API leyendo `trozos` (bytes) a medida que llegan.
+
+    Las claves de `hojas` se devuelven como tablas Arrow; el resto, tal cual.
+    """
+    flujo = _Flujo(trozos)
+    datos = {}
+    flujo.consumir("{")
+    if flujo.siguiente() == "}":
+        return datos
+    while True:
+        clave = flujo.valor()
+        flujo.consumir(":")
+        if clave in hojas and flujo.siguiente() == "[":
+            datos[clave] = _hoja(flujo)
+        else:
+            datos[clave] = flujo.valor()
+        if flujo.consumir(",}") == "}":
+            return datos
+
+
+# ==============================
+# TRANSPORTE EN CSV Y ARROW
+# ==============================
+# Alternativas a la lista de listas en JSON, que repite comillas y
+# corchetes en cada celda. El cliente pide por orden de preferencia
+# (`?formato=csv,json` y cabecera Accept) y decodifica según el
+# Content-Type de la respuesta: un endpoint que no los implementa sigue
+# respondiendo JSON. Con gzip (Accept-Encoding) el CSV es el más pequeño
+# en la red; Arrow, el más rápido de decodificar pero el más grande.
+#
+# CSV: cada hoja precedida de una línea `#<hoja>`; la primera lleva además
+# el resto de claves como `clave=valor` (JSON), p. ej.
+#
+#     #donaciones desde=120 total=125
+#     Marca temporal,Nombre o entidad donante...,Multivitaminas (gotas)
+#     01/02/2026 10:00:00,Ana,3
+#     #metas
+#     Medicamento,Meta
+#
+# Las celdas pueden tener saltos de línea, y el texto lo escribe quien
+# rellena el formulario: un "#" al principio de una celda o tras un salto de
+# línea dentro de ella va doblado ("##"), así ninguna línea de datos se
+# confunde con la de una hoja, y se deshace al decodificar.
+#
+# Arrow: un stream IPC por hoja, uno tras otro; el nombre de la hoja y las
+# demás claves van en los metadatos del esquema. Los buffers ya van
+# comprimidos con zstd (si pyarrow lo trae), así que no hace falta gzip.
+TIPOS_CONTENIDO = {
+    "arrow": "application/vnd.apache.arrow.stream",
+    "csv": "text/csv",
+    "json": "application/json",
+}
+ENTERO = r"^[+-]?\d+$"
+DECIMAL = r"^[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?$"
+COMPRESION_ARROW = "zstd" if pa.Codec.is_available("zstd") else None
+SECCION_CSV = re.compile(rb"^#(" + "|".join(HOJAS).encode() + rb")\b([^\r\n]*)\r?\n", re.M)
+ALMOHADILLA_CSV = re.compile(r"(^|\n)#")
+ALMOHADILLA_DOBLE = r"(^|\n)##"
+
+
+def _escapar_celda(valor):
+    if isinstance(valor, str) and "#" in valor:
+        return ALMOHADILLA_CSV.sub(r"\1##", valor)
+    return "" if valor is None else valor
+
+
+def _desescapar(columna):
+    if not pa.types.is_string(columna.type):
+        return columna
+    return pc.replace_substring_regex(columna, ALMOHADILLA_DOBLE, r"\1#")
+
+
+def _tipar_texto(columna):
+    # Columna leída como texto con los mismos tipos que _columna: número si
+    # todas sus celdas lo son ("" como nulo); si no, texto tal cual
+    sin_vacios = pc.if_else(pc.equal(columna, ""), pa.scalar(None, pa.string()), columna)
+    if sin_vacios.null_count == len(columna):
+        return pa.nulls(len(columna))
+    # Un cast fallido cuesta tanto como uno bueno: antes se filtra con regex
+    for tipo, patron in ((pa.int64(), ENTERO), (pa.float64(), DECIMAL)):
+        if pc.all(pc.match_substring_regex(sin_vacios, patron)).as_py():
+            try:
+                return sin_vacios.cast(tipo)
+            except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+                pass
+    return columna
+
+
+def codificar_csv(datos, hojas=HOJAS):
+    salida = io.StringIO()
+    escritor = csv.writer(salida, lineterminator="\n")
+    extra = " ".join(f"{k}={json.dumps(v)}" for k, v in datos.items() if k not in hojas)
+    for i, hoja in enumerate(h for h in hojas if h in datos):
+        salida.write(f"#{hoja} {extra}\n" if i == 0 and extra else f"#{hoja}\n")
+        filas = datos[hoja]
+        ancho = len(filas[0]) if filas else 0
+        # Filas completas: el CSV no admite filas cortas como la lista de listas
+        escritor.writerows([[_escapar_celda(v) for v in fila[:ancho]] + [""] * (ancho - len(fila)) for fila in filas])
+    return salida.getvalue().encode("utf-8")
+
+
+def decodificar_csv(contenido):
+    datos = {}
+    secciones = list(SECCION_CSV.finditer(contenido))
+    for i, seccion in enumerate(secciones):
+        fin = secciones[i + 1].start() if i + 1 < len(secciones) else len(contenido)
+        for par in seccion.group(2).decode("utf-8").split():
+            clave, _, valor = par.partition("=")
+            datos[clave] = json.loads(valor)
+        cuerpo = contenido[seccion.end():fin]
+        if not cuerpo.strip():
+            datos[seccion.group(1).decode()] = pa.table({})
+            continue
+        # Todo como texto (sin inferir fechas ni booleanos) y después los
+        # números, igual que al decodificar JSON
+        cabecera = next(csv.reader(io.StringIO(cuerpo.split(b"\n", 1)[0].decode("utf-8"))))
+        tabla = pacsv.read_csv(io.BytesIO(cuerpo), convert_options=pacsv.ConvertOptions(
+            column_types={c: pa.string() for c in cabecera}, strings_can_be_null=False,
+        ), parse_options=pacsv.ParseOptions(newlines_in_values=True))
+        columnas = [c.combine_chunks() for c in tabla.columns]
+        nombres = tabla.column_names
+        if b"##" in cuerpo:
+            columnas = [_desescapar(c) for c in columnas]
+            nombres = [re.sub(ALMOHADILLA_DOBLE, r"\1#", n) for n in nombres]
+        datos[seccion.group(1).decode()] = pa.Table.from_arrays(
+            [_tipar_texto(c) for c in columnas], names=nombres,
+        )
+    return datos
+
+
+def codificar_arrow(datos, hojas=HOJAS, compresion=COMPRESION_ARROW):
+    salida = pa.BufferOutputStream()
+    opciones = ipc.IpcWriteOptions(compression=compresion)
+    extra = {k: json.dumps(v) for k, v in datos.items() if k not in hojas}
+    for hoja in (h for h in hojas if h in datos):
+        tabla = tabla_desde_filas(datos[hoja])
+        tabla = tabla.replace_schema_metadata(dict(extra, hoja=hoja))
+        with ipc.new_stream(salida, tabla.schema, options=opciones) as escritor:
+            escritor.write_table(tabla)
+        extra = {}
+    return salida.getvalue().to_pybytes()
+
+
+def decodificar_arrow(contenido):
+    datos = {}
+    lector = pa.BufferReader(contenido)
+    while lector.tell() < lector.size():
+        tabla = ipc.open_stream(lector).read_all()
+        metadatos = {k.decode(): v.decode() for k, v in (tabla.schema.metadata or {}).items()}
+        hoja = metadatos.pop("hoja")
+        datos.update({k: json.loads(v) for k, v in metadatos.items()})
+        datos[hoja] = tabla.replace_schema_metadata()
+    return datos
@@ -0,0 +1,128 @@
+"""Receptor de notificaciones de envío de formulario (modo push).
+
+Con DASHBOARD_MODO_PUSH=1 el dashboard deja de reejecutarse cada 15 s: un
+servidor HTTP pequeño escucha `POST /notificar` y, al recibir un aviso,
+fuerza un refresco del cliente API. Cuando llegan datos distintos se
+reejecutan las sesiones abiertas, así que una donación aparece en cuanto
+la API la devuelve y sin actividad en reposo.
+
+En producción el aviso lo manda un disparador `onFormSubmit` de Apps Script:
+
+    function alEnviarFormulario(e) {
+      UrlFetchApp.fetch("https://<host-del-dashboard>:8502/notificar", {
+        method: "post",
+        headers: {"X-Token": "<DASHBOARD_WEBHOOK_TOKEN>"},
+        muteHttpExceptions: true,
+      });
+    }
+
+En local, `servidor_local.py --webhook http://127.0.0.1:8502/notificar`
+hace lo mismo al recibir cada `POST /donaciones`.
+
+`POST /metas` avisa de un cambio en la hoja de metas, que el cliente API
+cachea con un TTL largo (p. ej. desde un disparador onEdit de esa hoja).
+
+Por defecto solo escucha en 127.0.0.1. Para recibir avisos de Apps Script
+hay que exponerlo (DASHBOARD_WEBHOOK_HOST=0.0.0.0) y entonces el token es
+obligatorio: sin él el receptor no arranca. Los refrescos que dispara
+quedan limitados por el intervalo mínimo de ClienteAPI.forzar_refresco.
+"""
+import os
+import hmac
+import logging
+import ipaddress
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+log = logging.getLogger(__name__)
+
+HOST = os.environ.get("DASHBOARD_WEBHOOK_HOST", "127.0.0.1")
+PUERTO = int(os.environ.get("DASHBOARD_WEBHOOK_PUERTO", "8502"))
+# Si está definido, el aviso debe traerlo en la cabecera X-Token o en ?token=.
+# Obligatorio si HOST no es de loopback
+TOKEN = os.environ.get("DASHBOARD_WEBHOOK_TOKEN", "")
+# El aviso no lleva datos: un cuerpo mayor se rechaza sin leerlo
+MAX_CUERPO = 4096
+
+
+def _es_loopback(host):
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def crear_receptor(al_notificar, host=HOST, puerto=PUERTO, token=TOKEN, al_cambiar_metas=None):
+    if not token and not _es_loopback(host):
+        raise ValueError(f"El receptor en {host} necesita DASHBOARD_WEBHOOK_TOKEN (o DASHBOARD_WEBHOOK_HOST=127.0.0.1)")
+
+    class Manejador(BaseHTTPRequestHandler):
+        def _responder(self, codigo):
+            self.send_response(codigo)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def do_POST(self):
+            url = urlparse(self.path)
+            rutas = {"/notificar": al_notificar, "/metas": al_cambiar_metas}
+            if rutas.get(url.path) is None:
+                self._responder(404)
+                return
+            recibido = self.headers.get("X-Token") or parse_qs(url.query).get("token", [""])[0]
+            # En bytes: con texto no ASCII (p. ej. ?token=%C3%B1) compare_digest lanza TypeError
+            if token and not hmac.compare_digest(recibido.encode("utf-8"), token.encode("utf-8")):
+                self._responder(403)
+                return
+            # El cuerpo (si lo hay) no se usa: el aviso solo dispara el refresco
+            try:
+                largo = int(self.headers.get("Content-Length", 0))
+            except ValueError:
+                self._responder(400)
+                return
+            if not 0 <= largo <= MAX_CUERPO:
+                self.close_connection = True
+                self._responder(413)
+                return
+            self.rfile.read(largo)
+            rutas[url.path]()
+            self._responder(204)
+
+        def log_message(self, *args):
+            pass
+
+    return ThreadingHTTPServer((host, puerto), Manejador)
+
+
+def iniciar_receptor(al_notificar, host=HOST, puerto=PUERTO, token=TOKEN, al_cambiar_metas=None):
+    receptor = crear_receptor(al_notificar, host, puerto, token, al_cambiar_metas)
+    threading.Thread(target=receptor.serve_forever, name="receptor-webhook", daemon=True).start()
+    log.info("Receptor de webhook escuchando en %s:%d", host, puerto)
+    return receptor
+
+
+def sesiones_activas():
+    # Sesiones de navegador abiertas en este proceso (None fuera de Streamlit)
+    try:
+        from streamlit.runtime import Runtime
+        if not Runtime.exists():
+            return None
+        return len(Runtime.instance()._session_mgr.list_active_sessions())
+    except Exception as e:
+        log.warning("No se pudieron contar las sesiones: %s", e)
+        return None
+
+
+def reejecutar_sesiones(*_):
+    # Pide un rerun a todas las sesiones abiertas. Streamlit no expone esto
+    # como API pública: si cambia, las sesiones siguen con el timer de respaldo.
+    try:
+        from streamlit.runtime import Runtime
+        if not Runtime.exists():
+            return
+        for info in Runtime.instance()._session_mgr.list_active_sessions():
+            info.session.request_rerun(None)
+    except Exception as e:
+        log.warning("No se pudieron reejecutar las sesiones: %s", e)